@@ -6,16 +6,87 @@
 from os.path import dirname, abspath
 import sys
 sys.path.append(dirname(abspath(__file__)))
-from qiskit import ClassicalRegister, QuantumRegister, QuantumCircuit, execute
 from Python.helpFiles import get2DiffRandNum, get3DiffRandNum
-from qiskit import BasicAer
-from numpy import power, abs, where, array, zeros, empty, absolute, sort
-from numpy.random import randint, seed
-from scipy.constants import pi
+from Python.metrics import timed, count
+from Python.statevector import moveAnalytics
+from Python import statevector
+from Python.backends import chooseBackend
+from Python.mps import MatrixProductState
+from Python.densityMatrix import DensityMatrix
+from Python import entanglement
+from itertools import permutations
+from collections import deque
+from numpy import power, abs, where, array, asarray, zeros, empty, absolute, sort, pi, bincount, vstack, clip
+from numpy.random import randint, seed, default_rng
+
+# qiskit is imported where it is used, so that importing this module stays cheap for tools that never simulate
+
+defaultSize = 5
+# The gates of playerMoveInteractive, and the gates used to randomize the initial state
+allGates = ["H", "X", "Z", "ID", "SRX", "CX", "CH", "SWAP", "CCX", "ZH", "SRZ"]
+initGates = ["H", "Z", "X", "CX"]
+# States of backends that are not wavevectors, with analytics of their own
+stateClasses = (MatrixProductState, DensityMatrix)
+
+
+class BoardAnalytics:
+    def __init__(self, version, psi, probs01, probsPlusMinus, bellPairs):
+        """
+        Everything shown on a board, derived from a single simulation of its circuit.
+        :param version: The version of the board the circuit was taken from, see Board.version
+        :param psi: The wavevector
+        :param probs01: The probabilities of measuring 1 for each qubit
+        :param probsPlusMinus: The probabilities of measuring - for each qubit
+        :param bellPairs: The pairs of qubits in a Bell state, see Board.findBellPairs
+        """
+        self.version = version
+        self.psi = psi
+        self.probs01 = probs01
+        self.probsPlusMinus = probsPlusMinus
+        self.bellPairs = bellPairs
+        # The Entanglement of the state, computed when first asked for, see getEntanglement
+        self.entanglement = None
+
+    def withVersion(self, version):
+        analytics = BoardAnalytics(version, self.psi, self.probs01, self.probsPlusMinus, self.bellPairs)
+        analytics.entanglement = self.entanglement
+        return analytics
+
+    def getEntanglement(self):
+        """
+        :return: The purities and entropies of every qubit, and the GHZ-type triples, see entanglement.Entanglement.
+                 They are kept with the analytics, so every state is analysed only once, and the pairs of qubits are
+                 only analysed when asked for, so drawing a board never analyses them.
+        """
+        if self.entanglement is None:
+            if isinstance(self.psi, stateClasses):
+                self.entanglement = entanglement.analyseState(self.psi)
+            else:
+                self.entanglement = entanglement.analyse(self.psi, self.psi.shape[0].bit_length() - 1)[0]
+        return self.entanglement
+
+
+class Checkpoint:
+    def __init__(self, gate, coords, length, version, analytics):
+        """
+        A move on a board, kept so that it can be taken back or made again without simulating.
+        :param gate: The gate
+        :param coords: The coordinates of the gate
+        :param length: Number of instructions in the circuit before the move
+        :param version: The version of the board before the move
+        :param analytics: BoardAnalytics of the board before the move for undo, or after the move for redo. None if
+                          they were not known.
+        """
+        self.gate = gate
+        self.coords = coords
+        self.length = length
+        self.version = version
+        self.analytics = analytics
 
 
 class Board:
-    def __init__(self, boardSeed=43, enableEntanglement=False, nRandOneQGates=5, nRandTwoQGates=5):
+    def __init__(self, boardSeed=43, enableEntanglement=False, nRandOneQGates=5, nRandTwoQGates=5, size=defaultSize,
+                 undoDepth=16, backend=None, simulate=True, catalog=None):
         """
         Initializes a board with a QuantumCircuit containing a QuantumRegister adn QuantumCircuit, and randomizes the
         initial state. The variable PreviousBellPairs minimizes the number of times one need to search for the BellPairs.
@@ -23,20 +94,48 @@ class Board:
         :param enableEntanglement: Whether to use randomized CX-gates
         :param nRandOneQGates: Number of one qubit-gates to apply in randomizing the initial state
         :param nRandTwoQGates: Number of two qubit-gates to apply in randomizing the initial state
+        :param size: Number of qubits on the board, at least nRandOneQGates
+        :param undoDepth: Number of moves that can be taken back
+        :param backend: The SimulationBackend, by default one that can simulate all gates at this size
+        :param simulate: Simulate the initial state at once. Otherwise the analytics are left for BoardStack.simulate,
+                         which simulates the boards of all players in one job.
+        :param catalog: A BoardCatalog to look the analytics of initial states up in instead of simulating them. Seeds
+                        it does not hold are simulated.
         """
-        self.size = 5
+        from qiskit import ClassicalRegister, QuantumRegister
+        self.size = size
+        self.backend = chooseBackend(size, allGates) if backend is None else backend
+        self.undoDepth = undoDepth
+        self.catalog = catalog
 
         self.doubleGates = ["CH", "CX", "SWAP"]
         self.tripleGates = ["CCX"]
 
         self.q = QuantumRegister(self.size)
         self.c = ClassicalRegister(self.size)
-        self.qc = QuantumCircuit(self.q, self.c)
+        self.reset(boardSeed, enableEntanglement, nRandOneQGates, nRandTwoQGates, simulate)
 
+    def reset(self, boardSeed=43, enableEntanglement=False, nRandOneQGates=5, nRandTwoQGates=5, simulate=True):
+        """
+        Discards all applied gates and randomizes a new initial state, reusing the registers of the board.
+        :param all: see definition of __init__
+        """
+        from qiskit import QuantumCircuit
+        self.qc = QuantumCircuit(self.q, self.c)
         self.previousBellPairs = []
-        self._createInitState(boardSeed, enableEntanglement, nRandOneQGates, nRandTwoQGates)
+        # Increased with every change of the circuit, analytics computed for an older version are stale
+        self.version = getattr(self, "version", -1) + 1
+        self.analytics = None
+        # Analytics of the circuit after a move, computed ahead of time. Keyed by (version, gate, coordinates).
+        self.moveAnalytics = {}
+        # Checkpoints of the moves that can be taken back, the oldest are dropped, and of the moves taken back
+        self.history = deque(maxlen=self.undoDepth)
+        self.redoMoves = []
+        # The circuit compiled for the backend, as (version, compiled circuit) by whether it measures
+        self.compiled = {}
+        self._createInitState(boardSeed, enableEntanglement, nRandOneQGates, nRandTwoQGates, simulate)
 
-    def _createInitState(self, boardSeed, enableEntanglement, nRandOneQGates, nRandTwoQGates):
+    def _createInitState(self, boardSeed, enableEntanglement, nRandOneQGates, nRandTwoQGates, simulate=True):
         """
         Randomizes the initial state
         :param all: see definition of __init__
@@ -59,14 +158,80 @@ class Board:
             for i in range(nRandTwoQGates):
                 gate = randint(0, len(gates))
                 self._doRandGate(gates[gate])
-        self.findBellPairs()
+        # The moves of the players follow the barrier, a noisy backend adds noise after them
+        self.qc.barrier()
+        # One simulation gives the Bell pairs and everything shown while betting, unless the catalog holds them
+        if self.catalog is not None and self.backend.wavevectors and \
+                self.catalog.covers(boardSeed, self.size, enableEntanglement, nRandOneQGates, nRandTwoQGates):
+            count("board.catalog.hits")
+            self.setAnalytics(self.catalog.analytics(boardSeed).withVersion(self.version))
+        elif simulate:
+            self.setAnalytics(self.getAnalytics())
 
     def getSize(self):
         return self.size
 
     def getBellPairs(self):
+        count("board.bellPairs.calls")
         return self.previousBellPairs
 
+    def getCachedAnalytics(self):
+        """
+        :return: The BoardAnalytics of the current circuit, or None if they have not been computed
+        """
+        analytics = self._currentAnalytics()
+        if analytics is not None:
+            count("board.analytics.cacheHits")
+        return analytics
+
+    def getEntanglement(self):
+        """
+        :return: The entanglement.Entanglement of the current circuit, simulated only if its analytics are not known
+        """
+        analytics = self._currentAnalytics()
+        if analytics is None:
+            analytics = self.getAnalytics()
+            self.setAnalytics(analytics)
+        return analytics.getEntanglement()
+
+    def _currentAnalytics(self):
+        if self.analytics is not None and self.analytics.version == self.version:
+            return self.analytics
+        return None
+
+    def setAnalytics(self, analytics):
+        """
+        Keeps analytics computed elsewhere, e.g. in another thread, unless the circuit has changed since.
+        :return: Whether the analytics are up to date
+        """
+        if analytics.version != self.version:
+            # Still useful to take a move back
+            for checkpoint in self.history:
+                if checkpoint.version == analytics.version and checkpoint.analytics is None:
+                    checkpoint.analytics = analytics
+            return False
+        self.analytics = analytics
+        self.previousBellPairs = analytics.bellPairs
+        return True
+
+    @timed("board.getAnalytics")
+    def getAnalytics(self, qc=None, version=None):
+        """
+        Simulates a circuit once and derives the probabilities and Bell pairs from that wavevector. Only reads the
+        board, so it can run in another thread on a copy of the circuit.
+        :param qc: The circuit, e.g. a copy of the circuit of the board. Defaults to the circuit of the board.
+        :param version: The version of the board qc was copied from. Defaults to the current version.
+        :return: BoardAnalytics
+        """
+        return self.analyticsFromPsi(self.getPsi(qc), self.version if version is None else version)
+
+    def analyticsFromPsi(self, psi, version):
+        """
+        :param psi: The wavevector of the circuit of the given version of the board
+        :return: BoardAnalytics
+        """
+        return BoardAnalytics(version, psi, self.getProbs01(psi), self.getProbsPlusMinus(psi), self._bellPairs(psi))
+
     def playerMoveInteractive(self, gate, gateCoords):
         """
         Applies a set playermove by applying gate to qubits at gatecoord.
@@ -74,61 +239,197 @@ class Board:
         :param gateCoords: The coordinate at which the gate is to be applied. Contains up to 3 coordinates.
         :return: None
         """
+        self.redoMoves = []
+        self._move(gate, self.gateCoordinates(gate, gateCoords))
+
+    def _move(self, gate, coords, analytics=None):
+        """
+        :param analytics: The BoardAnalytics after the move, if known
+        """
+        self.history.append(Checkpoint(gate, coords, len(self.qc.data), self.version, self._currentAnalytics()))
+        key = (self.version, gate, coords)
+        self.version += 1
+        self._applyGate(self.qc, gate, coords)
+        if key in self.moveAnalytics:
+            count("board.moveAnalytics.hits")
+            analytics = self.moveAnalytics[key]
+        self.moveAnalytics = {}
+        if analytics is not None:
+            self.setAnalytics(analytics.withVersion(self.version))
+
+    def undo(self):
+        """
+        Takes back the last move in constant time, without simulating. The circuit is cut back to its length before the
+        move, and the analytics from before the move are restored from its checkpoint, or else derived from the
+        current wavevector by the inverse of the gate.
+        :return: The gate of the move, or None if there is no move to take back
+        """
+        if len(self.history) == 0:
+            return None
+        checkpoint = self.history.pop()
+        current = self._currentAnalytics()
+        before = checkpoint.analytics
+        if before is None and current is not None:
+            before = self._stepAnalytics(current, checkpoint.gate, checkpoint.coords, inverse=True)
+        del self.qc.data[checkpoint.length:]
+        self.redoMoves.append(Checkpoint(checkpoint.gate, checkpoint.coords, None, None, current))
+        self.version += 1
+        self.moveAnalytics = {}
+        if before is not None:
+            self.setAnalytics(before.withVersion(self.version))
+        count("board.undo")
+        return checkpoint.gate
+
+    def redo(self):
+        """
+        Makes the last move taken back with undo again, reusing the analytics it had.
+        :return: The gate of the move, or None if there is no move to make again
+        """
+        if len(self.redoMoves) == 0:
+            return None
+        checkpoint = self.redoMoves.pop()
+        after = checkpoint.analytics
+        current = self._currentAnalytics()
+        if after is None and current is not None:
+            after = self._stepAnalytics(current, checkpoint.gate, checkpoint.coords)
+        self._move(checkpoint.gate, checkpoint.coords, after)
+        count("board.redo")
+        return checkpoint.gate
+
+    def _stepAnalytics(self, analytics, gate, coords, inverse=False):
+        # The analytics after applying gate, or its inverse, to the wavevector of analytics
+        if isinstance(analytics.psi, DensityMatrix):
+            # A noisy move cannot be inverted or repeated without the backend, the circuit is simulated again
+            return None
+        if isinstance(analytics.psi, MatrixProductState):
+            return self.analyticsFromPsi(analytics.psi.applyGate(gate, coords, inverse), None)
+        psis, probs01, probsPlusMinus, bellPairs = moveAnalytics(analytics.psi, gate, [coords], self.size, inverse)
+        return BoardAnalytics(None, psis[0], probs01[0], probsPlusMinus[0], bellPairs[0])
+
+    def _applyGate(self, qc, gate, gateCoords):
+        """
+        Applies gate to qubits at gateCoords of qc, the circuit of the board or a copy of it.
+        """
         if gate == "H":
-            self.qc.h(self.q[int(gateCoords[0])])
+            qc.h(self.q[int(gateCoords[0])])
 
         elif gate == "X":
-            self.qc.x(self.q[int(gateCoords[0])])
+            qc.x(self.q[int(gateCoords[0])])
 
         elif gate == "Z":
-            self.qc.z(self.q[int(gateCoords[0])])
+            qc.z(self.q[int(gateCoords[0])])
 
         elif gate == "ID":
             pass
 
         elif gate == "SRX":
-            self.qc.u3(pi/2, pi/2, -pi/2, self.q[int(gateCoords[0])])
+            qc.u3(pi/2, pi/2, -pi/2, self.q[int(gateCoords[0])])
 
         elif gate == "CX":
             qubit1 = int(gateCoords[0])
             qubit2 = int(gateCoords[1])
-            self.qc.cx(self.q[qubit1],
-                       self.q[qubit2])
+            qc.cx(self.q[qubit1],
+                  self.q[qubit2])
 
         elif gate == "CH":
             qubit1 = int(gateCoords[0])
             qubit2 = int(gateCoords[1])
-            self.qc.ch(self.q[qubit1],
-                       self.q[qubit2])
+            qc.ch(self.q[qubit1],
+                  self.q[qubit2])
 
         elif gate == "SWAP":
             qubit1 = int(gateCoords[0])
             qubit2 = int(gateCoords[1])
-            self.qc.swap(self.q[qubit1],
-                         self.q[qubit2])
+            qc.swap(self.q[qubit1],
+                    self.q[qubit2])
 
         elif gate == "CCX":
             qubit1 = int(gateCoords[0])
             qubit2 = int(gateCoords[1])
             qubit3 = int(gateCoords[2])
-            self.qc.ccx(self.q[qubit1],
-                        self.q[qubit2],
-                        self.q[qubit3])
+            qc.ccx(self.q[qubit1],
+                   self.q[qubit2],
+                   self.q[qubit3])
 
         elif gate == "ZH":
-            self.qc.z(self.q[int(gateCoords[0])])
-            self.qc.h(self.q[int(gateCoords[0])])
+            qc.z(self.q[int(gateCoords[0])])
+            qc.h(self.q[int(gateCoords[0])])
 
         elif gate == "SRZ":
-            self.qc.s(self.q[int(gateCoords[0])])
+            qc.s(self.q[int(gateCoords[0])])
 
-    def getProbsPlusMinus(self):
+    def getGateQubits(self, gate):
+        """
+        :return: Number of qubits of gate
+        """
+        return 2 if gate in self.doubleGates else (3 if gate in self.tripleGates else 1)
+
+    def gateCoordinates(self, gate, gateCoords):
+        """
+        :return: The coordinates a gate is applied to, as a tuple of as many ints as the gate has qubits
+        """
+        return tuple(int(coord) for coord in gateCoords[0:self.getGateQubits(gate)])
+
+    def getMoves(self, gate):
+        """
+        :return: Every coordinates gate can be applied to
+        """
+        return list(permutations(range(self.size), self.getGateQubits(gate)))
+
+    @timed("board.getMoveAnalytics")
+    def getMoveAnalytics(self, gate, gateCoords, qc=None):
+        """
+        Computes the analytics of the board as they would be after a move, without changing the board. Only reads the
+        board, so it can run in another thread on a copy of the circuit.
+        :param gate: The gate
+        :param gateCoords: The coordinates of the gate
+        :param qc: A copy of the circuit of the board, defaults to a copy of the current circuit. It is changed.
+        :return: BoardAnalytics without a version
+        """
+        if qc is None:
+            qc = self.qc.copy()
+        self._applyGate(qc, gate, gateCoords)
+        return self.getAnalytics(qc).withVersion(None)
+
+    def getMovePreviews(self, gate):
+        """
+        Evaluates every move of gate on the current wavevector in one batch with numpy, without simulating the circuit.
+        The results are also kept for playerMoveInteractive.
+        :return: dict from the coordinates of each move to BoardAnalytics without a version, or None if the wavevector
+                 of the board has not been computed yet or the board is not a wavevector: wide boards have too many
+                 moves to evaluate them all, and the moves of a noisy board are simulated by its backend
+        """
+        analytics = self.getCachedAnalytics()
+        if analytics is None or isinstance(analytics.psi, stateClasses):
+            return None
+        moves = self.getMoves(gate)
+        psis, probs01, probsPlusMinus, bellPairs = moveAnalytics(analytics.psi, gate, moves, self.size)
+        previews = {}
+        for k, coords in enumerate(moves):
+            previews[coords] = BoardAnalytics(None, psis[k], probs01[k], probsPlusMinus[k], bellPairs[k])
+            self.addMoveAnalytics(self.version, gate, coords, previews[coords])
+        return previews
+
+    def addMoveAnalytics(self, version, gate, gateCoords, analytics):
+        """
+        Keeps the analytics after a move computed with getMoveAnalytics from the circuit of the given version, so that
+        playerMoveInteractive does not need to simulate it.
+        """
+        if version == self.version:
+            self.moveAnalytics[(version, gate, self.gateCoordinates(gate, gateCoords))] = analytics
+
+    @timed("board.getProbsPlusMinus")
+    def getProbsPlusMinus(self, psi=None):
         """
         Finds the probabilities that the qubits give - upon being measured in the +,- basis
+        :param psi: The wavevector of the system, simulated if not given
         :return: the probabilities
         """
+        if psi is None:
+            psi = self.getPsi()
+        if isinstance(psi, stateClasses):
+            return psi.probsPlusMinus()
         probs = zeros(self.size)
-        psi = self.getPsi()
         for qbit in range(self.size):
             dist = 2**qbit
             gaps = 2**(qbit+1)
@@ -137,13 +438,18 @@ class Board:
                     probs[qbit] += power(absolute(psi[i + j * gaps] - psi[i + j * gaps + dist]), 2)
         return probs / 2
 
-    def getProbs01(self):
+    @timed("board.getProbs01")
+    def getProbs01(self, psi=None):
         """
         Finds the probabilities that the qubits give 1 upon being measured in the 1,0 basis
+        :param psi: The wavevector of the system, simulated if not given
         :return: the probabilities
         """
+        if psi is None:
+            psi = self.getPsi()
+        if isinstance(psi, stateClasses):
+            return psi.probs01()
         probabilities = empty(self.size)
-        psi = self.getPsi()
         for i in range(self.size):
             probabilities[i] = (self.readProbability(i, psi))
         return probabilities
@@ -160,6 +466,7 @@ class Board:
                 probability += abs(psi[index]) ** 2
         return probability
 
+    @timed("board.getBellStateProbs")
     def getBellStateProbs(self, coords, psi):
         """
         A two-qubit state can use the four 2-qubit bell-states as a basis. Finds the probabilities that the system will
@@ -168,6 +475,8 @@ class Board:
         :param psi: The wavevector of the system.
         :return: The probabilities
         """
+        if isinstance(psi, stateClasses):
+            return psi.bellStateProbs(coords)
         order = array([where(coords==i)[0][0] for i in sort(coords)])
         probs = zeros(4)
         dist = array([0, 2**(coords[0]), 2**(coords[1]),  2**(coords[0])+2**(coords[1])])
@@ -185,6 +494,7 @@ class Board:
                                                psi[i + j*gaps[0]+k*gaps[1] + dist[2]]), 2)
         return probs/2
 
+    @timed("board.getBellStateProbs3")
     def getBellStateProbs3(self, coords, psi):
         """
         A three-qubit state can use the eight 3-qubit bell-states as a basis. Finds the probabilities that the system will
@@ -193,6 +503,8 @@ class Board:
         :param psi: The wavevector of the system.
         :return: The probabilities
         """
+        if isinstance(psi, stateClasses):
+            return psi.bellStateProbs(coords)
         order = array([where(coords==i)[0][0] for i in sort(coords)])
         probs = zeros(8)
         dist = array([0, 2**coords[2], 2**coords[1], 2**coords[0], 2**coords[1]+2**coords[2], 2**coords[0]+2**coords[2],
@@ -210,29 +522,76 @@ class Board:
                                          psi[i + j * gaps[0] + k * gaps[1] + l * gaps[2] + dist[7 - index]]), 2)
         return probs/2
 
-    def getPsi(self):
+    @timed("board.getPsi")
+    def getPsi(self, qc=None):
         """
         Finds the wavevector of the system
-        :return: The wavevector of the system
+        :param qc: The circuit to simulate, defaults to the circuit of the board
+        :return: The wavevector of the system, or a MatrixProductState or DensityMatrix if the backend simulates those
         """
-        return execute(self.qc, BasicAer.get_backend("statevector_simulator"), shots=1).result()\
-                          .get_statevector(self.qc)
+        count("board.simulations")
+        if qc is None:
+            return self.backend.statevectors([self.getCompiled()])[0]
+        return self.backend.statevector(qc)
 
+    def getCircuitKey(self):
+        """
+        :return: A hashable description of the circuit, equal for boards with the same gates on the same qubits
+        """
+        index = {qubit: i for i, qubit in enumerate(self.qc.qubits)}
+        return tuple((instruction.operation.name, tuple(index[qubit] for qubit in instruction.qubits),
+                      tuple(instruction.operation.params)) for instruction in self.qc.data)
+
+    def getCompiled(self, measured=False):
+        """
+        :param measured: Whether to measure every qubit at the end of the circuit
+        :return: The circuit of the board compiled for its backend, compiled again only when the circuit has changed
+        """
+        version, compiled = self.compiled.get(measured, (None, None))
+        if version != self.version:
+            count("board.compilations")
+            compiled = self.backend.compile(self.qc, measured)
+            self.compiled[measured] = (self.version, compiled)
+        return compiled
+
+    def getScoreDistribution(self, psi=None):
+        """
+        :param psi: The wavevector of the system, simulated if not given
+        :return: Array with the probability of each score, i.e. of measuring k ones, for k from 0 to the size
+        """
+        if psi is None:
+            psi = self.getPsi()
+        if isinstance(psi, stateClasses):
+            return psi.scoreDistribution()
+        ones = array([bin(index).count("1") for index in range(2 ** self.size)])
+        return bincount(ones, weights=abs(psi) ** 2, minlength=self.size + 1)
+
+    def measure(self):
+        """
+        Measures every qubit of the board, without changing its circuit.
+        :return: The measured bitstring, with qubit 0 rightmost
+        """
+        return measureBoards([self])[0]
+
+    @timed("board.findBellPairs")
     def findBellPairs(self):
         """
         Searches the system for qubits in a two-qubit Bell-state
         :return: List[tuple[int1, int2], ], where each tuple corresponds to one Bell pair
         """
+        self.previousBellPairs = self._bellPairs(self.getPsi())
+        return self.previousBellPairs
+
+    def _bellPairs(self, psi):
+        if isinstance(psi, stateClasses):
+            return psi.bellPairs()
         pairs = []
-        psi = self.getPsi()
         for i in range(self.size - 1):
             for j in range(i + 1, self.size):
                 bellStateProbs = list(self.getBellStateProbs((i, j), psi))
                 bellStateProbs.sort(reverse=True)
                 if abs(bellStateProbs[0]-1) < 1e-4:
                     pairs.append((i, j))
-
-        self.previousBellPairs = pairs
         return pairs
 
     def _doRandGate(self, gate):
@@ -262,3 +621,201 @@ class Board:
             self.qc.s(self.q[randint(0, self.size)])
         elif gate == "U":
             self.qc.u3(randint(0, 360)*pi/360, randint(0, 4)*pi/4, randint(0, 4)*pi/4, self.q[randint(0, self.size)])
+
+
+
+@timed("board.measureBoards")
+def measureBoards(boards):
+    """
+    Measures every qubit of boards, submitting one job per backend for all of them, without changing their circuits.
+    :return: The measured bitstring of each board, with qubit 0 rightmost
+    """
+    bitstrings = [None] * len(boards)
+    byBackend = {}
+    for i, board in enumerate(boards):
+        byBackend.setdefault(id(board.backend), []).append(i)
+    for indices in byBackend.values():
+        backend = boards[indices[0]].backend
+        results = backend.measureAll([boards[i].getCompiled(measured=True) for i in indices], shots=1)
+        for i, counts in zip(indices, results):
+            bitstrings[i] = next(iter(counts))
+    return bitstrings
+
+
+class BoardStack:
+    def __init__(self, boards, rng=None):
+        """
+        The boards of all players at a table, evaluated together. The wavevectors of the boards are held as one array
+        of shape (players, 2**size), so that the marginals, Bell probabilities, score distributions and samples of all
+        boards come from single vectorized calls, at about the cost of one board. Boards simulated as matrix product
+        states or density matrices cannot be stacked, and are evaluated one at a time.
+        :param boards: Boards of the same size
+        :param rng: numpy Generator for sampling, by default a new one
+        """
+        if len(set(board.size for board in boards)) > 1:
+            raise ValueError("The boards of a stack must have the same size")
+        self.boards = list(boards)
+        self.size = self.boards[0].size if len(self.boards) > 0 else defaultSize
+        self.rng = default_rng() if rng is None else rng
+        self.psis = None
+        self.versions = None
+        self.scores = None
+        self.distributions = None
+        self.distributionVersions = None
+
+    @timed("board.stack.simulate")
+    def simulate(self):
+        """
+        Simulates the boards whose analytics are not up to date, submitting one job per backend for all of them, and
+        derives their analytics in one vectorized call. Boards with the same circuit, e.g. all boards when a hand is
+        dealt, are simulated once.
+        """
+        byBackend = {}
+        for board in self.boards:
+            if board._currentAnalytics() is None:
+                circuits = byBackend.setdefault(id(board.backend), {})
+                circuits.setdefault(board.getCircuitKey(), []).append(board)
+        for circuits in byBackend.values():
+            groups = list(circuits.values())
+            states = groups[0][0].backend.statevectors([group[0].getCompiled() for group in groups])
+            count("board.simulations", len(groups))
+            for group, analytics in zip(groups, self._analytics([group[0] for group in groups], states)):
+                for board in group:
+                    board.setAnalytics(analytics.withVersion(board.version))
+
+    def _analytics(self, boards, states):
+        if any(isinstance(state, stateClasses) for state in states):
+            return [board.analyticsFromPsi(state, board.version) for board, state in zip(boards, states)]
+        psis = vstack([asarray(state).reshape(1, -1) for state in states])
+        probs01 = statevector.probs01(psis, self.size)
+        probsPlusMinus = statevector.probsPlusMinus(psis, self.size)
+        bellPairs = statevector.bellPairs(psis, self.size)
+        return [BoardAnalytics(board.version, psis[k], probs01[k], probsPlusMinus[k], bellPairs[k])
+                for k, board in enumerate(boards)]
+
+    def _states(self):
+        # The wavevector, MatrixProductState or DensityMatrix of each board, simulated if needed
+        self.simulate()
+        return [board.analytics.psi for board in self.boards]
+
+    def isStackable(self):
+        """
+        :return: Whether the boards have wavevectors, i.e. none of them is a matrix product state or a density matrix
+        """
+        return not any(isinstance(state, stateClasses) for state in self._states())
+
+    def getPsis(self):
+        """
+        :return: Array of shape (players, 2**size) with the wavevector of each board
+        """
+        versions = [board.version for board in self.boards]
+        if self.psis is None or versions != self.versions:
+            if not self.isStackable():
+                raise ValueError("Boards simulated as matrix product states or density matrices have no wavevector")
+            self.psis = vstack([state.reshape(1, -1) for state in self._states()])
+            self.versions = versions
+        return self.psis
+
+    def getProbs01(self):
+        """
+        :return: Array of shape (players, size) with the probabilities of measuring 1 for each qubit
+        """
+        if not self.isStackable():
+            return array([board.analytics.probs01 for board in self.boards])
+        return statevector.probs01(self.getPsis(), self.size)
+
+    def getProbsPlusMinus(self):
+        """
+        :return: Array of shape (players, size) with the probabilities of measuring - for each qubit
+        """
+        if not self.isStackable():
+            return array([board.analytics.probsPlusMinus for board in self.boards])
+        return statevector.probsPlusMinus(self.getPsis(), self.size)
+
+    def getBellStateProbs(self, qubit1, qubit2):
+        """
+        :return: Array of shape (players, 4) with the probabilities of the Bell states of two qubits, in the order of
+                 Board.getBellStateProbs
+        """
+        if not self.isStackable():
+            return array([state.bellStateProbs((qubit1, qubit2)) for state in self._states()])
+        return statevector.bellStateProbs(self.getPsis(), qubit1, qubit2, self.size)
+
+    def getBellPairs(self):
+        """
+        :return: For each board the list of pairs of qubits in a Bell state
+        """
+        self.simulate()
+        return [board.analytics.bellPairs for board in self.boards]
+
+    def getEntanglement(self):
+        """
+        The entanglement of the boards that have not been analysed yet is computed in one batch.
+        :return: For each board its entanglement.Entanglement, see BoardAnalytics.getEntanglement
+        """
+        self.simulate()
+        missing = [board.analytics for board in self.boards if board.analytics.entanglement is None]
+        if len(missing) > 0 and self.isStackable():
+            psis = vstack([analytics.psi.reshape(1, -1) for analytics in missing])
+            for analytics, result in zip(missing, entanglement.analyse(psis, self.size)):
+                analytics.entanglement = result
+        return [board.analytics.getEntanglement() for board in self.boards]
+
+    def getScoreDistributions(self):
+        """
+        :return: Array of shape (players, size + 1) with the probability of each score, i.e. of measuring k ones. It is
+                 kept until a board changes.
+        """
+        versions = [board.version for board in self.boards]
+        if self.distributions is not None and versions == self.distributionVersions:
+            return self.distributions
+        if not self.isStackable():
+            distributions = array([state.scoreDistribution() for state in self._states()])
+        else:
+            scores = self._getScores()
+            distributions = zeros((len(self.boards), self.size + 1))
+            for score in range(self.size + 1):
+                distributions[:, score] = (abs(self.getPsis()[:, scores == score]) ** 2).sum(axis=1)
+        self.distributions, self.distributionVersions = distributions, versions
+        return distributions
+
+    def _getScores(self):
+        # The score of each basis state
+        if self.scores is None:
+            self.scores = statevector.popcounts(self.size)
+        return self.scores
+
+    @timed("board.stack.sample")
+    def sample(self, shots=1):
+        """
+        Samples measurements of every qubit of all boards at once.
+        :return: Array of shape (players, shots) with the index of each measured basis state, bit i being qubit i
+        """
+        return statevector.sample(self.getPsis(), shots, self.rng)
+
+    def sampleScores(self, shots=1):
+        """
+        :return: Array of shape (players, shots) with the sampled scores of each board
+        """
+        return self._getScores()[self.sample(shots)]
+
+    @timed("board.stack.sampleScoreCounts")
+    def sampleScoreCounts(self, shots):
+        """
+        Samples many measurements of all boards in one multinomial draw from their score distributions, whose cost does
+        not depend on the number of shots. Only the scores are drawn, not the measured bitstrings.
+        :param shots: Number of measurements of each board
+        :return: Integer array of shape (players, size + 1) with the number of shots giving each score
+        """
+        distributions = clip(self.getScoreDistributions(), 0, None)
+        return self.rng.multinomial(shots, distributions / distributions.sum(axis=1, keepdims=True))
+
+    def measure(self):
+        """
+        Measures every qubit of each board once, without changing their circuits. Boards with wavevectors are sampled
+        from those without a job, the others are measured by their backends.
+        :return: The measured bitstring of each board, with qubit 0 rightmost
+        """
+        if not self.isStackable():
+            return measureBoards(self.boards)
+        return [format(int(index), "0{}b".format(self.size)) for index in self.sample()[:, 0]]
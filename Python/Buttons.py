@@ -4,11 +4,16 @@
 #          Vemund Falch <vemfal@gmail.com>
 
 from numpy import empty
+from Python.analytics import AnalyticsWorker
+from Python.metrics import timed
 
 
 class InteractiveButtons:
     def __init__(self, board, interactiveContainer, checkPlayerBet, foldPlayer, playerGates, initialGates,
-                 getPlayer):
+                 getPlayer, analytics=None):
+        """
+        :param analytics: The AnalyticsWorker that simulates the boards, by default everything is simulated at once
+        """
         self.board = board
         self.interactiveContainer = interactiveContainer
         self.coords = empty(3)
@@ -29,22 +34,139 @@ class InteractiveButtons:
 
         self.checkPlayerBet = checkPlayerBet
         self.foldPlayer = foldPlayer
+        self.analytics = AnalyticsWorker() if analytics is None else analytics
+        self.pendingAnalytics = None
+        # The outcomes of the moves of the selected gate, and the move shown on the board instead of the actual state
+        self.previews, self.previewsKey = None, None
+        self.previewing = None
 
     def getCurrentlyShowingPlayer(self):
         return self.currentlyShowingPlayer
 
+    @timed("ui.changePlayer")
     def changePlayer(self, newBoard):
         self.board = newBoard
-        self.interactiveContainer.updateProbs(self.board.getProbs01()[0:self.qubitsShowing],
-                                              self.board.getProbsPlusMinus()[0:self.qubitsShowing], self.basis,
-                                              self.sortBellPairs(self.board.getBellPairs()))
+        self.analytics.cancel("probs", "bell")
+        self.showAnalytics()
 
     def updateQubitsShowing(self, additionalQubits):
         self.qubitsShowing += additionalQubits
+        self.showAnalytics()
+
+    def showAnalytics(self):
+        """
+        Shows the probabilities and Bell pairs of the current board. If the board has changed since they were last
+        computed, they are simulated by the analytics worker from a copy of the circuit and shown when ready.
+        """
+        board = self.board
+        self.previewing = None
+        analytics = board.getCachedAnalytics()
+        if analytics is not None:
+            self.analytics.cancel("probs")
+            self._updateProbs(analytics)
+            return
+        if self.analytics.isPending("probs") and self.pendingAnalytics == (board, board.version):
+            # Already being simulated, e.g. when the basis is changed right after a gate
+            return
+        self.pendingAnalytics = (board, board.version)
+        self.analytics.submit("probs", board.getAnalytics, (board.qc.copy(), board.version),
+                              lambda analytics: self._onAnalytics(board, analytics))
+
+    def _onAnalytics(self, board, analytics):
+        if board.setAnalytics(analytics) and board is self.board:
+            self._updateProbs(analytics)
+            self.interactiveContainer.updateBoard()
+
+    def _updateProbs(self, analytics):
+        self.interactiveContainer.updateProbs(analytics.probs01[0:self.qubitsShowing],
+                                              analytics.probsPlusMinus[0:self.qubitsShowing], self.basis,
+                                              self.sortBellPairs(analytics.bellPairs),
+                                              self.sortGhzTriples(analytics.getEntanglement().ghzTriples))
 
-        self.interactiveContainer.updateProbs(self.board.getProbs01()[0:self.qubitsShowing],
-                                              self.board.getProbsPlusMinus()[0:self.qubitsShowing], self.basis,
-                                              self.sortBellPairs(self.board.getBellPairs()))
+    def preview(self, qubit):
+        """
+        Shows the board as it would be if the selected gate was completed at qubit, and the actual board when qubit is
+        None or would not complete a move. The outcomes of all moves of the gate are evaluated in one batch when they
+        are first needed, so moving the mouse never simulates anything.
+        :param qubit: The qubit under the mouse, or None
+        """
+        coords, analytics = None, None
+        if self.buttonIsGate and qubit is not None and qubit < self.qubitsShowing and \
+                self.nFilledQBits == self.nQBits - 1 and qubit not in self.coords[0:self.nFilledQBits]:
+            coords = tuple(int(coord) for coord in self.coords[0:self.nFilledQBits]) + (qubit,)
+            previews = self._getPreviews()
+            analytics = None if previews is None else previews.get(coords)
+            if analytics is None:
+                coords = None
+        if coords == self.previewing:
+            return
+        self.previewing = coords
+        if analytics is None:
+            analytics = self.board.getCachedAnalytics()
+            if analytics is None:
+                # The board is still being simulated and is shown when ready
+                return
+        self._updateProbs(analytics)
+        self.interactiveContainer.updateBoard()
+
+    def _getPreviews(self):
+        key = (self.board, self.board.version, self.button)
+        if self.previewsKey != key:
+            self.previews = self.board.getMovePreviews(self.button)
+            self.previewsKey = key if self.previews is not None else None
+        return self.previews
+
+    def undo(self):
+        """
+        Takes back the last gate applied to the current board.
+        :return: The gate, or None if there was nothing to take back
+        """
+        gate = self.board.undo()
+        if gate is not None:
+            self._showMove()
+        return gate
+
+    def redo(self):
+        """
+        Applies the last gate taken back with undo again.
+        :return: The gate, or None if there was nothing to apply again
+        """
+        gate = self.board.redo()
+        if gate is not None:
+            self._showMove()
+        return gate
+
+    def _showMove(self):
+        self.changeCurrentButton(None, updateColor=False)
+        self.analytics.cancel("bell")
+        self.interactiveContainer.unshowBellProbs()
+        self.showAnalytics()
+
+    def showBellProbs(self, coords):
+        """
+        Shows the probabilities of the Bell states of 2 or 3 qubits of the current board, simulated by the
+        analytics worker unless the wavevector of the board is known.
+        :param coords: The qubits
+        """
+        board = self.board
+        analytics = board.getCachedAnalytics()
+        if analytics is not None:
+            self.analytics.cancel("bell")
+            self._updateBellProbs(coords, bellStateProbs(board, coords, analytics.psi))
+            return
+        self.analytics.submit("bell", getBellStateProbs, (board, coords, board.qc.copy()),
+                              lambda bellProbs: self._onBellProbs(board, coords, bellProbs))
+
+    def _onBellProbs(self, board, coords, bellProbs):
+        if board is self.board:
+            self._updateBellProbs(coords, bellProbs)
+            self.interactiveContainer.updateBoard()
+
+    def _updateBellProbs(self, coords, bellProbs):
+        if len(coords) == 2:
+            self.interactiveContainer.updateBellProbs2(bellProbs)
+        else:
+            self.interactiveContainer.updateBellProbs3(bellProbs)
 
     def changeCurrentButton(self, newButton, updateColor=True):
         if self.button is not None:
@@ -57,6 +179,8 @@ class InteractiveButtons:
             self.buttonIsGate = False
         self.nFilledQBits = 0
         self.button = newButton
+        if self.previewing is not None:
+            self.preview(None)
 
     def H(self, event):
         self.changeCurrentButton('H')
@@ -119,9 +243,7 @@ class InteractiveButtons:
             self.interactiveContainer.setGateColor('Basis', self.interactiveContainer.getNormalColors()[0])
         else:
             self.interactiveContainer.setGateColor('Basis', self.interactiveContainer.getNormalColors()[1])
-        self.interactiveContainer.updateProbs(self.board.getProbs01()[0:self.qubitsShowing],
-                                              self.board.getProbsPlusMinus()[0:self.qubitsShowing], self.basis,
-                                              self.sortBellPairs(self.board.getBellPairs()))
+        self.showAnalytics()
         self.interactiveContainer.setGateText('Basis', self.basisText[self.basis])
         self.interactiveContainer.updateBoard()
 
@@ -155,6 +277,7 @@ class InteractiveButtons:
     def checkButton(self, event):
         self.checkPlayerBet()
 
+    @timed("ui.mouseClick")
     def mouseClick(self, qubit):
         """
         Called when the user has clicked a qubit on the board.
@@ -172,16 +295,15 @@ class InteractiveButtons:
         if self.nFilledQBits == self.nQBits:
             if self.buttonIsGate:
                 self.board.playerMoveInteractive(self.button, self.coords)
-                self.interactiveContainer.updateProbs(self.board.getProbs01(), self.board.getProbsPlusMinus(),
-                                                      self.basis, self.board.findBellPairs())
+                # A Bell check still being simulated is for the board before this gate
+                self.analytics.cancel("bell")
                 self.interactiveContainer.unshowBellProbs()
+                self.showAnalytics()
                 isGate = True
             if self.button == "Bell2":
-                bellProbs = self.board.getBellStateProbs(self.coords[0:2], self.board.getPsi())
-                self.interactiveContainer.updateBellProbs2(bellProbs)
+                self.showBellProbs(self.coords[0:2].copy())
             if self.button == "Bell3":
-                bellProbs = self.board.getBellStateProbs3(self.coords, self.board.getPsi())
-                self.interactiveContainer.updateBellProbs3(bellProbs)
+                self.showBellProbs(self.coords.copy())
             button = self.button
             self.changeCurrentButton(None, updateColor=False)
             self.interactiveContainer.updateBoard()
@@ -193,3 +315,20 @@ class InteractiveButtons:
             if bellPairs[i][0] < self.qubitsShowing and bellPairs[i][1] < self.qubitsShowing:
                 showingBellPairs.append(bellPairs[i])
         return showingBellPairs
+
+    def sortGhzTriples(self, ghzTriples):
+        return [triple for triple in ghzTriples if max(triple) < self.qubitsShowing]
+
+
+def bellStateProbs(board, coords, psi):
+    """
+    :return: The probabilities of the Bell states of the 2 or 3 qubits coords in the wavevector psi of board
+    """
+    if len(coords) == 2:
+        return board.getBellStateProbs(coords, psi)
+    return board.getBellStateProbs3(coords, psi)
+
+
+def getBellStateProbs(board, coords, qc):
+    # Runs in the thread of the analytics worker, on a copy of the circuit of the board
+    return bellStateProbs(board, coords, board.getPsi(qc))
@@ -61,7 +61,6 @@ class Button(AxesWidget):
 
         self.connect_event('button_press_event', self._click)
         self.connect_event('button_release_event', self._release)
-        #self.connect_event('motion_notify_event', self._motion)
         ax.set_navigate(False)
         ax.set_facecolor(color)
         ax.set_xticks([])
@@ -94,26 +93,14 @@ class Button(AxesWidget):
         if event.inaxes != self.ax:
             return
         self.isIterating = True
-        for cid, func in self.observers.items():
+        # Iterate over a copy, an observer may connect a new callback to this button (e.g. "End" becoming "Next")
+        for cid, func in list(self.observers.items()):
             func(event)
         self.isIterating = False
         if self.deleteFunc is not None:
-            del self.observers[self.deleteFunc]
+            self.observers.pop(self.deleteFunc, None)
             self.deleteFunc = None
 
-    def _motion(self, event):
-        if self.ignore(event):
-            return
-        if event.inaxes == self.ax:
-            c = self.hovercolor
-        else:
-            c = self.color
-        if c != self._lastcolor:
-            self.ax.set_facecolor(c)
-            self._lastcolor = c
-            if self.drawon:
-                self.ax.figure.canvas.draw()
-
     def on_clicked(self, func):
         """
         Connect the callback function *func* to button click events.
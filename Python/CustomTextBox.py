@@ -80,14 +80,15 @@ class TextBox(AxesWidget):
 
         self.cursor_index = 0
 
-        # Because this is initialized, _render_cursor
-        # can assume that cursor exists.
+        # The cursor is created once and moved by _rendercursor
         self.cursor = self.ax.vlines(0, 0, 0)
         self.cursor.set_visible(False)
+        self.textSizes = {}
+        # BlitRenderer of the figure, if any
+        self.renderer = None
 
         self.connect_event('button_press_event', self._click)
         self.connect_event('button_release_event', self._release)
-        #self.connect_event('motion_notify_event', self._motion)
         self.connect_event('key_press_event', self._keypress)
         self.connect_event('resize_event', self._resize)
         ax.set_navigate(False)
@@ -107,32 +108,41 @@ class TextBox(AxesWidget):
                             horizontalalignment='left',
                             transform=self.ax.transAxes, fontsize=12)
 
-    def _rendercursor(self):
-        # this is a hack to figure out where the cursor should go.
-        # we draw the text up to where the cursor should go, measure
-        # and save its dimensions, draw the real text, then put the cursor
-        # at the saved dimensions
+    def _getRenderer(self):
+        return self.ax.figure.canvas.get_renderer()
+
+    def _textSize(self, string):
+        """
+        Measures a string in the font of the text box with the renderer, without drawing the figure. The results are
+        cached, the text box mostly shows prefixes of the same few strings.
+        :return: Width and height in pixels
+        """
+        if string not in self.textSizes:
+            renderer = self._getRenderer()
+            width, height, descent = renderer.get_text_width_height_descent(
+                string, self.text_disp.get_fontproperties(), ismath=False)
+            self.textSizes[string] = (width, height)
+        return self.textSizes[string]
+
+    def _redraw(self):
+        # Only the text box has changed, so it is blitted if the figure has a BlitRenderer
+        if self.renderer is None:
+            self.ax.figure.canvas.draw_idle()
+        else:
+            self.renderer.damage(self.ax)
+            self.renderer.draw()
 
+    def _rendercursor(self):
+        # The cursor goes at the end of the text up to the cursor index, and is as high as a character
         widthtext = self.text[:self.cursor_index]
-        no_text = False
-        if(widthtext == "" or widthtext == " " or widthtext == "  "):
-            no_text = widthtext == ""
-            widthtext = ","
-
-        wt_disp = self._make_text_disp(widthtext)
-
-        self.ax.figure.canvas.draw()
-        bb = wt_disp.get_window_extent()
-        inv = self.ax.transData.inverted()
-        bb = inv.transform(bb)
-        wt_disp.set_visible(False)
-        if no_text:
-            bb[1, 0] = bb[0, 0]
-        # hack done
-        self.cursor.set_visible(False)
+        width = self._textSize(widthtext)[0] if widthtext.strip() != "" else 0
+        height = self._textSize(",")[1]
 
-        self.cursor = self.ax.vlines(bb[1, 0], bb[0, 1], bb[1, 1])
-        self.ax.figure.canvas.draw()
+        axWidth, axHeight = self.ax.bbox.width, self.ax.bbox.height
+        x = self.DIST_FROM_LEFT + width / axWidth
+        self.cursor.set_segments([[(x, 0.5 - height / axHeight / 2), (x, 0.5 + height / axHeight / 2)]])
+        self.cursor.set_visible(self.capturekeystrokes)
+        self._redraw()
 
     def _notify_submit_observers(self):
         for cid, func in self.submit_observers.items():
@@ -178,8 +188,7 @@ class TextBox(AxesWidget):
                     self.text = (self.text[:self.cursor_index] +
                                  self.text[self.cursor_index + 1:])
 
-            self.text_disp.remove()
-            self.text_disp = self._make_text_disp(self.text)
+            self.text_disp.set_text(self.text)
             self._rendercursor()
             self._notify_change_observers()
             if key == "enter":
@@ -191,8 +200,8 @@ class TextBox(AxesWidget):
         if self.text == newval:
             return
         self.text = newval
-        self.text_disp.remove()
-        self.text_disp = self._make_text_disp(self.text)
+        self.text_disp.set_text(self.text)
+        self.cursor_index = min(self.cursor_index, len(self.text))
         self._rendercursor()
 
 
@@ -225,7 +234,7 @@ class TextBox(AxesWidget):
             notifysubmit = True
         self.capturekeystrokes = False
         self.cursor.set_visible(False)
-        self.ax.figure.canvas.draw()
+        self._redraw()
 
 
 
@@ -235,14 +244,8 @@ class TextBox(AxesWidget):
         if len(self.text) == 0:
             self.cursor_index = 0
         else:
-            bb = self.text_disp.get_window_extent()
-
-            trans = self.ax.transData
-            inv = self.ax.transData.inverted()
-            bb = trans.transform(inv.transform(bb))
-
-            text_start = bb[0, 0]
-            text_end = bb[1, 0]
+            text_start = self.ax.transAxes.transform((self.DIST_FROM_LEFT, 0.5))[0]
+            text_end = text_start + self._textSize(self.text)[0]
 
             ratio = (x - text_start) / (text_end - text_start)
 
@@ -271,22 +274,9 @@ class TextBox(AxesWidget):
         self.position_cursor(event.x)
 
     def _resize(self, event):
+        self.textSizes = {}
         self.stop_typing()
 
-    def _motion(self, event):
-        if self.ignore(event):
-            return
-        if event.inaxes == self.ax:
-            c = self.hovercolor
-        else:
-            c = self.color
-        if c != self._lastcolor:
-            self.ax.set_facecolor(c)
-            self._lastcolor = c
-            if self.drawon:
-                self.ax.figure.canvas.draw()
-
-
     def on_text_change(self, func):
         """
         When the text changes, call this *func* with event.
@@ -6,31 +6,81 @@
 from os.path import dirname, abspath
 import sys
 sys.path.append(dirname(abspath(__file__)))
-from Python.interactive import InteractiveContainer
-from Python.Board import Board
+from Python.Board import Board, BoardStack, defaultSize, initGates
+from Python.backends import chooseBackend, DensityMatrixBackend
 from Python.Buttons import InteractiveButtons
+from Python.analytics import AnalyticsWorker
 from Python.helpFiles import distributeGates
+from Python.metrics import timed, count
 from numpy import amax, array, sum, empty, append, argwhere, copy, any, in1d, argsort, zeros
-from qiskit import execute, Aer
 from time import time
 
+# matplotlib (through Python.interactive) and qiskit are imported where they are used, so that importing this module
+# does not pay for them. See checkImportTime.py.
+
 
 class PokerGame:
     def __init__(self, deckOfGates, nPlayers, money, names = None, smallBlind=5, smallBlindPlayer=0,
-                 enableEntanglement=False, seed=None):
+                 enableEntanglement=False, seed=None, onGameOver=None, offscreen=False, frontEnd=None,
+                 size=defaultSize, showdownShots=1, noise=None, catalog=None):
+        # The initial boards are looked up in the BoardCatalog instead of simulated, and hands are dealt from its seeds
+        self.catalog = catalog
         if seed == None:
-            seed = int(time())
-        self.boards = [Board(boardSeed=seed, enableEntanglement=enableEntanglement) for i in range(nPlayers)]
-
+            seed = self._newSeed()
+        # Number of qubits of each board, every one of them randomized in the initial state
+        self.size = size
+        # One backend for the whole table, able to simulate every gate of the deck and of the initial states. Boards too
+        # wide for a wavevector are simulated as matrix product states. A noisy table, e.g. with
+        # noise={"depolarizing": 0.01, "amplitudeDamping": 0.02}, is simulated with density matrices.
+        if noise is None:
+            self.backend = chooseBackend(size, set(deckOfGates) | set(initGates))
+        else:
+            self.backend = DensityMatrixBackend(**noise)
+            if not self.backend.supports(size, set(deckOfGates) | set(initGates)):
+                raise ValueError("Noisy boards are limited to {} qubits and the gates {}"
+                                 .format(self.backend.maxQubits, sorted(self.backend.gates)))
+        self.boards = [Board(boardSeed=seed, enableEntanglement=enableEntanglement, nRandOneQGates=size, size=size,
+                             backend=self.backend, simulate=False, catalog=catalog) for i in range(nPlayers)]
+        # All boards are evaluated together, their initial states simulated in one job
+        self.boardStack = BoardStack(self.boards)
+        self.boardStack.simulate()
+
+        # Number of measurements of each board at the showdown. The first decides the hand, and if there are more the
+        # scores of all shots are shown as a histogram beside the Bell window.
+        self.showdownShots = showdownShots
+        self.deckOfGates = deckOfGates
+        self.enableEntanglement = enableEntanglement
         self.playerGates = distributeGates(deckOfGates, nPlayers)
-        self.interactive = InteractiveContainer(nPlayers, self.boards[0].getSize(), deckOfGates,
-                                                [str(i) for i in range(nPlayers)] if (names is None) else names)
+        if frontEnd is None:
+            from Python.interactive import InteractiveContainer
+            self.interactive = InteractiveContainer(nPlayers, self.boards[0].getSize(), deckOfGates,
+                                                    [str(i) for i in range(nPlayers)] if (names is None) else names,
+                                                    offscreen=offscreen)
+        else:
+            # e.g. ViewModel, which has the interface of InteractiveContainer without drawing anything
+            self.interactive = frontEnd(nPlayers, self.boards[0].getSize(), deckOfGates,
+                                        [str(i) for i in range(nPlayers)] if (names is None) else names)
+        # Simulates the boards in the background if the front end has an event loop to hand back the results
+        self.analytics = AnalyticsWorker(self.interactive.newPollTimer(20))
         self.interactiveButtons = InteractiveButtons(self.boards[0], self.interactive, self.check, self.fold,
-                                                     self.playerGates, deckOfGates, self.getPlayer)
+                                                     self.playerGates, deckOfGates, self.getPlayer, self.analytics)
 
         self.names = names
-        self.nPlayers = nPlayers
         self.smallBlind = smallBlind
+        self.onGameOver = onGameOver
+        self._resetHandState(nPlayers, money, smallBlindPlayer)
+
+        self.interactive.connectBets(self.interactiveButtons, self.convertRaiseToInt)
+        self.interactive.connectMouseclick(self.mouseClick)
+        self.interactive.connectMouseHover(self.mouseHover)
+        self.interactive.connectUndo(self.undo, self.redo)
+        self.interactive.connectShowHandButton(self.interactiveButtons)
+
+        self.doBlindBets()
+        self.speculate()
+
+    def _resetHandState(self, nPlayers, money, smallBlindPlayer):
+        self.nPlayers = nPlayers
         self.allIn = empty(0, dtype=int)
         self.haveRaised = False
 
@@ -45,12 +95,93 @@ class PokerGame:
         self.lastRaiser = (smallBlindPlayer+1)%self.nPlayers
         self.currentBet = self.smallBlind*2
         self.gameOver = False
+        # Number of shots giving each score for each board at the last multi-shot showdown, zero for folded players
+        self.showdownCounts = None
+
+    def _newSeed(self):
+        # A seed from the time, within the seeds of the catalog if there is one
+        seed = int(time())
+        if self.catalog is not None:
+            seed = self.catalog.firstSeed + seed % self.catalog.stateOfSeed.shape[0]
+        return seed
+
+    def newHand(self, money, names=None, smallBlindPlayer=0, seed=None):
+        """
+        Deals a new hand on the same table. The figure, its widgets, the boards and the simulators are reused, only
+        their state is reset, so no window or qiskit backend has to be created again.
+        :param money: Array with the money of each player still in the game
+        :param names: Names of the players, defaults to the names of the previous hand
+        :param smallBlindPlayer: The player who places the small blind
+        :param seed: The seed used to create the initial board state
+        :return: None
+        """
+        if seed == None:
+            seed = self._newSeed()
+        nPlayers = len(money)
+        if names is not None:
+            self.names = names
+
+        # Results for the boards of the previous hand must not be shown
+        self.analytics.cancel()
+        self.boards = self.boards[:nPlayers]
+        for board in self.boards:
+            board.reset(boardSeed=seed, enableEntanglement=self.enableEntanglement, nRandOneQGates=self.size,
+                        simulate=False)
+        while len(self.boards) < nPlayers:
+            self.boards.append(Board(boardSeed=seed, enableEntanglement=self.enableEntanglement,
+                                     nRandOneQGates=self.size, size=self.size, backend=self.backend, simulate=False,
+                                     catalog=self.catalog))
+        self.boardStack = BoardStack(self.boards)
+        self.boardStack.simulate()
+
+        self.playerGates = distributeGates(self.deckOfGates, nPlayers)
+        self.interactive.resetTable(nPlayers, self.deckOfGates,
+                                    [str(i) for i in range(nPlayers)] if (self.names is None) else self.names)
+        self.interactiveButtons = InteractiveButtons(self.boards[0], self.interactive, self.check, self.fold,
+                                                     self.playerGates, self.deckOfGates, self.getPlayer, self.analytics)
+        self._resetHandState(nPlayers, money, smallBlindPlayer)
 
         self.interactive.connectBets(self.interactiveButtons, self.convertRaiseToInt)
         self.interactive.connectMouseclick(self.mouseClick)
+        self.interactive.connectMouseHover(self.mouseHover)
+        self.interactive.connectUndo(self.undo, self.redo)
         self.interactive.connectShowHandButton(self.interactiveButtons)
 
         self.doBlindBets()
+        self.speculate()
+        self.interactive.updateBoard()
+
+    def speculate(self):
+        """
+        Uses the idle time while the players are betting to simulate every move of the gates in their hands, so that
+        the first gate of each player in the gate round is shown without a simulation. The boards have the same circuit
+        until the gate round, so each move is simulated once for all of them. The moves are simulated one at a time
+        in the background, so that other work of the analytics worker never waits for more than one of them. Nothing
+        is done if the analytics worker is not asynchronous, as there is then no idle time to use, or if the boards are
+        not wavevectors, as in Board.getMovePreviews: wide boards have thousands of moves that take tens of
+        milliseconds each.
+        """
+        if not self.analytics.isAsynchronous() or not self.backend.wavevectors:
+            return
+        board = self.boards[0]
+        gates = sorted(set(gate for hand in self.playerGates for gate in hand))
+        moves = [(gate, coords) for gate in gates for coords in board.getMoves(gate)]
+        self._speculateNext(board, board.qc.copy(), moves, [(board, board.version) for board in self.boards])
+
+    def _speculateNext(self, board, qc, moves, versions):
+        # Only boards that are still at the version the moves were simulated for can use them
+        versions = [(other, version) for other, version in versions if other.version == version]
+        if len(moves) == 0 or len(versions) == 0:
+            return
+        gate, coords = moves[0]
+
+        def onDone(analytics):
+            count("game.speculatedMoves")
+            for other, version in versions:
+                other.addMoveAnalytics(version, gate, coords, analytics)
+            self._speculateNext(board, qc, moves[1:], versions)
+
+        self.analytics.submit("speculate", board.getMoveAnalytics, (gate, coords, qc.copy()), onDone)
 
     def doBlindBets(self):
         self.playerBets[self.smallBlindPlayer] += self.smallBlind
@@ -61,6 +192,7 @@ class PokerGame:
         self.interactive.updateCurrentBets(self.playerBets, self.playerMoney)
         self.interactive.setPlayerPatchColor(self.player, self.interactive.getCurrentPlayerColor()[0])
 
+    @timed("game.advanceGame")
     def advanceGame(self):
         """
         Moves the game to the next player and round.
@@ -72,6 +204,8 @@ class PokerGame:
             self.interactive.disconnectBets()
             self.interactive.setPlayerPatchColor(self.player, self.interactive.getFoldedColor())
             self.endGame(allFolded=True)
+            if self.onGameOver is not None:
+                self.onGameOver()
             return
 
         if len(self.foldedPlayers) + self.allIn.shape[0] == self.nPlayers and self.bettingRound < 4:
@@ -127,6 +261,8 @@ class PokerGame:
                 self.interactive.setPlayerPatchColor(self.player, self.interactive.getDisconnectedColor())
                 self.interactive.disconnectAllGates()
                 self.interactive.disconnectEnd()
+                if self.onGameOver is not None:
+                    self.onGameOver()
                 return
             self.bettingRound += 1
 
@@ -188,6 +324,7 @@ class PokerGame:
         self.interactive.disconnectAllGates()
         self.advanceGame()
 
+    @timed("game.endGame")
     def endGame(self, allFolded=False):
         """
         Called when the game is supposed to end.
@@ -216,19 +353,16 @@ class PokerGame:
                     self.interactive.displayEndResults(scoresDisplay, winnings)
                     return
 
-        simulator = Aer.get_backend("qasm_simulator")
         scores = [0 for i in range(self.nPlayers)]
-        for i in range(self.nPlayers):
-            if i in self.foldedPlayers:
-                scores[i] = -1
-                continue
-
-            board = self.boards[i]
-            board.qc.measure(board.q, board.c)
-            counts = execute(board.qc, simulator, shots=1).result().get_counts(board.qc)
-            for bitStr in list(counts.keys())[0]:
-                if bitStr == "1":
-                    scores[i] += 1
+        # The boards of all players still in the game are measured together
+        players = [i for i in range(self.nPlayers) if i not in self.foldedPlayers]
+        count("game.showdownSimulations", len(players))
+        for i, bitStrs in zip(players, BoardStack([self.boards[i] for i in players]).measure()):
+            scores[i] = bitStrs.count("1")
+        for i in self.foldedPlayers:
+            scores[i] = -1
+        if self.showdownShots > 1:
+            self.showScoreHistogram(players, scores)
 
         print("\n---- Final scores----")
         winners = []
@@ -289,6 +423,21 @@ class PokerGame:
         self.gameOver = True
         self.inform("Game over. Exit to start a new game.")
 
+    @timed("game.showScoreHistogram")
+    def showScoreHistogram(self, players, scores):
+        """
+        Draws the remaining shots of a multi-shot showdown for all boards in one multinomial draw from their score
+        distributions, and shows how often each score came up. The measured score of each board is one of its shots.
+        :param players: The players still in the hand
+        :param scores: The measured score of each player
+        :return: None
+        """
+        counts = self.boardStack.sampleScoreCounts(self.showdownShots - 1)
+        counts[players, [scores[i] for i in players]] += 1
+        counts[self.foldedPlayers] = 0
+        self.showdownCounts = counts
+        self.interactive.showScoreHistogram(players, counts[players])
+
     def printWinners(self, winners, nWinners, scores, pot):
         if nWinners == 0:
             self.inform("No winners!")
@@ -398,7 +547,7 @@ class PokerGame:
 
     def inform(self, text):
         self.interactive.updateInfoText(text)
-        self.interactive.fig.canvas.draw()
+        self.interactive.updateBoard()
 
     def mouseClick(self, qubit):
         """
@@ -411,12 +560,55 @@ class PokerGame:
 
         isGate, button = self.interactiveButtons.mouseClick(qubit)
         if isGate:
-            self.playerGates[self.player][button] -= 1
-            if self.playerGates[self.player][button] == 0:
-                del self.playerGates[self.player][button]
-                self.interactive.disconnectGate(button)
-            self.interactive.updatePlayerGate(self.playerGates[self.player], hover=True, showZero=True)
+            self.useGate(button)
         self.interactive.updateBoard()
 
+    def useGate(self, gate):
+        """
+        Removes a gate that has been applied from the hand of the current player.
+        """
+        self.playerGates[self.player][gate] -= 1
+        if self.playerGates[self.player][gate] == 0:
+            del self.playerGates[self.player][gate]
+            self.interactive.disconnectGate(gate)
+        self.interactive.updatePlayerGate(self.playerGates[self.player], hover=True, showZero=True)
+
+    def undo(self):
+        """
+        Takes back the last gate the current player has applied in the gate round, and returns it to their hand.
+        """
+        if self.gameOver or self.bettingRound != 4:
+            return
+        gate = self.interactiveButtons.undo()
+        if gate is None:
+            return
+        hand = self.playerGates[self.player]
+        hand[gate] = hand.get(gate, 0) + 1
+        if hand[gate] == 1:
+            self.interactive.connectGate(gate, getattr(self.interactiveButtons, gate))
+        self.interactive.updatePlayerGate(hand, hover=True, showZero=True)
+        self.interactive.updateBoard()
+
+    def redo(self):
+        """
+        Applies the last gate taken back with undo again.
+        """
+        if self.gameOver or self.bettingRound != 4:
+            return
+        gate = self.interactiveButtons.redo()
+        if gate is None:
+            return
+        self.useGate(gate)
+        self.interactive.updateBoard()
+
+    def mouseHover(self, qubit):
+        """
+        Previews the move of the selected gate that would be made by clicking qubit.
+        :param qubit: The qubit under the mouse, or None if it is not over the board
+        """
+        if self.gameOver:
+            return
+        self.interactiveButtons.preview(qubit)
+
     def getPlayer(self):
         return self.player
@@ -0,0 +1,72 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+sys.path.append(dirname(abspath(__file__)))
+from Python.PokerGame import PokerGame
+from Python.Board import defaultSize
+from numpy import array, count_nonzero, nonzero, delete, flip
+
+
+class PokerSession:
+    def __init__(self, deckOfGates, names, money, smallBlind=5, dealer=0, enableEntanglement=False, frontEnd=None,
+                 size=defaultSize, showdownShots=1, noise=None, catalog=None):
+        """
+        Plays hands until only one player has money left. The same PokerGame, and with it the window, the widgets,
+        the boards and the simulators, is reused for every hand.
+        :param deckOfGates: dict containing e.g. {'H': 2, 'X': 1, ...}
+        :param names: Names of the players
+        :param money: The money each player starts with
+        :param smallBlind: Size of the small blind
+        :param dealer: The player who places the small blind in the first hand
+        :param enableEntanglement: Whether to use randomized CX-gates in the initial states
+        :param frontEnd: Class of the front end, see PokerGame. Defaults to the matplotlib window.
+        :param size: Number of qubits of each board
+        :param showdownShots: Number of measurements of each board at the showdown, see PokerGame
+        :param noise: The noise after every move, e.g. {"depolarizing": 0.01, "amplitudeDamping": 0.02}, see
+                      DensityMatrixBackend. None for a noiseless table.
+        :param catalog: A BoardCatalog the hands are dealt from, see PokerGame
+        """
+        self.names = names
+        self.money = array(money)
+        self.dealer = dealer
+        self.pokerGame = PokerGame(deckOfGates, self.money.shape[0], self.money, names=self.names,
+                                   smallBlind=smallBlind, smallBlindPlayer=self.dealer,
+                                   enableEntanglement=enableEntanglement, onGameOver=self.gameOver, frontEnd=frontEnd,
+                                   size=size, showdownShots=showdownShots, noise=noise, catalog=catalog)
+
+    def gameOver(self):
+        """
+        Called by the PokerGame when a hand has ended. Removes the players without money and offers the next hand.
+        :return: None
+        """
+        nPlayers = self.money.shape[0]
+        self.dealer = (self.dealer + 1) % nPlayers
+        if 0 in self.money:
+            toDelete = nonzero(self.money == 0)[0]
+            for i in flip(toDelete):
+                if i < self.dealer:
+                    self.dealer -= 1
+            self.names = delete(self.names, toDelete)
+            self.money = delete(self.money, toDelete)
+            self.dealer %= self.money.shape[0]
+
+        if count_nonzero(self.money) <= 1:
+            self.pokerGame.inform("The session is over. Exit to leave the table.")
+            return
+        self.pokerGame.interactive.connectNextHand(self.nextHand)
+        self.pokerGame.inform("Click Next to deal the next hand.")
+
+    def nextHand(self, event):
+        self.pokerGame.newHand(self.money, names=self.names, smallBlindPlayer=self.dealer)
+
+    def run(self):
+        """
+        Shows the table. Returns when the window is closed.
+        :return: None
+        """
+        import matplotlib.pyplot as plt
+        plt.show()
@@ -0,0 +1,85 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from concurrent.futures import ThreadPoolExecutor
+from traceback import print_exception
+from Python.metrics import count
+
+
+class AnalyticsWorker:
+    def __init__(self, timer=None):
+        """
+        Runs simulations of the boards in a background thread, so that the event loop is not blocked while qiskit
+        runs. Work is submitted on a channel, e.g. "probs" or "bell", and only the newest work of each channel counts:
+        work that has not started when newer work arrives is cancelled, and the result of work that was already running
+        is dropped. A single thread does all the work, so rapid clicks never queue up more than one simulation per
+        channel behind the running one.
+        Results are handed to their callbacks from the timer, i.e. in the thread of the event loop. Without a timer,
+        e.g. for front ends without an event loop, the work is done at once in the calling thread.
+        All methods must be called from the thread of the event loop.
+        :param timer: A repeating timer of the canvas, see InteractiveContainer.newPollTimer, or None
+        """
+        self.timer = timer
+        self.executor = None
+        self.pending = {}
+        if timer is not None:
+            timer.add_callback(self._poll)
+
+    def submit(self, channel, func, args, onDone):
+        """
+        Calls func(*args) in the background thread and onDone with its result, unless newer work is submitted on the
+        same channel or the channel is cancelled before the result has been handed over. If func raises in the
+        background thread, its traceback is printed and onDone is not called. func must not touch
+        anything the event loop changes, e.g. give it a copy of the circuit of a board.
+        """
+        self.cancel(channel)
+        if self.timer is None:
+            onDone(func(*args))
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AnalyticsWorker")
+        self.pending[channel] = (self.executor.submit(func, *args), onDone)
+        self.timer.start()
+
+    def cancel(self, *channels):
+        """
+        Forgets the work of channels, or of all channels if none are given.
+        """
+        for channel in channels if len(channels) > 0 else list(self.pending):
+            future, onDone = self.pending.pop(channel, (None, None))
+            if future is None:
+                continue
+            count("analytics.cancelled" if future.cancel() else "analytics.dropped")
+
+    def isAsynchronous(self):
+        """
+        :return: Whether work is done in the background, otherwise submit returns when the work is done
+        """
+        return self.timer is not None
+
+    def isPending(self, channel):
+        return channel in self.pending
+
+    def shutdown(self):
+        self.cancel()
+        if self.timer is not None:
+            self.timer.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def _poll(self):
+        for channel, (future, onDone) in list(self.pending.items()):
+            if future.done():
+                del self.pending[channel]
+                # The work of a channel that failed is dropped with its traceback, the other channels go on
+                error = future.exception()
+                if error is not None:
+                    count("analytics.failed")
+                    print_exception(type(error), error, error.__traceback__)
+                    continue
+                onDone(future.result())
+        if len(self.pending) == 0:
+            self.timer.stop()
@@ -0,0 +1,358 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from numpy import asarray, zeros, abs, sum
+from numpy.random import default_rng
+from Python.statevector import applyGate, matrices, controlled
+from Python.mps import MatrixProductState
+from Python.densityMatrix import DensityMatrix, composeChannels
+from Python import densityMatrix
+from Python.metrics import timed, count
+
+# The simulators a Board can use. qiskit is imported where it is used, so that importing this module stays cheap.
+
+
+class SimulationBackend:
+    """
+    Simulates the circuits of the boards. A backend gives the wavevector of a circuit and samples measurements of all
+    its qubits, which is all the game needs.
+    """
+    name = None
+    # Largest number of qubits the backend simulates in reasonable time and memory
+    maxQubits = 0
+    # The gates of Board.playerMoveInteractive the backend can simulate, None for all of them
+    gates = None
+    # Whether statevectors gives wavevectors as arrays, rather than states of its own
+    wavevectors = True
+
+    def isAvailable(self):
+        return True
+
+    def supports(self, size, gates):
+        """
+        :param size: Number of qubits of the boards
+        :param gates: Names of the gates that will be applied to the boards
+        :return: Whether the backend can simulate the boards
+        """
+        return size <= self.maxQubits and (self.gates is None or set(gates) <= self.gates)
+
+    def compile(self, qc, measured=False):
+        """
+        Prepares a circuit for the simulator once, so that it can be simulated again without preparing it again while
+        it does not change.
+        :param qc: A circuit without measurements
+        :param measured: Prepare the circuit for measureAll instead of statevectors
+        :return: The compiled circuit, only to be given to this backend
+        """
+        raise NotImplementedError
+
+    def statevectors(self, compiled):
+        """
+        Simulates circuits in a single job.
+        :param compiled: List of circuits from compile
+        :return: List with the wavevector of each circuit as an array, ordered as in qiskit, or as a
+                 MatrixProductState for the mps backend
+        """
+        raise NotImplementedError
+
+    def measureAll(self, compiled, shots=1):
+        """
+        Measures every qubit of circuits in a single job.
+        :param compiled: List of circuits from compile with measured=True
+        :return: For each circuit a dict from bitstrings, with qubit 0 rightmost, to the number of shots they were
+                 measured in
+        """
+        raise NotImplementedError
+
+    def statevector(self, qc):
+        """
+        :param qc: A circuit without measurements
+        :return: The wavevector of qc as an array, ordered as in qiskit
+        """
+        return self.statevectors([self.compile(qc)])[0]
+
+    def measure(self, qc, shots=1):
+        """
+        Measures every qubit of qc, which is not changed.
+        :return: dict from bitstrings, with qubit 0 rightmost, to the number of shots they were measured in
+        """
+        return self.measureAll([self.compile(qc, measured=True)], shots)[0]
+
+
+class QiskitBackend(SimulationBackend):
+    def __init__(self, provider, statevectorName, qasmName):
+        """
+        A pair of simulators of a qiskit provider, one for wavevectors and one for measurements. Circuits are compiled
+        with transpile, which costs more than simulating the narrow boards of the game, and a job of many circuits costs
+        little more than a job of one.
+        :param provider: Name of the provider in the qiskit module, "BasicAer" or "Aer"
+        """
+        self.provider = provider
+        self.statevectorName = statevectorName
+        self.qasmName = qasmName
+        self.statevectorSimulator = None
+        self.qasmSimulator = None
+
+    def isAvailable(self):
+        try:
+            self._getProvider()
+        except ImportError:
+            return False
+        return True
+
+    def _getProvider(self):
+        import qiskit
+        provider = getattr(qiskit, self.provider, None)
+        if provider is None:
+            raise ImportError("qiskit." + self.provider + " is not installed")
+        return provider
+
+    def _getSimulator(self, measured):
+        if measured:
+            if self.qasmSimulator is None:
+                self.qasmSimulator = self._getProvider().get_backend(self.qasmName)
+            return self.qasmSimulator
+        if self.statevectorSimulator is None:
+            self.statevectorSimulator = self._getProvider().get_backend(self.statevectorName)
+        return self.statevectorSimulator
+
+    @timed("backends.compile")
+    def compile(self, qc, measured=False):
+        from qiskit import ClassicalRegister, transpile
+        if measured:
+            qc = qc.copy()
+            if qc.num_clbits < qc.num_qubits:
+                qc.add_register(ClassicalRegister(qc.num_qubits - qc.num_clbits))
+            qc.measure(qc.qubits, qc.clbits[0:qc.num_qubits])
+        simulator = self._getSimulator(measured)
+        # Circuits of gates the simulator runs as they are need no transpiling, which is most of the cost of a board
+        native = set(simulator.configuration().basis_gates) | {"measure", "barrier"}
+        if all(instruction.operation.name in native for instruction in qc.data):
+            return qc
+        return transpile(qc, simulator)
+
+    def statevectors(self, compiled):
+        count("backends.jobs")
+        result = self._getSimulator(False).run(compiled, shots=1).result()
+        return [asarray(result.get_statevector(i)) for i in range(len(compiled))]
+
+    def measureAll(self, compiled, shots=1):
+        count("backends.jobs")
+        result = self._getSimulator(True).run(compiled, shots=shots).result()
+        return [result.get_counts(i) for i in range(len(compiled))]
+
+
+class BasicAerBackend(QiskitBackend):
+    name = "basicAer"
+    maxQubits = 24
+
+    def __init__(self):
+        """
+        The simulators written in Python that come with qiskit-terra.
+        """
+        QiskitBackend.__init__(self, "BasicAer", "statevector_simulator", "qasm_simulator")
+
+
+class AerBackend(QiskitBackend):
+    name = "aer"
+    maxQubits = 28
+
+    def __init__(self):
+        """
+        The compiled simulators of qiskit-aer, the fastest for wide boards.
+        """
+        QiskitBackend.__init__(self, "Aer", "statevector_simulator", "qasm_simulator")
+
+
+class NumpyBackend(SimulationBackend):
+    name = "numpy"
+    maxQubits = 20
+    gates = set(matrices) - {"SRX"} | set(controlled) | {"SWAP"}
+    # The instructions of the circuits of a Board, by the name of the gate in statevector
+    instructions = {"h": "H", "x": "X", "z": "Z", "id": "ID", "s": "SRZ", "cx": "CX", "ch": "CH", "swap": "SWAP",
+                    "ccx": "CCX"}
+
+    def __init__(self):
+        """
+        Applies the gates of a circuit one by one to a wavevector with numpy, in the process of the game. There is no
+        job to submit, which makes it the fastest backend for the narrow boards of the game. Compiling a circuit only
+        reads its gates.
+        """
+        self.rng = default_rng()
+
+    def compile(self, qc, measured=False):
+        # The number of qubits and the list of (gate, qubits) to apply to the wavevector
+        return qc.num_qubits, [(gate, coords) for gate, coords in self._gates(qc) if gate != "barrier"]
+
+    def _gates(self, qc):
+        # The (gate, qubits) of the instructions of qc, barriers included
+        index = {qubit: i for i, qubit in enumerate(qc.qubits)}
+        gates = []
+        for instruction in qc.data:
+            name = instruction.operation.name
+            if name == "barrier":
+                gates.append((name, []))
+                continue
+            if name not in self.instructions:
+                raise ValueError("The {} backend cannot simulate {}".format(self.name, name))
+            gates.append((self.instructions[name], [index[qubit] for qubit in instruction.qubits]))
+        return gates
+
+    def statevectors(self, compiled):
+        count("backends.jobs")
+        return [self._statevector(size, gates) for size, gates in compiled]
+
+    def _statevector(self, size, gates):
+        psi = zeros(2 ** size, dtype=complex)
+        psi[0] = 1
+        for gate, coords in gates:
+            psi = applyGate(psi, gate, coords, size)
+        return psi
+
+    def measureAll(self, compiled, shots=1):
+        count("backends.jobs")
+        results = []
+        for size, gates in compiled:
+            probs = abs(self._statevector(size, gates)) ** 2
+            outcomes = self.rng.choice(probs.shape[0], size=shots, p=probs / sum(probs))
+            counts = {}
+            for outcome in outcomes:
+                bitstring = format(int(outcome), "0{}b".format(size))
+                counts[bitstring] = counts.get(bitstring, 0) + 1
+            results.append(counts)
+        return results
+
+
+class MPSBackend(NumpyBackend):
+    name = "mps"
+    maxQubits = 128
+    wavevectors = False
+
+    def __init__(self, cutoff=1e-10, maxBond=None):
+        """
+        Simulates the boards as matrix product states, whose size grows with the entanglement of a board rather than
+        exponentially with its width. The boards start as product states with a few CX gates, and every player adds
+        only a few gates, so boards far too wide for a wavevector stay small. Its states are MatrixProductStates
+        instead of wavevectors, and the Board derives its analytics from them without a wavevector.
+        :param cutoff: Relative size of the smallest singular value kept when a gate is applied
+        :param maxBond: Largest bond dimension, None to keep the states exact up to cutoff
+        """
+        NumpyBackend.__init__(self)
+        self.cutoff = cutoff
+        self.maxBond = maxBond
+
+    @timed("backends.mps.statevectors")
+    def statevectors(self, compiled):
+        count("backends.jobs")
+        states = []
+        for size, gates in compiled:
+            state = MatrixProductState.zeros(size, self.cutoff, self.maxBond).applyGates(gates)
+            states.append(state)
+        return states
+
+    def measureAll(self, compiled, shots=1):
+        return [countBits(state.sample(shots, self.rng)) for state in self.statevectors(compiled)]
+
+
+class DensityMatrixBackend(NumpyBackend):
+    name = "density"
+    maxQubits = 10
+    wavevectors = False
+
+    def __init__(self, depolarizing=0.0, amplitudeDamping=0.0):
+        """
+        Simulates noisy hardware with density matrices: every move of a player, i.e. every gate after the barrier that
+        ends the initial state of a Board, is followed by noise on each of its qubits. Circuits without a barrier get
+        noise after every gate. Its states are DensityMatrix instead of wavevectors, and the Board derives its
+        analytics from them. Without noise it gives the same results as the other backends, at the cost of squaring
+        the size of the state, which is still small at the 5 to 8 qubits of the game.
+        :param depolarizing: Probability that a qubit is replaced by the maximally mixed state after a gate
+        :param amplitudeDamping: Probability that a qubit decays from |1> to |0> after a gate
+        """
+        NumpyBackend.__init__(self)
+        self.depolarizing = depolarizing
+        self.amplitudeDamping = amplitudeDamping
+        self.kraus = None
+        if depolarizing > 0 or amplitudeDamping > 0:
+            # One batch of Kraus operators for both channels
+            self.kraus = composeChannels(densityMatrix.depolarizing(depolarizing),
+                                         densityMatrix.amplitudeDamping(amplitudeDamping))
+
+    def compile(self, qc, measured=False):
+        # The number of qubits, the list of (gate, qubits) and whether each gate is followed by noise
+        gates = self._gates(qc)
+        barriers = [k for k, (gate, coords) in enumerate(gates) if gate == "barrier"]
+        start = barriers[0] if len(barriers) > 0 else -1
+        moves = [(k, gate, coords) for k, (gate, coords) in enumerate(gates) if gate != "barrier"]
+        return qc.num_qubits, [(gate, coords) for k, gate, coords in moves], [k > start for k, gate, coords in moves]
+
+    @timed("backends.density.statevectors")
+    def statevectors(self, compiled):
+        count("backends.jobs")
+        return [DensityMatrix.zeros(size).applyGates(gates, self.kraus, noisy) for size, gates, noisy in compiled]
+
+    def measureAll(self, compiled, shots=1):
+        return [countBits(state.sample(shots, self.rng)) for state in self.statevectors(compiled)]
+
+
+def countBits(samples):
+    """
+    :param samples: Array of shape (shots, size) with the measured bits, qubit 0 first
+    :return: dict from bitstrings, with qubit 0 rightmost, to the number of shots they were measured in
+    """
+    counts = {}
+    for bits in samples:
+        bitstring = "".join(str(bit) for bit in bits[::-1])
+        counts[bitstring] = counts.get(bitstring, 0) + 1
+    return counts
+
+
+# The backends by name, in the order of preference of chooseBackend. The density backend is only chosen for boards no
+# other backend supports, a noisy table creates its own instance.
+backendClasses = {"numpy": NumpyBackend, "mps": MPSBackend, "aer": AerBackend, "basicAer": BasicAerBackend,
+                  "density": DensityMatrixBackend}
+_backends = {}
+
+
+def registerBackend(backendClass, first=False):
+    """
+    Adds a backend, e.g. for another simulator.
+    :param backendClass: Subclass of SimulationBackend
+    :param first: Prefer the backend to all others that support a table
+    """
+    global backendClasses
+    if first:
+        backendClasses = {backendClass.name: backendClass, **backendClasses}
+    else:
+        backendClasses[backendClass.name] = backendClass
+    _backends.pop(backendClass.name, None)
+
+
+def getBackend(name):
+    """
+    :return: The backend of that name. There is one instance of each backend per process, shared by all boards.
+    """
+    if name not in _backends:
+        _backends[name] = backendClasses[name]()
+    return _backends[name]
+
+
+def getAvailableBackends():
+    return [getBackend(name) for name in backendClasses if getBackend(name).isAvailable()]
+
+
+def chooseBackend(size, gates):
+    """
+    Picks the preferred backend that can simulate boards of size qubits with these gates.
+    :param size: Number of qubits of the boards
+    :param gates: Names of the gates that will be applied to the boards
+    :return: SimulationBackend
+    """
+    for name in backendClasses:
+        backend = getBackend(name)
+        if backend.supports(size, gates) and backend.isAvailable():
+            count("backends.chosen." + name)
+            return backend
+    raise ValueError("No backend can simulate {} qubits with the gates {}".format(size, sorted(gates)))
@@ -0,0 +1,375 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+from Python.statevector import applyGates, matrices, controlled, probs01, probsPlusMinus, bellPairMask, qubitPairs, \
+    sample, popcounts
+from Python.metrics import timed
+from Python.Board import defaultSize
+from itertools import permutations
+from numpy import array, zeros, arange, argmax, where, unique, minimum, clip, sqrt, sort, take_along_axis, repeat
+from numpy.random import default_rng
+from argparse import ArgumentParser
+from time import perf_counter
+
+# Many hands of the game stepped in lockstep for training bots, without qiskit, figures or callbacks. The state of all
+# games is held in arrays with the game as the first axis, and the rules follow PokerGame.
+
+# Actions in the betting rounds, followed by one raise for each entry of raises
+FOLD, CALL = 0, 1
+# Actions in the gate round, followed by one move for each entry of BatchPokerEnvironment.moves
+END = 0
+# The number of qubits shown in each round, as in PokerGame
+shownQubits = [0, 3, 4, 5, 5]
+# Single qubit states of the initial state, in the order of the gates of Board._createInitState: H, HZ, X, Id
+_s = 1 / sqrt(2)
+initialQubitStates = array([[_s, _s], [_s, -_s], [0, 1], [1, 0]], dtype=complex)
+
+
+def nGateQubits(gate):
+    return 3 if gate == "CCX" else (2 if gate in controlled or gate == "SWAP" else 1)
+
+
+class BatchPokerEnvironment:
+    def __init__(self, nGames, nPlayers=3, deckOfGates=None, money=100, smallBlind=5, size=defaultSize,
+                 enableEntanglement=True, nRandTwoQGates=5, raises=(1, 2, 4), seed=None):
+        """
+        nGames independent hands of nPlayers, all stepped at once. In each step the player in turn in every game acts,
+        and finished hands are dealt again at once, so every step has a decision for every game.
+        Each hand starts with the same money for every player, and the reward of a player is the money won minus the
+        money bet in the hand.
+        :param deckOfGates: dict containing e.g. {'H': 2, 'X': 1, ...}, by default as in runPoker.py
+        :param money: The money of each player at the start of a hand
+        :param smallBlind: Size of the small blind, the big blind is twice that
+        :param size: Number of qubits of each board
+        :param enableEntanglement: Whether to use randomized CX-gates in the initial states
+        :param nRandTwoQGates: Number of randomized CX-gates
+        :param raises: The raises a player can choose from, in big blinds on top of calling. A raise beyond the money of
+                       the player goes all in.
+        :param seed: Seed of the random numbers
+        """
+        if deckOfGates is None:
+            deckOfGates = {"H": nPlayers, "X": nPlayers, "ZH": nPlayers, "CX": nPlayers}
+        unsupported = set(deckOfGates) - set(matrices) - set(controlled) - {"SWAP"}
+        if len(unsupported) > 0:
+            raise ValueError("The batch environment cannot simulate " + ", ".join(sorted(unsupported)))
+        if sum(deckOfGates.values()) < 3 * nPlayers:
+            raise ValueError("The deck has too few gates for three per player")
+        self.nGames = nGames
+        self.nPlayers = nPlayers
+        self.size = size
+        self.money = money
+        self.smallBlind = smallBlind
+        self.enableEntanglement = enableEntanglement
+        self.nRandTwoQGates = nRandTwoQGates
+        self.raises = array(raises)
+        self.rng = default_rng(seed)
+
+        # The gates by index, and the deck as one gate index per card
+        self.gates = sorted(deckOfGates)
+        self.cards = repeat(arange(len(self.gates)), [deckOfGates[gate] for gate in self.gates])
+        # Every move of the gate round as (gate index, coordinates)
+        self.moves = [(g, coords) for g, gate in enumerate(self.gates)
+                      for coords in permutations(range(size), nGateQubits(gate))]
+        self.moveGates = array([g for g, coords in self.moves], dtype=int)
+        self.nActions = max(2 + len(self.raises), 1 + len(self.moves))
+        self.pairs = qubitPairs(size)
+        self.scores = popcounts(size)
+        # The CX gates of the initial states permute the amplitudes. Row control * size + target holds the index of
+        # the amplitude that each amplitude comes from.
+        basis = arange(2 ** size)
+        self.cxPermutations = array([basis ^ (((basis >> control) & 1) << target) if control != target else basis
+                                     for control in range(size) for target in range(size)])
+
+        shape = (nGames, nPlayers)
+        self.playerMoney = zeros(shape)
+        self.playerBets = zeros(shape)
+        self.folded = zeros(shape, dtype=bool)
+        self.allIn = zeros(shape, dtype=bool)
+        self.hands = zeros(shape + (len(self.gates),), dtype=int)
+        self.psis = zeros(shape + (2 ** size,), dtype=complex)
+        # The analytics of each board, updated when the board changes
+        self.probs01 = zeros(shape + (size,))
+        self.probsPlusMinus = zeros(shape + (size,))
+        self.bellPairs = zeros(shape + (len(self.pairs),), dtype=bool)
+        self.bettingRound = zeros(nGames, dtype=int)
+        self.player = zeros(nGames, dtype=int)
+        self.dealer = self.rng.integers(nPlayers, size=nGames)
+        self.lastPlayerInRound = zeros(nGames, dtype=int)
+        self.lastRaiser = zeros(nGames, dtype=int)
+        self.currentBet = zeros(nGames)
+        self.ended = zeros(nGames, dtype=bool)
+        # The measured score of each player at the last showdown of each game, -1 for players who folded
+        self.showdownScores = zeros(shape, dtype=int)
+        self._deal(arange(nGames))
+
+    def reset(self):
+        """
+        Deals a new hand in every game.
+        :return: The observations, see observe
+        """
+        self._deal(arange(self.nGames))
+        return self.observe()
+
+    @timed("batchEnvironment.step")
+    def step(self, actions):
+        """
+        The player in turn in every game takes an action. Illegal actions are taken as a call in the betting rounds and
+        as ending the turn in the gate round.
+        :param actions: Array of nGames actions, see legalActions
+        :return: The observations, an array of shape (nGames, nPlayers) with the rewards of the hands that ended, and an
+                 array of nGames flags telling which hands ended. Hands that ended have been dealt again, and their
+                 observations are of the new hands.
+        """
+        actions = array(actions, dtype=int)
+        self.ended = zeros(self.nGames, dtype=bool)
+        betting = self.bettingRound < 4
+        self._bet(where(betting)[0], actions[betting])
+        self._useGate(where(~betting)[0], actions[~betting])
+        rewards = zeros((self.nGames, self.nPlayers))
+        done = self.ended
+        games = where(done)[0]
+        if len(games) > 0:
+            rewards[games] = self._settle(games)
+            self._deal(games)
+        return self.observe(), rewards, done
+
+    def legalActions(self):
+        """
+        :return: Boolean array of shape (nGames, nActions). In the betting rounds the actions are FOLD, CALL and the
+                 raises, and raising is legal if the player has more money than the call costs. In the gate round the
+                 actions are END and the moves, and a move is legal if the gate is in the hand of the player.
+        """
+        games = arange(self.nGames)
+        legal = zeros((self.nGames, self.nActions), dtype=bool)
+        betting = self.bettingRound < 4
+        owed = self.currentBet - self.playerBets[games, self.player]
+        legal[betting, FOLD] = True
+        legal[betting, CALL] = True
+        legal[:, 2:2 + len(self.raises)] |= (betting & (self.playerMoney[games, self.player] > owed))[:, None]
+        legal[~betting, END] = True
+        hand = self.hands[games, self.player]
+        legal[~betting, 1:1 + len(self.moves)] = hand[~betting][:, self.moveGates] > 0
+        return legal
+
+    def observe(self):
+        """
+        What the player in turn sees in each game. Arrays of the players are ordered by seat from the player in turn.
+        :return: dict of arrays with the game as first axis: "probs01", "probsPlusMinus" and "visible" of shape
+                 (nGames, size), "bellPairs" of shape (nGames, number of pairs of qubits) in the order of
+                 statevector.qubitPairs, all zero for qubits not shown yet, "hand" with the number of each gate of
+                 self.gates, "money", "bets", "folded" and "allIn" of shape (nGames, nPlayers), and "toCall",
+                 "round", "player" and "legal", see legalActions
+        """
+        games = arange(self.nGames)
+        visible = arange(self.size)[None, :] < minimum(array(shownQubits), self.size)[self.bettingRound][:, None]
+        pairVisible = visible[:, [i for i, j in self.pairs]] & visible[:, [j for i, j in self.pairs]]
+        seats = (self.player[:, None] + arange(self.nPlayers)[None, :]) % self.nPlayers
+        return {"probs01": self.probs01[games, self.player] * visible,
+                "probsPlusMinus": self.probsPlusMinus[games, self.player] * visible,
+                "bellPairs": self.bellPairs[games, self.player] & pairVisible,
+                "visible": visible,
+                "hand": self.hands[games, self.player],
+                "money": take_along_axis(self.playerMoney, seats, axis=1),
+                "bets": take_along_axis(self.playerBets, seats, axis=1),
+                "folded": take_along_axis(self.folded, seats, axis=1),
+                "allIn": take_along_axis(self.allIn, seats, axis=1),
+                "toCall": self.currentBet - self.playerBets[games, self.player],
+                "round": self.bettingRound.copy(),
+                "player": self.player.copy(),
+                "legal": self.legalActions()}
+
+    def _deal(self, games):
+        # Starts new hands in games, with the dealer moved on by one seat
+        n, P = len(games), self.nPlayers
+        self.dealer[games] = (self.dealer[games] + 1) % P
+        dealer = self.dealer[games]
+        self.playerMoney[games] = self.money
+        self.playerBets[games] = 0
+        self.folded[games] = False
+        self.allIn[games] = False
+        self.bettingRound[games] = 0
+        self.player[games] = (dealer + 2) % P
+        self.lastPlayerInRound[games] = (dealer + 2) % P
+        self.lastRaiser[games] = (dealer + 1) % P
+        self.currentBet[games] = 2 * self.smallBlind
+        # Blinds
+        self.playerBets[games, dealer] += self.smallBlind
+        self.playerBets[games, (dealer + 1) % P] += 2 * self.smallBlind
+        self.playerMoney[games, dealer] -= self.smallBlind
+        self.playerMoney[games, (dealer + 1) % P] -= 2 * self.smallBlind
+        self.startMoney = self.playerMoney + self.playerBets
+
+        # Three gates for each player from the shuffled deck, dealt round by round as in distributeGates
+        order = self.rng.random((n, len(self.cards))).argsort(axis=1)[:, 0:3 * P]
+        dealt = self.cards[order].reshape(n, 3, P)
+        self.hands[games] = 0
+        for card in range(3):
+            for player in range(P):
+                self.hands[games, player, dealt[:, card, player]] += 1
+
+        # The same initial state for every board of a game, as in Board._createInitState
+        choices = self.rng.integers(len(initialQubitStates), size=(n, self.size))
+        psis = initialQubitStates[choices[:, 0]]
+        for qubit in range(1, self.size):
+            psis = (initialQubitStates[choices[:, qubit]][:, :, None] * psis[:, None, :]).reshape(n, -1)
+        if self.enableEntanglement and self.size > 1:
+            for k in range(self.nRandTwoQGates):
+                control = self.rng.integers(self.size, size=n)
+                target = (control + 1 + self.rng.integers(self.size - 1, size=n)) % self.size
+                psis = take_along_axis(psis, self.cxPermutations[control * self.size + target], axis=1)
+        self.psis[games] = psis[:, None, :]
+        self.probs01[games], self.probsPlusMinus[games], self.bellPairs[games] = \
+            [values[:, None] for values in self._analytics(psis)]
+
+    def _analytics(self, psis):
+        return probs01(psis, self.size), probsPlusMinus(psis, self.size), bellPairMask(psis, self.size)
+
+    def _bet(self, games, actions):
+        if len(games) == 0:
+            return
+        acted = games
+        player = self.player[games]
+        fold = actions == FOLD
+        self.folded[games[fold], player[fold]] = True
+        games, player, actions = games[~fold], player[~fold], actions[~fold]
+        raiseIndex = actions - 2
+        isRaise = (raiseIndex >= 0) & (raiseIndex < len(self.raises))
+        money = self.playerMoney[games, player]
+        amount = self.currentBet[games] - self.playerBets[games, player]
+        amount += where(isRaise, self.raises[clip(raiseIndex, 0, len(self.raises) - 1)] * 2 * self.smallBlind, 0)
+        amount = minimum(amount, money)
+        self.allIn[games[amount == money], player[amount == money]] = True
+        self.playerBets[games, player] += amount
+        self.playerMoney[games, player] -= amount
+        raised = self.playerBets[games, player] > self.currentBet[games]
+        self.currentBet[games[raised]] = self.playerBets[games[raised], player[raised]]
+        self.lastRaiser[games[raised]] = player[raised]
+        self.lastPlayerInRound[games[raised]] = player[raised]
+        self._advance(acted)
+
+    def _useGate(self, games, actions):
+        if len(games) == 0:
+            return
+        player = self.player[games]
+        move = actions - 1
+        valid = (move >= 0) & (move < len(self.moves))
+        valid[valid] = self.hands[games[valid], player[valid], self.moveGates[move[valid]]] > 0
+        for m in unique(move[valid]):
+            rows = valid & (move == m)
+            g, coords = self.moves[m]
+            selected, seats = games[rows], player[rows]
+            self.psis[selected, seats] = applyGates(self.psis[selected, seats], self.gates[g], coords, self.size)
+            self.hands[selected, seats, g] -= 1
+        changed = valid.nonzero()[0]
+        if len(changed) > 0:
+            selected, seats = games[changed], player[changed]
+            self.probs01[selected, seats], self.probsPlusMinus[selected, seats], self.bellPairs[selected, seats] = \
+                self._analytics(self.psis[selected, seats])
+        # The turn ends when the player ends it or has no gates left
+        endTurn = ~valid | (self.hands[games, player].sum(axis=1) == 0)
+        self._advance(games[endTurn])
+
+    def _advance(self, games):
+        # Moves games to the next player and round, as PokerGame.advanceGame
+        if len(games) == 0:
+            return
+        P = self.nPlayers
+        folded, allIn = self.folded[games], self.allIn[games]
+        nFolded, nAllIn = folded.sum(axis=1), allIn.sum(axis=1)
+        bettingRound = self.bettingRound[games]
+        rows = arange(len(games))[:, None]
+
+        allFolded = nFolded >= P - 1
+        candidates = (self.player[games][:, None] + arange(1, P + 1)[None, :]) % P
+        skip = folded[rows, candidates] | (allIn[rows, candidates] & (bettingRound < 4)[:, None])
+        first = argmax(~skip, axis=1)
+        nextPlayer = candidates[arange(len(games)), first]
+        passed = (candidates == self.lastPlayerInRound[games][:, None]) & (arange(P)[None, :] <= first[:, None])
+        advanceRound = passed.any(axis=1)
+        everyoneDone = (nFolded + nAllIn == P) & (bettingRound < 4)
+        advanceRound |= everyoneDone
+        nextPlayer = where(everyoneDone, self.player[games], nextPlayer)
+
+        # Straight to the gate round if at most one player can still bet, as PokerGame.forwardToRound4
+        forward = ~allFolded & advanceRound & (nFolded + nAllIn >= P - 1) & (bettingRound < 4)
+        gateRound = forward | (~allFolded & advanceRound & (bettingRound == 3))
+        nextBetting = ~allFolded & ~forward & advanceRound & (bettingRound < 3)
+        showdown = ~allFolded & advanceRound & (bettingRound == 4)
+
+        # The gate round starts at the last raiser, or the first player after them who has not folded
+        fromRaiser = (self.lastRaiser[games][:, None] + arange(P)[None, :]) % P
+        raiserStart = fromRaiser[arange(len(games)), argmax(~folded[rows, fromRaiser], axis=1)]
+        # The betting rounds start at the small blind, or the first player after them who can bet
+        fromDealer = (self.dealer[games][:, None] + arange(P)[None, :]) % P
+        canBet = ~(folded[rows, fromDealer] | allIn[rows, fromDealer])
+        roundStarter = fromDealer[arange(len(games)), argmax(canBet, axis=1)]
+
+        nextPlayer = where(gateRound, raiserStart, where(nextBetting, roundStarter, nextPlayer))
+        self.lastPlayerInRound[games] = where(gateRound | nextBetting, nextPlayer, self.lastPlayerInRound[games])
+        self.bettingRound[games] = where(gateRound, 4, where(nextBetting, bettingRound + 1, bettingRound))
+        self.player[games] = nextPlayer
+        self.ended[games[allFolded | showdown]] = True
+
+    def _settle(self, games):
+        # Measures the boards of the players still in the hands and shares the pots, the side pots of players all in
+        # included, as PokerGame.endGame. Returns the rewards of the players.
+        n, P = len(games), self.nPlayers
+        folded, bets = self.folded[games], self.playerBets[games]
+        showdown = folded.sum(axis=1) < P - 1
+        scores = zeros((n, P), dtype=int)
+        if showdown.any():
+            psis = self.psis[games[showdown]].reshape(-1, 2 ** self.size)
+            scores[showdown] = self.scores[sample(psis, 1, self.rng)[:, 0]].reshape(-1, P)
+        scores = where(folded, -1, scores)
+        self.showdownScores[games] = scores
+
+        money = self.playerMoney[games].copy()
+        previous = zeros(n)
+        # Each layer of the bets is won by the best player still in the hand who bet at least up to it
+        for level in sort(bets, axis=1).T:
+            layer = (clip(bets, previous[:, None], level[:, None]) - previous[:, None]).sum(axis=1)
+            eligible = ~folded & (bets >= level[:, None])
+            eligible = where(eligible.any(axis=1)[:, None], eligible, ~folded)
+            eligibleScores = where(eligible, scores, -2)
+            winners = eligibleScores == eligibleScores.max(axis=1)[:, None]
+            money += winners * (layer / winners.sum(axis=1))[:, None]
+            previous = level
+        return money - self.startMoney[games]
+
+
+def playRandomly(environment, nSteps, rng):
+    """
+    Steps environment with random legal actions.
+    :return: Number of decisions, number of hands ended and the sum of the rewards, which is zero as no money is lost
+    """
+    observation = environment.reset()
+    decisions, hands, total = 0, 0, 0.0
+    for step in range(nSteps):
+        legal = observation["legal"]
+        choice = (rng.random(legal.shape) * legal).argmax(axis=1)
+        observation, rewards, done = environment.step(choice)
+        decisions += environment.nGames
+        hands += int(done.sum())
+        total += float(rewards.sum())
+    return decisions, hands, total
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Measures the throughput of the batch environment with random players.")
+    parser.add_argument("--games", type=int, default=4096)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    environment = BatchPokerEnvironment(args.games, args.players, seed=args.seed)
+    start = perf_counter()
+    decisions, hands, total = playRandomly(environment, args.steps, default_rng(args.seed))
+    elapsed = perf_counter() - start
+    print("{} decisions and {} hands in {:.2f} s: {:.0f} decisions per second, money created {:.2e}"
+          .format(decisions, hands, elapsed, decisions / elapsed, total))
@@ -0,0 +1,246 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath, join, exists
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from Python.Board import Board, BoardStack, defaultSize, initGates
+from Python.backends import chooseBackend, DensityMatrixBackend
+from Python.PokerGame import PokerGame
+from Python.batchEnvironment import BatchPokerEnvironment
+from Python import entanglement
+from Python.metrics import setSink, HistogramSink
+from numpy import array, median, mean
+from numpy.random import default_rng
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+import json
+import platform
+
+defaultBaseline = join(dirname(abspath(__file__)), "benchmarkBaseline.json")
+
+
+def timeCall(func, repeats, setup=None):
+    """
+    Times func repeatedly.
+    :param func: Called with the return value of setup, or without arguments if there is no setup
+    :param repeats: Number of timed calls
+    :param setup: Called before every call of func, not timed
+    :return: dict with the minimum, median and mean time in seconds
+    """
+    times = []
+    for i in range(repeats):
+        args = () if setup is None else (setup(),)
+        start = perf_counter()
+        func(*args)
+        times.append(perf_counter() - start)
+    return {"repeats": repeats, "min": min(times), "median": float(median(times)), "mean": float(mean(times))}
+
+
+def makeBoard(width, seed=4):
+    return Board(boardSeed=seed, enableEntanglement=True, nRandOneQGates=width, size=width)
+
+
+def benchmarkBoard(width, repeats):
+    """
+    Times the simulation and the analytics of a board with width qubits.
+    :return: dict with benchmark names as keys and timings as values
+    """
+    from qiskit import QuantumCircuit
+    board = makeBoard(width)
+    psi = board.getPsi()
+
+    def freshCircuit():
+        board.qc = QuantumCircuit(board.q, board.c)
+
+    results = {
+        "Board.getPsi": timeCall(board.getPsi, repeats),
+        "Board.getProbs01": timeCall(board.getProbs01, repeats),
+        "Board.getProbsPlusMinus": timeCall(board.getProbsPlusMinus, repeats),
+        "Board.getBellStateProbs": timeCall(lambda: board.getBellStateProbs(array([0, width - 1]), psi), repeats),
+        "Board.findBellPairs": timeCall(board.findBellPairs, repeats),
+        "Board.getAnalytics": timeCall(board.getAnalytics, repeats),
+        "entanglement.analyse": timeCall(lambda: entanglement.analyse(psi, width), repeats),
+        "Board._createInitState": timeCall(lambda _: board._createInitState(4, True, width, 5), repeats,
+                                           setup=freshCircuit),
+    }
+    # The same board on noisy hardware, simulated and analysed as a density matrix
+    noisy = Board(boardSeed=4, enableEntanglement=True, nRandOneQGates=width, size=width,
+                  backend=DensityMatrixBackend(0.01, 0.01), simulate=False)
+    results["Board.getAnalytics.noisy"] = timeCall(noisy.getAnalytics, repeats)
+    if width >= 3:
+        results["Board.getBellStateProbs3"] = timeCall(lambda: board.getBellStateProbs3(array([0, 1, width - 1]), psi),
+                                                       repeats)
+    return results
+
+
+def newGame(nPlayers, seed=4):
+    deckOfGates = {"H": nPlayers, "X": nPlayers, "ZH": nPlayers, "CX": nPlayers}
+    return PokerGame(deckOfGates, nPlayers, array([100 for i in range(nPlayers)]),
+                     names=[str(i) for i in range(nPlayers)], seed=seed, enableEntanglement=True)
+
+
+def playBettingRounds(game, render=False):
+    """
+    Every player checks until the gate round is reached.
+    :param render: Whether to bring the figure up to date after every action, as the event loop of a window would
+    """
+    while game.bettingRound < 4 and not game.gameOver:
+        game.check()
+        if render:
+            game.interactive.renderer.flush()
+
+
+def playGateRound(game, render=False):
+    """
+    Every player applies the first gate of their hand to the leftmost qubits and ends their turn.
+    """
+    while not game.gameOver:
+        gates = game.playerGates[game.player]
+        if len(gates) > 0:
+            getattr(game.interactiveButtons, next(iter(gates)))(None)
+            for qubit in range(game.interactiveButtons.nQBits):
+                game.mouseClick(qubit)
+                if render:
+                    game.interactive.renderer.flush()
+        game.endGateTurn(None)
+        if render:
+            game.interactive.renderer.flush()
+
+
+def playScriptedHand(nPlayers, seed=4, render=False):
+    game = newGame(nPlayers, seed)
+    if render:
+        game.interactive.renderer.flush()
+    playBettingRounds(game, render)
+    playGateRound(game, render)
+    plt.close(game.interactive.fig)
+
+
+def benchmarkGame(nPlayers, repeats):
+    """
+    Times the analytics of all boards, the settlement at showdown and complete scripted hands at a table with nPlayers,
+    and a step of 1024 games of the batch environment.
+    :return: dict with benchmark names as keys and timings as values
+    """
+    games = []
+    environment = BatchPokerEnvironment(1024, nPlayers, seed=4)
+    rng = default_rng(4)
+
+    def dealtBoards():
+        # Boards with different initial states, so that none of them can share a simulation
+        backend = chooseBackend(defaultSize, {"H", "X", "ZH", "CX"} | set(initGates))
+        return BoardStack([Board(boardSeed=seed, enableEntanglement=True, backend=backend, simulate=False)
+                           for seed in range(nPlayers)])
+
+    def randomActions():
+        legal = environment.legalActions()
+        return (rng.random(legal.shape) * legal).argmax(axis=1)
+
+    def gameAtShowdown():
+        game = newGame(nPlayers)
+        playBettingRounds(game)
+        games.append(game)
+        return game
+
+    with redirect_stdout(StringIO()):
+        results = {
+            "BoardStack.simulate": timeCall(lambda stack: stack.simulate(), repeats * 5, setup=dealtBoards),
+            "PokerGame.endGame": timeCall(lambda game: game.endGame(), repeats, setup=gameAtShowdown),
+            "PokerGame.scriptedHand": timeCall(lambda: playScriptedHand(nPlayers), repeats),
+            "PokerGame.renderedHand": timeCall(lambda: playScriptedHand(nPlayers, render=True), repeats),
+            "BatchPokerEnvironment.step": timeCall(environment.step, repeats * 5, setup=randomActions),
+        }
+    for game in games:
+        plt.close(game.interactive.fig)
+    return results
+
+
+def runBenchmarks(widths=(2, 3, 4, 5, 6), playerCounts=(2, 3, 5), repeats=10):
+    """
+    Runs the whole suite.
+    :return: dict with the machine description and a list of results, each identified by a key such as
+             "Board.getPsi[width=5]"
+    """
+    results = []
+    for width in widths:
+        for name, timing in benchmarkBoard(width, repeats).items():
+            results.append(dict(key="{}[width={}]".format(name, width), name=name, params={"width": width}, **timing))
+    for nPlayers in playerCounts:
+        for name, timing in benchmarkGame(nPlayers, max(1, repeats // 5)).items():
+            results.append(dict(key="{}[players={}]".format(name, nPlayers), name=name, params={"players": nPlayers},
+                                **timing))
+    return {"machine": {"python": platform.python_version(), "platform": platform.platform()}, "results": results}
+
+
+def compareToBaseline(current, baseline, tolerance=1.25):
+    """
+    Compares the minimum times with those of a stored run.
+    :param tolerance: A result is a regression if it is slower than the baseline by more than this factor
+    :return: List of (key, baseline time, current time, ratio), and the list of keys that regressed. Baseline time and
+             ratio are None for benchmarks that are not in the baseline.
+    """
+    baselineTimes = {result["key"]: result["min"] for result in baseline["results"]}
+    comparison, regressions = [], []
+    for result in current["results"]:
+        if result["key"] not in baselineTimes:
+            comparison.append((result["key"], None, result["min"], None))
+            continue
+        ratio = result["min"] / baselineTimes[result["key"]]
+        comparison.append((result["key"], baselineTimes[result["key"]], result["min"], ratio))
+        if ratio > tolerance:
+            regressions.append(result["key"])
+    return comparison, regressions
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Times the simulation, the board analytics and complete hands.")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=defaultBaseline, help="JSON results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--quick", action="store_true", help="only the default board width and three players")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record the instrumented spans and counters during the run and print them")
+    args = parser.parse_args()
+
+    if args.metrics:
+        setSink(HistogramSink())
+
+    if args.quick:
+        current = runBenchmarks(widths=(5,), playerCounts=(3,), repeats=args.repeats)
+    else:
+        current = runBenchmarks(repeats=args.repeats)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(current, file, indent=1)
+
+    if args.metrics:
+        print(setSink(None).report())
+
+    if exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            comparison, regressions = compareToBaseline(current, json.load(file), args.tolerance)
+        print("{:<45} {:>12} {:>12} {:>7}".format("benchmark", "baseline ms", "current ms", "ratio"))
+        for key, baselineTime, currentTime, ratio in comparison:
+            if baselineTime is None:
+                print("{:<45} {:>12} {:>12.3f} {:>7}".format(key, "-", 1e3*currentTime, "new"))
+                continue
+            print("{:<45} {:>12.3f} {:>12.3f} {:>7.2f}{}".format(key, 1e3*baselineTime, 1e3*currentTime, ratio,
+                                                                 "  <- regression" if key in regressions else ""))
+        sys.exit(1 if regressions else 0)
+    else:
+        for result in current["results"]:
+            print("{:<45} {:>12.3f} ms".format(result["key"], 1e3*result["min"]))
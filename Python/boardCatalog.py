@@ -0,0 +1,294 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+from Python.Board import BoardAnalytics, defaultSize
+from Python.statevector import applyGate, applyGates, probs01, probsPlusMinus, bellPairMask, qubitPairs, popcounts
+from Python.batchEnvironment import initialQubitStates, nGateQubits
+from Python.entanglement import reducedDensities
+from Python.metrics import timed
+from itertools import permutations
+from functools import lru_cache
+from numpy import array, zeros, empty, full, arange, unique, round, concatenate, maximum, real, nonzero, int32, abs, \
+    stack, eye, einsum
+from numpy.random import RandomState, default_rng
+from argparse import ArgumentParser
+from time import perf_counter
+import json
+
+# The initial boards of a range of seeds, computed once. Board._createInitState draws a single-qubit state for each
+# qubit and, with entanglement, the qubits of a number of CX gates from the seed, so many seeds give the same board. The
+# catalog keeps every distinct initial state once with its analytics, and for each seed the index of its state, so that
+# a board is created by a lookup and seeds can be filtered in bulk, e.g. by their number of Bell pairs.
+
+# The decks of runPoker.py for 2 to 5 players
+defaultDecks = [{"H": n, "X": n, "ZH": n, "CX": n} for n in range(2, 6)]
+
+
+def replayInitState(boardSeed, size, enableEntanglement, nRandOneQGates, nRandTwoQGates, rng=None):
+    """
+    Makes the random draws of Board._createInitState without building a circuit.
+    :param rng: A numpy RandomState to reuse, it is seeded with boardSeed
+    :return: The index of the state of each of the first nRandOneQGates qubits in initialQubitStates, and the list of
+             the (control, target) of each CX gate
+    """
+    rng = RandomState() if rng is None else rng
+    rng.seed(boardSeed)
+    choices = [rng.randint(0, 4) for i in range(nRandOneQGates)]
+    cxs = []
+    if enableEntanglement:
+        for i in range(nRandTwoQGates):
+            # The choice among the two-qubit gates, only CX, and the different qubits of get2DiffRandNum
+            rng.randint(0, 1)
+            control, target = rng.randint(0, size), rng.randint(0, size)
+            while target == control:
+                target = rng.randint(0, size)
+            cxs.append((control, target))
+    return choices, cxs
+
+
+def initialStates(choices, cxs, size):
+    """
+    :param choices: Integer array of shape (n, nRandOneQGates) with the state of each qubit, see replayInitState
+    :param cxs: Integer array of shape (n, nRandTwoQGates, 2) with the control and target of each CX gate
+    :return: Array of shape (n, 2**size) with the wavevectors
+    """
+    n = choices.shape[0]
+    # Qubits without a random gate stay |0>, the last entry of initialQubitStates
+    choices = concatenate((choices, full((n, size - choices.shape[1]), 3)), axis=1)
+    psis = initialQubitStates[choices[:, 0]]
+    for qubit in range(1, size):
+        psis = (initialQubitStates[choices[:, qubit]][:, :, None] * psis[:, None, :]).reshape(n, -1)
+    for k in range(cxs.shape[1]):
+        for control, target in unique(cxs[:, k], axis=0):
+            games = nonzero((cxs[:, k, 0] == control) & (cxs[:, k, 1] == target))[0]
+            psis[games] = applyGates(psis[games], "CX", (control, target), size)
+    return psis
+
+
+@lru_cache(maxsize=None)
+def _scoreWeights(gates, size):
+    # For each set of qubits, the weights W of the moves of gates on them, such that the number of ones the qubits are
+    # expected to give after a move is the sum of W[b, c] rho[b, c] over the entries of their density matrix rho
+    weights = {}
+    for gate in gates:
+        k = nGateQubits(gate)
+        ones = popcounts(k)
+        for coords in permutations(range(size), k):
+            qubits = tuple(sorted(coords))
+            positions = [qubits.index(coord) for coord in coords]
+            matrix = stack([applyGate(column, gate, positions, k) for column in eye(2 ** k)], axis=1)
+            weights.setdefault(qubits, []).append(einsum("a,ab,ac->bc", ones, matrix, matrix.conj()).reshape(-1))
+    return {qubits: array(columns).T for qubits, columns in weights.items()}
+
+
+@lru_cache(maxsize=None)
+def _projection(size):
+    return default_rng(0).standard_normal(2 ** size) + 1j * default_rng(1).standard_normal(2 ** size)
+
+
+def _lastMoveScores(psis, size, gates):
+    # The best expected score after one move of any of gates. A gate only changes the probabilities of its own qubits,
+    # so the scores of all moves on the same qubits come from their density matrix in a single product.
+    probs = probs01(psis, size)
+    score = probs.sum(axis=1)
+    best = score.copy()
+    for qubits, weights in _scoreWeights(tuple(gates), size).items():
+        rho = reducedDensities(psis, size, [qubits])[:, 0].reshape(psis.shape[0], -1)
+        after = real(rho @ weights).max(axis=1)
+        best = maximum(best, score - probs[:, list(qubits)].sum(axis=1) + after)
+    return best
+
+
+def _bestScores(psis, size, remaining, depth):
+    # psis of shape (boards, sequences, 2**size) holds the states reached by sequences of moves from each board.
+    # Different sequences often lead to the same state, e.g. moves on different qubits in either order, so each state
+    # is searched once. States are told apart by a random projection of their amplitudes.
+    flat = psis.reshape(-1, 2 ** size)
+    keys, first, inverse = unique(round(flat @ _projection(size), 9), return_index=True, return_inverse=True)
+    best = _bestStateScores(flat[first], size, remaining, depth)
+    return best[inverse.reshape(-1)].reshape(psis.shape[0], -1).max(axis=1)
+
+
+def _bestStateScores(psis, size, remaining, depth):
+    gates = [gate for gate in remaining if remaining[gate] > 0]
+    if depth == 0 or len(gates) == 0:
+        return probs01(psis, size).sum(axis=1)
+    if depth == 1:
+        return _lastMoveScores(psis, size, gates)
+    best = probs01(psis, size).sum(axis=1)
+    for gate in gates:
+        moves = permutations(range(size), nGateQubits(gate))
+        after = array([applyGates(psis, gate, coords, size) for coords in moves]).transpose(1, 0, 2)
+        best = maximum(best, _bestScores(after, size, dict(remaining, **{gate: remaining[gate] - 1}), depth - 1))
+    return best
+
+
+@timed("catalog.bestScores")
+def bestScores(psis, size, deck, handSize=3, chunk=256):
+    """
+    The highest expected score, i.e. sum of the probabilities of measuring 1, a player can reach on each board with a
+    hand of handSize gates dealt from deck. Every sequence of at most handSize moves whose gates the deck holds is
+    tried.
+    :param psis: Array of shape (n, 2**size)
+    :param deck: dict from gate to the number of cards, as the deckOfGates of PokerGame
+    :param chunk: Number of boards searched at once
+    :return: Array of shape (n,)
+    """
+    remaining = {gate: min(number, handSize) for gate, number in deck.items() if number > 0}
+    best = empty(psis.shape[0])
+    for start in range(0, psis.shape[0], chunk):
+        best[start:start + chunk] = _bestScores(psis[start:start + chunk, None, :], size, remaining, handSize)
+    return best
+
+
+class BoardCatalog:
+    def __init__(self, params, stateOfSeed, psis, decks, bestScores):
+        """
+        Use BoardCatalog.build to enumerate the boards of a range of seeds, and save and load to keep them.
+        :param params: dict with the size, enableEntanglement, nRandOneQGates, nRandTwoQGates, firstSeed and handSize
+                       of the boards
+        :param stateOfSeed: Integer array with the index of the state of each seed, from firstSeed on
+        :param psis: Array of shape (states, 2**size) with the distinct initial wavevectors
+        :param decks: List of decks, see bestScores
+        :param bestScores: Array of shape (states, decks) with the best expected score on each state with each deck
+        """
+        self.params = params
+        self.size = params["size"]
+        self.firstSeed = params["firstSeed"]
+        self.stateOfSeed = stateOfSeed
+        self.psis = psis
+        self.decks = decks
+        self.bestScores = bestScores
+        self.probs01 = probs01(psis, self.size)
+        self.probsPlusMinus = probsPlusMinus(psis, self.size)
+        self.bellPairs = bellPairMask(psis, self.size)
+        self.scoreDistributions = zeros((psis.shape[0], self.size + 1))
+        scores = popcounts(self.size)
+        for score in range(self.size + 1):
+            self.scoreDistributions[:, score] = (abs(psis[:, scores == score]) ** 2).sum(axis=1)
+
+    @staticmethod
+    @timed("catalog.build")
+    def build(nSeeds, size=defaultSize, enableEntanglement=True, nRandOneQGates=None, nRandTwoQGates=5, decks=None,
+              firstSeed=0, handSize=3):
+        """
+        Enumerates the initial boards of the seeds firstSeed to firstSeed + nSeeds - 1.
+        :param nRandOneQGates: As for Board, by default size as in PokerGame
+        :param decks: The decks to find the best scores for, by default those of runPoker.py for 2 to 5 players
+        :param handSize: The number of gates dealt to each player
+        :return: BoardCatalog
+        """
+        nRandOneQGates = size if nRandOneQGates is None else nRandOneQGates
+        decks = defaultDecks if decks is None else decks
+        rng = RandomState()
+        draws = [replayInitState(boardSeed, size, enableEntanglement, nRandOneQGates, nRandTwoQGates, rng)
+                 for boardSeed in range(firstSeed, firstSeed + nSeeds)]
+        choices = array([choice for choice, cxs in draws], dtype=int).reshape(nSeeds, nRandOneQGates)
+        cxs = array([cxs for choice, cxs in draws], dtype=int).reshape(nSeeds, -1, 2)
+        psis = initialStates(choices, cxs, size)
+        # The amplitudes are sums of a few products of +-1/sqrt(2), so equal states agree to far more digits than these
+        keys = round(concatenate((psis.real, psis.imag), axis=1) * 1e9).astype(int)
+        keys, first, stateOfSeed = unique(keys, axis=0, return_index=True, return_inverse=True)
+        psis = psis[first]
+        # Decks that only differ in cards beyond the size of a hand have the same best scores
+        searched = {}
+        scores = empty((psis.shape[0], len(decks)))
+        for k, deck in enumerate(decks):
+            key = tuple(sorted((gate, min(number, handSize)) for gate, number in deck.items() if number > 0))
+            if key not in searched:
+                searched[key] = bestScores(psis, size, deck, handSize)
+            scores[:, k] = searched[key]
+        params = dict(size=size, enableEntanglement=enableEntanglement, nRandOneQGates=nRandOneQGates,
+                      nRandTwoQGates=nRandTwoQGates, firstSeed=firstSeed, handSize=handSize)
+        return BoardCatalog(params, stateOfSeed.reshape(-1).astype(int32), psis, decks, scores)
+
+    def save(self, path):
+        """
+        Stores the catalog as a compressed numpy archive. The analytics are derived again when it is loaded.
+        """
+        from numpy import savez_compressed
+        savez_compressed(path, stateOfSeed=self.stateOfSeed, psis=self.psis, bestScores=self.bestScores,
+                         params=json.dumps(self.params), decks=json.dumps(self.decks))
+
+    @staticmethod
+    def load(path):
+        from numpy import load
+        with load(path) as archive:
+            return BoardCatalog(json.loads(str(archive["params"])), archive["stateOfSeed"], archive["psis"],
+                                json.loads(str(archive["decks"])), archive["bestScores"])
+
+    def covers(self, boardSeed, size, enableEntanglement, nRandOneQGates, nRandTwoQGates):
+        """
+        :return: Whether the catalog holds the initial state of a Board created with these arguments
+        """
+        params = self.params
+        sameBoards = (params["size"], params["nRandOneQGates"], params["enableEntanglement"]) == \
+            (size, nRandOneQGates, bool(enableEntanglement))
+        # The number of CX gates only matters with entanglement
+        sameBoards &= not enableEntanglement or params["nRandTwoQGates"] == nRandTwoQGates
+        return sameBoards and 0 <= boardSeed - self.firstSeed < self.stateOfSeed.shape[0]
+
+    def stateIndex(self, boardSeed):
+        return int(self.stateOfSeed[boardSeed - self.firstSeed])
+
+    def analytics(self, boardSeed):
+        """
+        :return: The BoardAnalytics of the initial state of boardSeed, without a version
+        """
+        state = self.stateIndex(boardSeed)
+        pairs = qubitPairs(self.size)
+        return BoardAnalytics(None, self.psis[state], self.probs01[state], self.probsPlusMinus[state],
+                              [pairs[k] for k in nonzero(self.bellPairs[state])[0]])
+
+    def seeds(self, stateMask=None):
+        """
+        :param stateMask: Boolean array with an entry for each state, e.g. catalog.bellPairCounts() == 1. By default
+                          all states.
+        :return: Array with the seeds whose initial state is selected by stateMask
+        """
+        if stateMask is None:
+            return self.firstSeed + arange(self.stateOfSeed.shape[0])
+        return self.firstSeed + nonzero(stateMask[self.stateOfSeed])[0]
+
+    def bellPairCounts(self):
+        """
+        :return: Array with the number of Bell pairs of each state
+        """
+        return self.bellPairs.sum(axis=1)
+
+    def expectedScores(self):
+        """
+        :return: Array with the expected score of each state before any gate is applied
+        """
+        return self.probs01.sum(axis=1)
+
+    def deckIndex(self, deck):
+        """
+        :return: The column of bestScores of deck
+        """
+        return self.decks.index(deck)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Enumerates the initial boards of a range of seeds and stores them.")
+    parser.add_argument("--seeds", type=int, default=1 << 16, help="number of seeds, from --first-seed on")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=defaultSize)
+    parser.add_argument("--no-entanglement", action="store_true", help="boards without random CX gates")
+    parser.add_argument("--output", default="boardCatalog.npz", help="file to store the catalog in")
+    args = parser.parse_args()
+    start = perf_counter()
+    catalog = BoardCatalog.build(args.seeds, args.size, not args.no_entanglement, firstSeed=args.first_seed)
+    print("{} seeds give {} distinct boards, enumerated in {:.1f} s".format(args.seeds, catalog.psis.shape[0],
+                                                                          perf_counter() - start))
+    counts = catalog.bellPairCounts()
+    for pairs in range(counts.max() + 1):
+        print("{} Bell pairs: {} seeds".format(pairs, catalog.seeds(counts == pairs).shape[0]))
+    for k, deck in enumerate(catalog.decks):
+        print("Mean best score with deck {}: {:.3f}".format(deck, catalog.bestScores[catalog.stateOfSeed, k].mean()))
+    catalog.save(args.output)
@@ -0,0 +1,60 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+import subprocess
+import json
+
+# Budget in seconds for a cold import of each engine module, measured in a fresh interpreter.
+importBudgets = {"Python.helpFiles": 0.3, "Python.Buttons": 0.3, "Python.Board": 0.3, "Python.PokerGame": 0.3}
+# Modules that must only be loaded on the code paths that need them.
+heavyModules = ["qiskit", "scipy", "matplotlib", "tkinter"]
+
+_measureImport = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+t = time.perf_counter() - t
+print(json.dumps({{"time": t, "loaded": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def measureImport(module):
+    """
+    Imports a module in a fresh interpreter.
+    :param module: Name of the module, e.g. "Python.Board"
+    :return: dict with the import time in seconds and the heavy modules that were loaded by the import
+    """
+    root = dirname(dirname(abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", _measureImport.format(module=module, heavy=heavyModules)],
+                            cwd=root, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def checkImportTime(budgets=importBudgets, repeats=3):
+    """
+    Checks that each module imports within its budget and without loading any of the heavy modules.
+    :param budgets: dict with module names as keys and the time budget in seconds as values
+    :param repeats: The best of this many imports is compared to the budget
+    :return: List of failure messages, empty if all modules are within budget
+    """
+    failures = []
+    for module, budget in budgets.items():
+        results = [measureImport(module) for i in range(repeats)]
+        best = min(result["time"] for result in results)
+        print("{:<20} {:.3f} s (budget {:.3f} s)".format(module, best, budget))
+        if best > budget:
+            failures.append("{} took {:.3f} s to import, the budget is {:.3f} s".format(module, best, budget))
+        if results[0]["loaded"]:
+            failures.append("{} loaded {}".format(module, ", ".join(results[0]["loaded"])))
+    return failures
+
+
+if __name__ == "__main__":
+    failures = checkImportTime()
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,263 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath, exists
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+from Python.batchEnvironment import BatchPokerEnvironment, CALL, END
+from Python.statevector import applyGates, probs01
+from Python.metrics import timed
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from zlib import crc32
+from os import cpu_count, replace
+from numpy import zeros, where, unique
+from argparse import ArgumentParser
+from time import perf_counter
+import json
+
+# Judges decks of gates by playing many hands of every configuration of a grid of decks, entanglement settings and
+# numbers of players with the batch environment. Every player calls in the betting rounds, so that every hand is
+# decided by the boards alone. In the gate round a greedy player applies the move that raises the expected score of
+# its board the most until no move raises it, and a random player takes random legal actions. Each configuration is
+# played by a table of greedy players, the best play, and by a table where only player 0 is greedy. Configurations are
+# split into tasks that run on a process pool, and the statistics of every finished task are written to a checkpoint,
+# so an interrupted sweep goes on where it stopped.
+
+# The tables each configuration is played by: every player greedy, or only player 0
+modes = ("best", "mixed")
+
+
+def deckGrid(gates, counts):
+    """
+    :param gates: Names of the gates
+    :param counts: The numbers of copies of each gate per player to combine, e.g. (0, 1, 2)
+    :return: List of dicts with the copies of each gate per player, every combination with at least three gates per
+             player. runPoker.py deals one copy of H, X, ZH and CX per player.
+    """
+    return [dict(zip(gates, copies)) for copies in product(counts, repeat=len(gates)) if sum(copies) >= 3]
+
+
+def configurationKey(deckPerPlayer, enableEntanglement, nPlayers):
+    return "{}/{}/{}p".format("-".join("{}{}".format(gate, n) for gate, n in deckPerPlayer.items() if n > 0),
+                              "entangled" if enableEntanglement else "product", nPlayers)
+
+
+def greedyActions(environment, games):
+    """
+    :param games: Indices of games in the gate round
+    :return: Array with the action of the player in turn in each of games: the legal move that raises the expected
+             score of the board of the player the most, or END if no move raises it
+    """
+    players = environment.player[games]
+    psis = environment.psis[games, players]
+    hands = environment.hands[games, players]
+    best = environment.probs01[games, players].sum(axis=1) + 1e-9
+    actions = zeros(len(games), dtype=int)
+    for m, (g, coords) in enumerate(environment.moves):
+        holding = where(hands[:, g] > 0)[0]
+        if len(holding) == 0:
+            continue
+        scores = probs01(applyGates(psis[holding], environment.gates[g], coords, environment.size),
+                         environment.size).sum(axis=1)
+        better = scores > best[holding]
+        best[holding[better]] = scores[better]
+        actions[holding[better]] = 1 + m
+    return actions
+
+
+def _handKey(environment, hand):
+    return "+".join("{}{}".format(n, environment.gates[g]) if n > 1 else environment.gates[g]
+                    for g, n in enumerate(hand) if n > 0)
+
+
+@timed("deckSweep.playHands")
+def playHands(deckPerPlayer, enableEntanglement, nPlayers, mode, nHands, nGames=256, seed=None):
+    """
+    Plays at least nHands hands of one configuration.
+    :param deckPerPlayer: dict with the copies of each gate per player
+    :param mode: "best" for a table of greedy players, "mixed" for only player 0 greedy
+    :return: dict of statistics that add up over the hands: "hands", and for each player "wins", "scoreSum" and
+             "scoreSquares", and "winsByHand" with the wins and the number of hands of each hand of gates dealt
+    """
+    deck = {gate: n * nPlayers for gate, n in deckPerPlayer.items() if n > 0}
+    environment = BatchPokerEnvironment(min(nGames, nHands), nPlayers, deck, enableEntanglement=enableEntanglement,
+                                        seed=seed)
+    greedy = zeros(nPlayers, dtype=bool)
+    greedy[:nPlayers if mode == "best" else 1] = True
+    stats = {"hands": 0, "wins": [0] * nPlayers, "scoreSum": [0] * nPlayers, "scoreSquares": [0] * nPlayers,
+             "winsByHand": {}}
+    observation = environment.reset()
+    dealt = environment.hands.copy()
+    while stats["hands"] < nHands:
+        actions = where(environment.bettingRound < 4, CALL, END)
+        gateRound = environment.bettingRound == 4
+        thinking = where(gateRound & greedy[environment.player])[0]
+        actions[thinking] = greedyActions(environment, thinking)
+        guessing = where(gateRound & ~greedy[environment.player])[0]
+        legal = observation["legal"][guessing]
+        actions[guessing] = (environment.rng.random(legal.shape) * legal).argmax(axis=1)
+
+        observation, rewards, done = environment.step(actions)
+        games = where(done)[0]
+        if len(games) == 0:
+            continue
+        wins, scores = rewards[games] > 0, environment.showdownScores[games]
+        stats["hands"] += len(games)
+        for key, values in (("wins", wins), ("scoreSum", scores), ("scoreSquares", scores ** 2)):
+            stats[key] = [int(a + b) for a, b in zip(stats[key], values.sum(axis=0))]
+        if mode == "best":
+            hands = dealt[games].reshape(-1, len(environment.gates))
+            distinct, inverse = unique(hands, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            for k, hand in enumerate(distinct):
+                entry = stats["winsByHand"].setdefault(_handKey(environment, hand), [0, 0])
+                entry[0] += int(wins.reshape(-1)[inverse == k].sum())
+                entry[1] += int((inverse == k).sum())
+        dealt[games] = environment.hands[games]
+    return stats
+
+
+def mergeStats(first, second):
+    """
+    :return: The statistics of the hands of both, see playHands
+    """
+    merged = {"hands": first["hands"] + second["hands"], "winsByHand": dict(first["winsByHand"])}
+    for key in ("wins", "scoreSum", "scoreSquares"):
+        merged[key] = [a + b for a, b in zip(first[key], second[key])]
+    for hand, (wins, count) in second["winsByHand"].items():
+        previous = merged["winsByHand"].get(hand, [0, 0])
+        merged["winsByHand"][hand] = [previous[0] + wins, previous[1] + count]
+    return merged
+
+
+def summarize(best, mixed, minDealt=50):
+    """
+    :param best: The statistics of the table of greedy players, see playHands
+    :param mixed: The statistics of the table where only player 0 is greedy
+    :param minDealt: The number of times a hand must be dealt for its win rate to count in the spread
+    :return: dict with "hands", "meanScore" and "scoreVariance" of the measured scores of the best play,
+             "advantage", the mean score of the greedy player less that of the random players, "greedyWinRate", the
+             win rate of the greedy player among random players, and "winRateSpread", the highest less the lowest
+             win rate of the hands of gates dealt in the best play
+    """
+    nPlayers = len(best["wins"])
+    nScores = best["hands"] * nPlayers
+    meanScore = sum(best["scoreSum"]) / nScores
+    others = mixed["hands"] * (nPlayers - 1)
+    rates = [wins / count for wins, count in best["winsByHand"].values() if count >= minDealt]
+    return {"hands": best["hands"] + mixed["hands"], "meanScore": meanScore,
+            "scoreVariance": sum(best["scoreSquares"]) / nScores - meanScore ** 2,
+            "advantage": mixed["scoreSum"][0] / mixed["hands"] - sum(mixed["scoreSum"][1:]) / others,
+            "greedyWinRate": mixed["wins"][0] / mixed["hands"],
+            "winRateSpread": max(rates) - min(rates) if len(rates) > 0 else float("nan")}
+
+
+def sweepTasks(decks, entanglements, players, hands, handsPerTask):
+    """
+    :return: dict from the key of each task to its arguments of playHands, every configuration in every mode split
+             into parts of handsPerTask hands
+    """
+    tasks = {}
+    for deckPerPlayer, enableEntanglement, nPlayers, mode in product(decks, entanglements, players, modes):
+        key = configurationKey(deckPerPlayer, enableEntanglement, nPlayers)
+        for part in range(-(-hands // handsPerTask)):
+            tasks["{}/{}/{}".format(key, mode, part)] = (deckPerPlayer, enableEntanglement, nPlayers, mode,
+                                                         min(handsPerTask, hands - part * handsPerTask))
+    return tasks
+
+
+def loadCheckpoint(path):
+    """
+    :return: dict from the key of each finished task to its statistics, empty if there is no checkpoint at path
+    """
+    if path is None or not exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def saveCheckpoint(path, results):
+    # Written next to the checkpoint and moved over it, so an interruption never leaves half a file
+    with open(path + ".tmp", "w") as file:
+        json.dump(results, file)
+    replace(path + ".tmp", path)
+
+
+def _runTask(key, arguments, nGames, seed):
+    return key, playHands(*arguments, nGames=nGames, seed=[seed, crc32(key.encode())])
+
+
+def runSweep(tasks, checkpoint=None, workers=None, nGames=256, seed=0, log=print):
+    """
+    Runs the tasks that are not in the checkpoint on a process pool, and adds each to the checkpoint when it finishes.
+    Every task has its own seed, from seed and its key, so a resumed sweep gives the same results.
+    :param tasks: See sweepTasks
+    :param checkpoint: Path of the checkpoint, None for none
+    :param workers: Number of processes, by default one per core
+    :return: dict from the key of each task to its statistics
+    """
+    results = {key: stats for key, stats in loadCheckpoint(checkpoint).items() if key in tasks}
+    pending = [key for key in tasks if key not in results]
+    log("{} of {} tasks done, {} to run".format(len(results), len(tasks), len(pending)))
+    if len(pending) == 0:
+        return results
+    with ProcessPoolExecutor(max_workers=workers or cpu_count()) as pool:
+        futures = [pool.submit(_runTask, key, tasks[key], nGames, seed) for key in pending]
+        for future in as_completed(futures):
+            key, stats = future.result()
+            results[key] = stats
+            if checkpoint is not None:
+                saveCheckpoint(checkpoint, results)
+            log("{} of {} tasks done".format(len(results), len(tasks)))
+    return results
+
+
+def summarizeSweep(results, minDealt=50):
+    """
+    :param results: dict from the key of each task to its statistics, see runSweep
+    :return: dict from the key of each configuration with both modes played to its summary, see summarize
+    """
+    merged = {}
+    for key, stats in results.items():
+        configuration, mode, part = key.rsplit("/", 2)
+        tables = merged.setdefault(configuration, {})
+        tables[mode] = mergeStats(tables[mode], stats) if mode in tables else stats
+    return {configuration: summarize(tables["best"], tables["mixed"], minDealt)
+            for configuration, tables in merged.items() if all(mode in tables for mode in modes)}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Plays many hands of a grid of decks, entanglement settings and numbers of "
+                                        "players, and reports how fair and how interesting each configuration is.")
+    parser.add_argument("--gates", nargs="+", default=["H", "X", "ZH", "CX"])
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 1, 2],
+                        help="copies of each gate per player to combine")
+    parser.add_argument("--players", type=int, nargs="+", default=[2, 3, 4])
+    parser.add_argument("--entanglement", choices=["both", "on", "off"], default="both",
+                        help="whether the initial boards have random CX gates")
+    parser.add_argument("--hands", type=int, default=4000, help="hands per configuration and table")
+    parser.add_argument("--hands-per-task", type=int, default=1000)
+    parser.add_argument("--games", type=int, default=256, help="games stepped at once in each task")
+    parser.add_argument("--workers", type=int, default=None, help="processes, by default one per core")
+    parser.add_argument("--checkpoint", default="deckSweep.json", help="file of finished tasks, to resume from")
+    parser.add_argument("--min-dealt", type=int, default=50,
+                        help="times a hand must be dealt for its win rate to count in the spread")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    entanglements = {"both": [True, False], "on": [True], "off": [False]}[args.entanglement]
+    tasks = sweepTasks(deckGrid(args.gates, args.counts), entanglements, args.players, args.hands, args.hands_per_task)
+    start = perf_counter()
+    results = runSweep(tasks, args.checkpoint, args.workers, args.games, args.seed)
+    print("Sweep done in {:.1f} s".format(perf_counter() - start))
+    summaries = summarizeSweep(results, args.min_dealt)
+    print("{:<32} {:>7} {:>6} {:>9} {:>10} {:>9} {:>8}".format("configuration", "hands", "mean", "variance",
+                                                               "advantage", "win rate", "spread"))
+    for configuration in sorted(summaries, key=lambda key: summaries[key]["winRateSpread"]):
+        summary = summaries[configuration]
+        print("{:<32} {:>7} {:>6.2f} {:>9.2f} {:>10.2f} {:>9.3f} {:>8.3f}".format(
+            configuration, summary["hands"], summary["meanScore"], summary["scoreVariance"], summary["advantage"],
+            summary["greedyWinRate"], summary["winRateSpread"]))
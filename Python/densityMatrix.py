@@ -0,0 +1,179 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from numpy import array, zeros, eye, sqrt, real, diagonal, moveaxis, einsum, stack, bincount, arange, argsort
+from itertools import combinations
+from Python.mps import gateMatrix, densityBellStateProbs
+from Python.statevector import popcounts
+
+# Density matrices of noisy boards, as on hardware where every gate is followed by some noise. The matrix of n qubits
+# has shape (2**n, 2**n), rows and columns ordered as in qiskit. Gates and noise channels are both applied as a batch
+# of operators O_k, rho -> sum_k O_k rho O_k^dagger, summed into one superoperator on the axes of their qubits.
+
+_pauli = {"X": array([[0, 1], [1, 0]], dtype=complex), "Y": array([[0, -1j], [1j, 0]], dtype=complex),
+          "Z": array([[1, 0], [0, -1]], dtype=complex)}
+
+
+def depolarizing(p):
+    """
+    :param p: Probability that the qubit is replaced by the maximally mixed state
+    :return: Array of shape (4, 2, 2) with the Kraus operators of the channel on one qubit
+    """
+    return stack([sqrt(1 - 3 * p / 4) * eye(2, dtype=complex)] + [sqrt(p / 4) * _pauli[name] for name in "XYZ"])
+
+
+def amplitudeDamping(gamma):
+    """
+    :param gamma: Probability that |1> decays to |0>
+    :return: Array of shape (2, 2, 2) with the Kraus operators of the channel on one qubit
+    """
+    return array([[[1, 0], [0, sqrt(1 - gamma)]], [[0, sqrt(gamma)], [0, 0]]], dtype=complex)
+
+
+def composeChannels(first, second):
+    """
+    :return: The Kraus operators of the channel first followed by second, all products of their operators
+    """
+    return array([b @ a for a in first for b in second])
+
+
+class DensityMatrix:
+    def __init__(self, rho):
+        """
+        The state of a board on noisy hardware, a mixture of wavevectors. Use DensityMatrix.zeros to create the state
+        |0...0>. Gates and channels return a new state and never change this one, so states can be kept, e.g. in
+        BoardAnalytics, while moves are applied to them. The analytics have the names of those of MatrixProductState.
+        :param rho: Array of shape (2**size, 2**size)
+        """
+        self.rho = rho
+        self.size = rho.shape[0].bit_length() - 1
+
+    @staticmethod
+    def zeros(size):
+        rho = zeros((2 ** size, 2 ** size), dtype=complex)
+        rho[0, 0] = 1
+        return DensityMatrix(rho)
+
+    def copy(self):
+        return DensityMatrix(self.rho.copy())
+
+    def applyGate(self, gate, coords, inverse=False):
+        """
+        :param gate: The name of the gate, as in Board.playerMoveInteractive
+        :param coords: The qubits of the gate, the controls first
+        :param inverse: Apply the inverse of the gate
+        :return: The state after the gate, without noise
+        """
+        state = self.copy()
+        state._apply(gateMatrix(gate, len(coords), inverse)[None], [int(coord) for coord in coords])
+        return state
+
+    def applyGates(self, gates, kraus=None, noisy=None):
+        """
+        :param gates: List of (gate, coords)
+        :param kraus: Kraus operators of shape (m, 2, 2) of the noise applied to every qubit of a gate after it, None
+                      for no noise
+        :param noisy: For each gate whether it is followed by noise, by default all of them
+        :return: The state after the gates
+        """
+        state = self.copy()
+        for k, (gate, coords) in enumerate(gates):
+            state._apply(gateMatrix(gate, len(coords))[None], [int(coord) for coord in coords])
+            if kraus is not None and (noisy is None or noisy[k]):
+                for coord in coords:
+                    state._apply(kraus, [int(coord)])
+        return state
+
+    def applyChannel(self, kraus, qubit):
+        """
+        :param kraus: Kraus operators of shape (m, 2, 2), see depolarizing and amplitudeDamping
+        :return: The state after the channel on qubit
+        """
+        state = self.copy()
+        state._apply(kraus, [int(qubit)])
+        return state
+
+    def _apply(self, operators, qubits):
+        # rho -> sum_k O_k rho O_k^dagger for operators of shape (m, 2**k, 2**k), bit j of their indices is qubits[j].
+        # The sum is one superoperator on the row and column bits of the qubits, applied in a single matrix product.
+        n, k = self.size, len(qubits)
+        superoperator = einsum("mab,mcd->acbd", operators, operators.conj()).reshape(4 ** k, 4 ** k)
+        # Axis 0 of a reshaped row or column is the highest bit
+        rowAxes = [n - 1 - qubits[j] for j in reversed(range(k))]
+        columnAxes = [2 * n - 1 - qubits[j] for j in reversed(range(k))]
+        order = rowAxes + columnAxes + [axis for axis in range(2 * n) if axis not in rowAxes + columnAxes]
+        tensor = self.rho.reshape((2,) * (2 * n)).transpose(order)
+        out = (superoperator @ tensor.reshape(4 ** k, -1)).reshape(tensor.shape)
+        self.rho = out.transpose(argsort(order)).reshape(2 ** n, 2 ** n)
+
+    def reducedDensity(self, qubits):
+        """
+        :param qubits: Different qubits
+        :return: The density matrix of the qubits, with bit k of its indices the k-th of the qubits
+        """
+        n, k = self.size, len(qubits)
+        rowAxes = [n - 1 - int(qubits[j]) for j in reversed(range(k))]
+        columnAxes = [2 * n - 1 - int(qubits[j]) for j in reversed(range(k))]
+        tensor = moveaxis(self.rho.reshape((2,) * (2 * n)), rowAxes + columnAxes, list(range(2 * k)))
+        return einsum("abii->ab", tensor.reshape(2 ** k, 2 ** k, 2 ** (n - k), 2 ** (n - k)))
+
+    def probs01(self):
+        """
+        :return: Array with the probability of measuring 1 for each qubit
+        """
+        density = real(diagonal(self.rho))
+        return array([density.reshape(-1, 2, 2 ** qubit)[:, 1, :].sum() for qubit in range(self.size)])
+
+    def probsPlusMinus(self):
+        """
+        :return: Array with the probability of measuring - for each qubit
+        """
+        densities = [self.reducedDensity([qubit]) for qubit in range(self.size)]
+        return array([real(rho[0, 0] + rho[1, 1] - rho[0, 1] - rho[1, 0]) / 2 for rho in densities])
+
+    def bellStateProbs(self, coords):
+        """
+        :param coords: 2 or 3 qubits
+        :return: The probabilities of the Bell states of the qubits, in the order of Board.getBellStateProbs and
+                 Board.getBellStateProbs3
+        """
+        return densityBellStateProbs(self.reducedDensity(coords))
+
+    def bellPairs(self, tolerance=1e-4):
+        """
+        :return: The pairs of qubits in a Bell state, as found by Board.findBellPairs. Noise leaves few of them.
+        """
+        return [(i, j) for i in range(self.size - 1) for j in range(i + 1, self.size)
+                if abs(self.bellStateProbs((i, j)).max() - 1) < tolerance]
+
+    def pairDensities(self, qubits=None):
+        """
+        :param qubits: Sorted qubits, all qubits by default
+        :return: Array of shape (number of pairs, 4, 4) with the density matrix of each pair of the qubits (i, j),
+                 i < j, in the order of itertools.combinations, with bit 0 of its indices qubit i
+        """
+        qubits = list(range(self.size)) if qubits is None else qubits
+        return array([self.reducedDensity((i, j)) for i, j in combinations(qubits, 2)]).reshape(-1, 4, 4)
+
+    def purity(self):
+        """
+        :return: The trace of rho squared, 1 for a wavevector and 2**-size for the maximally mixed state
+        """
+        return float(real(einsum("ij,ji->", self.rho, self.rho)))
+
+    def scoreDistribution(self):
+        """
+        :return: Array with the probability of measuring k ones, for k from 0 to the number of qubits
+        """
+        return bincount(popcounts(self.size), weights=real(diagonal(self.rho)), minlength=self.size + 1)
+
+    def sample(self, shots, rng):
+        """
+        :param rng: A numpy Generator
+        :return: Array of shape (shots, size) with the measured bits
+        """
+        probs = real(diagonal(self.rho)).clip(0, None)
+        indices = rng.choice(probs.shape[0], size=shots, p=probs / probs.sum())
+        return (indices[:, None] >> arange(self.size)[None, :]) & 1
@@ -0,0 +1,168 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from numpy import asarray, stack, moveaxis, log2, abs, clip, where, zeros
+from numpy.linalg import eigvalsh
+from itertools import combinations
+from Python.metrics import timed
+
+# The entanglement structure of boards: the purity and entropy of the reduced state of every qubit and every pair of
+# qubits, and the triples of qubits in a GHZ-type state. A qubit is entangled with the rest of the board when its
+# reduced state is mixed, i.e. its purity is below 1 and its entropy above 0. Three qubits are in a GHZ-type state when
+# they are in a pure state together while each of them is maximally mixed, which for three qubits leaves only the GHZ
+# states up to gates on single qubits, e.g. (|000> + |111>)/sqrt(2).
+
+tolerance = 1e-4
+
+
+def reducedDensities(psis, size, subsets):
+    """
+    :param psis: Array of shape (n, 2**size) with wavevectors
+    :param subsets: List of tuples of k different qubits
+    :return: Array of shape (n, number of subsets, 2**k, 2**k) with the density matrix of each subset of each
+             wavevector, with bit j of its indices the j-th qubit of the subset
+    """
+    tensor = asarray(psis).reshape((-1,) + (2,) * size)
+    densities = []
+    for subset in subsets:
+        # Qubit i is the axis size-i of the tensor, and the highest bit of the reshaped subset is its first axis
+        axes = [size - qubit for qubit in reversed(subset)]
+        amplitudes = moveaxis(tensor, axes, list(range(1, len(subset) + 1))).reshape(tensor.shape[0], 2 ** len(subset),
+                                                                                     -1)
+        densities.append(amplitudes @ amplitudes.conj().transpose(0, 2, 1))
+    return stack(densities, axis=1)
+
+
+def purities(rhos):
+    """
+    :param rhos: Array of density matrices of shape (..., d, d)
+    :return: Array of shape (...) with the trace of each rho squared, 1 for a pure state and 1/d for the maximally mixed
+             state
+    """
+    return (rhos.real ** 2 + rhos.imag ** 2).sum(axis=(-2, -1))
+
+
+def entropies(rhos):
+    """
+    :param rhos: Array of density matrices of shape (..., d, d)
+    :return: Array of shape (...) with the von Neumann entropy of each rho in bits, 0 for a pure state and log2(d) for
+             the maximally mixed state
+    """
+    eigenvalues = clip(eigvalsh(rhos), 0, 1)
+    return -(eigenvalues * log2(where(eigenvalues > 0, eigenvalues, 1))).sum(axis=-1)
+
+
+class Entanglement:
+    def __init__(self, size, purities1, entropies1, ghzTriples, pairDensities):
+        """
+        The entanglement structure of one board. The states of the pairs of qubits are only computed when their
+        purities or entropies are first asked for, as there are many pairs on wide boards.
+        :param size: Number of qubits
+        :param purities1: Array with the purity of the reduced state of each qubit
+        :param entropies1: Array with the entropy of the reduced state of each qubit, in bits
+        :param ghzTriples: List of the triples of qubits (i, j, k), i < j < k, in a GHZ-type state
+        :param pairDensities: Function returning the density matrices of all pairs of qubits in the order of pairs,
+                              e.g. MatrixProductState.pairDensities
+        """
+        self.size = size
+        self.pairs = list(combinations(range(size), 2))
+        self.purities1 = purities1
+        self.entropies1 = entropies1
+        self.ghzTriples = ghzTriples
+        self.pairDensities = pairDensities
+        self.purities2 = None
+        self.entropies2 = None
+
+    def _analysePairs(self):
+        if self.purities2 is None:
+            rhos = self.pairDensities()
+            self.purities2, self.entropies2 = purities(rhos), entropies(rhos)
+
+    def pairPurities(self):
+        """
+        :return: Array with the purity of the reduced state of each pair of qubits, in the order of pairs
+        """
+        self._analysePairs()
+        return self.purities2
+
+    def pairEntropies(self):
+        """
+        :return: Array with the entropy of the reduced state of each pair of qubits, in bits
+        """
+        self._analysePairs()
+        return self.entropies2
+
+    def entangledQubits(self):
+        """
+        :return: The qubits that are entangled with the rest of the board
+        """
+        return [i for i in range(self.size) if self.purities1[i] < 1 - tolerance]
+
+    def mutualInformation(self):
+        """
+        :return: Array with the mutual information S(i) + S(j) - S(ij) of each pair of qubits, in bits, 2 for a Bell
+                 pair and 0 for qubits that share no correlation
+        """
+        first, second = zip(*self.pairs) if len(self.pairs) > 0 else ((), ())
+        return self.entropies1[list(first)] + self.entropies1[list(second)] - self.pairEntropies()
+
+
+def _ghzTriples(mixed, mixedPairPurities, triplePurities):
+    # In a pure state of three qubits the purity of each pair is that of the third qubit, 1/2 for a GHZ-type state, so
+    # only triples whose pairs all have purity 1/2 are candidates. mixedPairPurities holds the purities of the pairs
+    # of mixed qubits in the order of itertools.combinations, and triplePurities gives those of a list of triples.
+    pairPurity = dict(zip(combinations(mixed, 2), mixedPairPurities))
+    candidates = [triple for triple in combinations(mixed, 3)
+                  if all(abs(pairPurity[pair] - 0.5) < tolerance for pair in combinations(triple, 2))]
+    if len(candidates) == 0:
+        return []
+    return [triple for triple, purity in zip(candidates, triplePurities(candidates)) if purity > 1 - tolerance]
+
+
+def _isMaximallyMixed(purity1):
+    return abs(purity1 - 0.5) < tolerance
+
+
+@timed("entanglement.analyse")
+def analyse(psis, size):
+    """
+    Analyses a batch of wavevectors at once. The density matrices of all qubits of all wavevectors come from one pass,
+    and only pairs and triples of maximally mixed qubits, the only ones that can be in a GHZ-type state, are checked.
+    :param psis: Array of shape (n, 2**size)
+    :return: List of the Entanglement of each wavevector
+    """
+    psis = asarray(psis).reshape(-1, 2 ** size)
+    singles = reducedDensities(psis, size, [(i,) for i in range(size)])
+    purities1, entropies1 = purities(singles), entropies(singles)
+    allPairs = list(combinations(range(size), 2))
+    results = []
+    for n in range(psis.shape[0]):
+        psi = psis[n:n + 1]
+        mixed = [i for i in range(size) if _isMaximallyMixed(purities1[n, i])]
+        mixedPairs = list(combinations(mixed, 2))
+        mixedPairPurities = purities(reducedDensities(psi, size, mixedPairs))[0] if len(mixedPairs) > 0 else []
+        ghzTriples = _ghzTriples(mixed, mixedPairPurities,
+                                 lambda triples: purities(reducedDensities(psi, size, triples))[0])
+        results.append(Entanglement(size, purities1[n], entropies1[n], ghzTriples,
+                                    lambda psi=psi: reducedDensities(psi, size, allPairs)[0] if size >= 2
+                                    else zeros((0, 4, 4), dtype=complex)))
+    return results
+
+
+@timed("entanglement.analyseState")
+def analyseState(state):
+    """
+    Analyses a state that is not a wavevector, from the reduced density matrices it provides. Only the pairs of
+    maximally mixed qubits are analysed at once, the other pairs when they are first asked for.
+    :param state: A MatrixProductState or DensityMatrix
+    :return: The Entanglement of the state
+    """
+    size = state.size
+    singles = stack([state.reducedDensity([i]) for i in range(size)])
+    purities1 = purities(singles)
+    mixed = [i for i in range(size) if _isMaximallyMixed(purities1[i])]
+    ghzTriples = _ghzTriples(mixed, purities(state.pairDensities(mixed)),
+                             lambda triples: [purities(state.reducedDensity(triple)) for triple in triples])
+    return Entanglement(size, purities1, entropies(singles), ghzTriples, state.pairDensities)
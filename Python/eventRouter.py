@@ -0,0 +1,123 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from Python.metrics import timed
+
+
+class EventRouter:
+    def __init__(self, canvas, renderer):
+        """
+        Receives the mouse and key events of a canvas once and hands each of them to the widget it concerns, found
+        through a dict from axes to widget. The hover colors of the widgets are also set here, and all color changes
+        of one event are drawn together by the renderer.
+        :param canvas: The canvas of the figure
+        :param renderer: The BlitRenderer of the figure
+        """
+        self.canvas = canvas
+        self.renderer = renderer
+        self.widgets = {}
+        self.textBoxes = []
+        self.pressHandlers = {}
+        self.motionHandlers = {}
+        self.keyHandlers = {}
+        self.motionAx = None
+        self.hovered = None
+        self.cids = [canvas.mpl_connect('motion_notify_event', self._motion),
+                     canvas.mpl_connect('button_press_event', self._press),
+                     canvas.mpl_connect('button_release_event', self._release),
+                     canvas.mpl_connect('key_press_event', self._keypress),
+                     canvas.mpl_connect('resize_event', self._resize)]
+
+    def add(self, *widgets):
+        """
+        Routes the events of widgets through this router, instead of each widget listening to the canvas.
+        :param widgets: Buttons and TextBoxes
+        """
+        for widget in widgets:
+            widget.disconnect_events()
+            self.widgets[widget.ax] = widget
+            if hasattr(widget, "_keypress"):
+                self.textBoxes.append(widget)
+
+    def connectPress(self, ax, func):
+        """
+        Calls func with every button press event inside ax.
+        """
+        self.pressHandlers[ax] = func
+
+    def disconnectPress(self, ax):
+        self.pressHandlers.pop(ax, None)
+
+    def connectMotion(self, ax, func):
+        """
+        Calls func with every motion event inside ax, and with the first event outside ax after the mouse has left it.
+        """
+        self.motionHandlers[ax] = func
+
+    def disconnectMotion(self, ax):
+        self.motionHandlers.pop(ax, None)
+
+    def connectKey(self, key, func):
+        """
+        Calls func with the key press events of key, e.g. "ctrl+z", while no TextBox is being typed in.
+        """
+        self.keyHandlers[key] = func
+
+    def disconnectKey(self, key):
+        self.keyHandlers.pop(key, None)
+
+    def resetHover(self):
+        self.hovered = None
+
+    @timed("ui.motion")
+    def _motion(self, event):
+        if event.inaxes in self.motionHandlers:
+            self.motionHandlers[event.inaxes](event)
+        elif self.motionAx in self.motionHandlers:
+            self.motionHandlers[self.motionAx](event)
+        self.motionAx = event.inaxes
+
+        widget = self.widgets.get(event.inaxes)
+        if widget is self.hovered:
+            return
+        if self.hovered is not None and not self.hovered.ignore(event):
+            self.hovered.ax.set_facecolor(self.hovered.color)
+            self.renderer.damage(self.hovered.ax)
+        if widget is not None and not widget.ignore(event):
+            widget.ax.set_facecolor(widget.hovercolor)
+            self.renderer.damage(widget.ax)
+        self.hovered = widget
+        self.renderer.draw()
+
+    def _press(self, event):
+        # A click anywhere else ends the typing in a TextBox
+        for textBox in self.textBoxes:
+            if textBox.capturekeystrokes and textBox.ax is not event.inaxes:
+                textBox._click(event)
+        widget = self.widgets.get(event.inaxes)
+        if widget is not None:
+            widget._click(event)
+        elif event.inaxes in self.pressHandlers:
+            self.pressHandlers[event.inaxes](event)
+
+    def _release(self, event):
+        # The widget that grabbed the mouse gets the release, also when the mouse has left its axes
+        widget = self.widgets.get(event.canvas.mouse_grabber)
+        if widget is not None:
+            widget._release(event)
+
+    def _keypress(self, event):
+        typing = False
+        for textBox in self.textBoxes:
+            if textBox.capturekeystrokes:
+                textBox._keypress(event)
+                typing = True
+        if not typing and event.key in self.keyHandlers:
+            self.keyHandlers[event.key](event)
+
+    def _resize(self, event):
+        for textBox in self.textBoxes:
+            if textBox.capturekeystrokes:
+                textBox._resize(event)
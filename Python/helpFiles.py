@@ -5,7 +5,6 @@
 
 from numpy import inf
 from numpy.random import randint
-from tkinter import Tk, simpledialog
 # ----Get Inputs--------------------------------------------------------------------------------------------------------
 
 
@@ -33,11 +32,15 @@ def getFloatInput(inputString, numMin, numMax):
     return num
 
 
-def getUnentangledTag(i, bellPairs):
+def getUnentangledTag(i, bellPairs, ghzTriples=()):
     tag = ""
     for j in range(len(bellPairs)):
         if i in bellPairs[j]:
             tag += "Pair " + chr(ord("A") + j) + "\n"
+    # GHZ-type triples, see entanglement.analyse
+    for j in range(len(ghzTriples)):
+        if i in ghzTriples[j]:
+            tag += "GHZ " + chr(ord("A") + j) + "\n"
 
     return tag
 
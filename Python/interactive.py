@@ -7,16 +7,30 @@ from os.path import dirname, abspath
 import sys
 sys.path.append(dirname(abspath(__file__)))
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from Python.helpFiles import getUnentangledTag
 from Python.CustomButton import Button
 from Python.CustomTextBox import TextBox
-from numpy import array, concatenate, flip
+from Python.renderer import BlitRenderer
+from Python.eventRouter import EventRouter
+from Python.metrics import timed
+from numpy import array, array_equal, concatenate, flip
+from functools import lru_cache
+
+undoKeys = ["ctrl+z", "cmd+z"]
+redoKeys = ["ctrl+y", "ctrl+Z", "cmd+Z"]
 
 
 class InteractiveContainer:
-    def __init__(self, nPlayers, dims, initialGates, names):
+    def __init__(self, nPlayers, dims, initialGates, names, offscreen=False):
+        """
+        :param offscreen: Render into an Agg canvas without a window, e.g. for streaming the table to spectators. The
+                          figure is then brought up to date after every update, as there is no event loop to do it.
+        """
         self.nPlayers = nPlayers
-        self.fig, self.ax, self.probsnum, self.probsStr = makeFigure(dims)
+        self.offscreen = offscreen
+        self.fig, self.ax, self.probsnum, self.probsStr = makeFigure(dims, offscreen)
         self.bellProbsInt, self.bellProbsStr, self.bellProbs_ax = createBellWindow(self.fig)
         self.buttonsDict, self.gates, self.notGates, self.patchDict = createButtonsInfig(self.fig)
         self.text_box, self.betText, self.buttonsDict['checkButton'], self.buttonsDict['foldButton'], \
@@ -24,9 +38,13 @@ class InteractiveContainer:
 
         self.infoTextLine0, self.infoTextLine1 = "Place a bet or fold.", "                 "
 
-        self.playerButtons, self.playerBet, self.playerMoney\
+        self.playerButtons, self.playerBet, self.playerMoney, self.playerNames\
             = createPlayerPatches(self.fig, self.ax, nPlayers, names)
         self.connects, self.playerConnects = {}, []
+        # Tick labels shown in the Bell window, the window is created without any
+        self.bellTickLabels = (None, None)
+        # Histogram of the scores of a multi-shot showdown, created when it is first shown
+        self.histogram_ax = None
 
         self.normalColors = ["darkgrey", "dimgray", "lightgray"]
         self.currentPlayerColors = ['lime', 'green', 'springgreen']
@@ -37,8 +55,14 @@ class InteractiveContainer:
         self.setInitialColors()
         self.updatePlayerPatches(initialGates)
 
-        self.currentAxes = None
-        self.motionCID = self.fig.canvas.mpl_connect('motion_notify_event', self._motion)
+        self.renderer = BlitRenderer(self.fig, flushWithoutEventLoop=offscreen)
+        self.renderer.addDynamic(self.ax, self.bellProbs_ax, self.text_box.ax, self.showPlayerHandButton.ax,
+                                 self.betText, self.infoText, *[button.ax for button in self.buttonsDict.values()])
+        self.renderer.addDynamic(*self.playerButtons, *self.playerNames, *self.playerBet, *self.playerMoney)
+
+        self.router = EventRouter(self.fig.canvas, self.renderer)
+        self.router.add(self.showPlayerHandButton, self.text_box, *self.buttonsDict.values())
+        self.text_box.renderer = self.renderer
 
     def setInitialColors(self):
         self.buttonsDict['End'].ax.set_facecolor(self.disconnectedColor)  # ax.set_facecolor updates color immediately
@@ -63,6 +87,7 @@ class InteractiveContainer:
     def setGateColor(self, button, color):
         self.buttonsDict[button].ax.set_facecolor(color)
         self.buttonsDict[button].color = color
+        self.renderer.damage(self.buttonsDict[button].ax)
 
     def setGateHoverColor(self, button, color):
         self.buttonsDict[button].hovercolor = color
@@ -70,23 +95,28 @@ class InteractiveContainer:
     def setShowHandButtonColor(self, color):
         self.showPlayerHandButton.ax.set_facecolor(color)
         self.showPlayerHandButton.color = color
+        self.renderer.damage(self.showPlayerHandButton.ax)
 
     def setShowHandHoverColor(self, color):
         self.showPlayerHandButton.hovercolor = color
 
     def setPlayerPatchColor(self, player, color):
         self.playerButtons[player].set_facecolor(color)
+        self.renderer.damage(self.playerButtons[player])
 
     def setGateText(self, button, text):
         self.buttonsDict[button].label.set_text(text)
+        self.renderer.damage(self.buttonsDict[button].ax)
 
     def setBetandCheck(self):
         self.text_box.label.set_text("Place bet:")
         self.buttonsDict['checkButton'].label.set_text("Check")
+        self.renderer.damage(self.text_box.ax, self.buttonsDict['checkButton'].ax)
 
     def setRaiseandCall(self):
         self.text_box.label.set_text("Raise:")
         self.buttonsDict['checkButton'].label.set_text("Call")
+        self.renderer.damage(self.text_box.ax, self.buttonsDict['checkButton'].ax)
 
     def getDisconnectedColor(self):
         return self.disconnectedColor
@@ -103,9 +133,98 @@ class InteractiveContainer:
     def getAllInColor(self):
         return self.allInColor
 
+    def resetTable(self, nPlayers, initialGates, names):
+        """
+        Brings the figure back to the state of a freshly created table, so that a new hand can be played without
+        rebuilding the window and its widgets. The player patches are only recreated if the players have changed.
+        :param nPlayers: Number of players in the new hand
+        :param initialGates: The deck of gates, shown in the rightmost column
+        :param names: Names of the players
+        :return: None
+        """
+        self.disconnectAll()
+
+        if nPlayers != self.nPlayers or [name.get_text() for name in self.playerNames] != list(names):
+            self.renderer.removeDynamic(*self.playerButtons, *self.playerNames, *self.playerBet, *self.playerMoney)
+            for patch in self.playerButtons:
+                self.fig.patches.remove(patch)
+            for text in self.playerBet + self.playerMoney + self.playerNames:
+                text.remove()
+            self.playerButtons, self.playerBet, self.playerMoney, self.playerNames \
+                = createPlayerPatches(self.fig, self.ax, nPlayers, names)
+            self.renderer.addDynamic(*self.playerButtons, *self.playerNames, *self.playerBet, *self.playerMoney)
+            self.nPlayers = nPlayers
+        for i in range(self.nPlayers):
+            self.playerBet[i].set_text("0")
+            self.playerMoney[i].set_text("0")
+        self.playerBet[-1].set_text("Bets:")
+        self.playerMoney[-1].set_text("Money left:")
+
+        self.updatePlayerGate({})
+        self.setInitialColors()
+        self.updatePlayerPatches(initialGates)
+        self.setGateText('Basis', "0,1")
+        self.setGateText('End', "End")
+        self.setBetandCheck()
+        self.text_box.set_val("")
+        self.updateNextBet(0, 0)
+
+        self.probsnum.set_data([array([0.5 for i in range(len(self.probsStr))])])
+        for probsStr in self.probsStr:
+            probsStr.set_text("")
+        self.unshowBellProbs()
+        self.unshowScoreHistogram()
+
+        self.infoTextLine0, self.infoTextLine1 = "Place a bet or fold.", "                 "
+        self.infoText.set_text("" + "          " + "\n> " + "Place a bet or fold.")
+        self.router.resetHover()
+        self.renderer.requestFullDraw()
+
+    def disconnectAll(self):
+        """
+        Disconnects every callback connected through this container, including the click on the board.
+        :return: None
+        """
+        self.router.disconnectPress(self.ax)
+        self.router.disconnectMotion(self.ax)
+        for key in undoKeys + redoKeys:
+            self.router.disconnectKey(key)
+        for key, cid in self.connects.items():
+            if key == 'showHand':
+                self.showPlayerHandButton.disconnect(cid)
+            elif key == 'Bet':
+                self.text_box.disconnect(cid)
+            else:
+                self.buttonsDict[key].disconnect(cid)
+        self.connects = {}
+
+    def connectNextHand(self, nextHandFunc):
+        """
+        Turns the "End" button into a "Next" button which deals the next hand.
+        :param nextHandFunc: Called with the click event
+        :return: None
+        """
+        self.setGateText('End', "Next")
+        self.connectEnd(nextHandFunc)
+
     def connectMouseclick(self, mouseClickFunc):
-        self.cidMC = self.fig.canvas.mpl_connect('button_press_event', lambda event: onclick(event, mouseClickFunc,
-                                                                                             self.ax))
+        self.router.connectPress(self.ax, lambda event: onclick(event, mouseClickFunc, self.ax))
+
+    def connectMouseHover(self, mouseHoverFunc):
+        """
+        Calls mouseHoverFunc with the qubit under the mouse when it moves over the board, and with None when it
+        leaves the board.
+        """
+        self.router.connectMotion(self.ax, lambda event: onhover(event, mouseHoverFunc, self.ax))
+
+    def connectUndo(self, undoFunc, redoFunc):
+        """
+        Connects the keys that take back a gate and apply it again, see undoKeys and redoKeys.
+        """
+        for key in undoKeys:
+            self.router.connectKey(key, lambda event: undoFunc())
+        for key in redoKeys:
+            self.router.connectKey(key, lambda event: redoFunc())
 
     def connectEnd(self, endFunc):
         self.connects['End'] = self.buttonsDict['End'].on_clicked(endFunc)
@@ -114,7 +233,7 @@ class InteractiveContainer:
 
     def disconnectEnd(self):
         if self.buttonsDict['End'] is not None:
-            self.buttonsDict['End'].disconnect(self.connects['End'])
+            self.buttonsDict['End'].disconnect(self.connects.pop('End'))
             self.setGateColor('End', self.disconnectedColor)
             self.setGateHoverColor('End', self.disconnectedColor)
 
@@ -123,21 +242,23 @@ class InteractiveContainer:
         self.showPlayerHandButton.ax.set_facecolor(self.normalColors[0])
         self.showPlayerHandButton.color = self.normalColors[0]
         self.showPlayerHandButton.hovercolor = self.normalColors[2]
+        self.renderer.damage(self.showPlayerHandButton.ax)
 
     def disconnectShowHandButton(self):
         self.showPlayerHandButton.disconnect(self.connects['showHand'])
         self.showPlayerHandButton.ax.set_facecolor(self.disconnectedColor)
         self.showPlayerHandButton.color = self.disconnectedColor
         self.showPlayerHandButton.hovercolor = self.disconnectedColor
+        self.renderer.damage(self.showPlayerHandButton.ax)
 
     def connectBellAndBasis(self, interactiveButtons):
-        self.buttonsDict['Basis'].on_clicked(interactiveButtons.changeBasis)
+        self.connects['Basis'] = self.buttonsDict['Basis'].on_clicked(interactiveButtons.changeBasis)
         self.setGateColor('Basis', self.normalColors[0])
         self.setGateHoverColor('Basis', self.normalColors[2])
-        self.buttonsDict['Bell2'].on_clicked(interactiveButtons.checkBellStates2)
+        self.connects['Bell2'] = self.buttonsDict['Bell2'].on_clicked(interactiveButtons.checkBellStates2)
         self.setGateColor('Bell2', self.normalColors[0])
         self.setGateHoverColor('Bell2', self.normalColors[2])
-        self.buttonsDict['Bell3'].on_clicked(interactiveButtons.checkBellStates3)
+        self.connects['Bell3'] = self.buttonsDict['Bell3'].on_clicked(interactiveButtons.checkBellStates3)
         self.setGateColor('Bell3', self.normalColors[0])
         self.setGateHoverColor('Bell3', self.normalColors[2])
 
@@ -210,6 +331,7 @@ class InteractiveContainer:
         self.text_box.ax.set_facecolor(self.normalColors[0])
         self.text_box.color = self.normalColors[0]
         self.text_box.hovercolor = self.normalColors[2]
+        self.renderer.damage(self.buttonsDict['checkButton'].ax, self.buttonsDict['foldButton'].ax, self.text_box.ax)
 
     def disconnectBets(self):
         self.buttonsDict['checkButton'].ax.set_facecolor(self.disconnectedColor)
@@ -222,6 +344,8 @@ class InteractiveContainer:
         self.text_box.color = self.disconnectedColor
         self.text_box.hovercolor = self.disconnectedColor
         self.betText.set_text("")
+        self.renderer.damage(self.buttonsDict['checkButton'].ax, self.buttonsDict['foldButton'].ax, self.text_box.ax,
+                             self.betText)
         self.buttonsDict['foldButton'].disconnect(self.connects['foldButton'])
         del self.connects['foldButton']
         self.text_box.disconnect(self.connects['Bet'])
@@ -256,183 +380,129 @@ class InteractiveContainer:
             else:
                 self.playerBet[i].set_text(bets[i])
             self.playerMoney[i].set_text(round(money[i],2))
+        self.renderer.damage(*self.playerBet, *self.playerMoney)
 
     def displayEndResults(self, scores, winnings):
         self.playerBet[-1].set_text("Score:")
         self.playerMoney[-1].set_text("Winnings:")
         self.updateCurrentBets(scores, winnings)
+        self.renderer.damage(self.playerBet[-1], self.playerMoney[-1])
+
+    def showScoreHistogram(self, players, counts):
+        """
+        Shows beside the Bell window how often each score came up in the shots of a multi-shot showdown. The Bell
+        window is cleared, as its labels take the same place.
+        :param players: The players whose boards were measured
+        :param counts: Array of shape (len(players), size + 1) with the number of shots giving each score
+        """
+        self.unshowBellProbs()
+        if self.histogram_ax is None:
+            self.histogram_ax = createHistogramWindow(self.fig)
+            self.renderer.addDynamic(self.histogram_ax)
+        drawScoreHistogram(self.histogram_ax, [self.playerNames[i].get_text() for i in players], counts)
+        self.histogram_ax.set_visible(True)
+        self.renderer.damage(self.histogram_ax)
+
+    def unshowScoreHistogram(self):
+        if self.histogram_ax is not None and self.histogram_ax.get_visible():
+            self.histogram_ax.set_visible(False)
+            self.renderer.damage(self.histogram_ax)
 
     def updateNextBet(self, playerCurrentBet, maxBet, show=True):
         if show:
             self.betText.set_text("{}/{}".format(playerCurrentBet, maxBet))
         else:
             self.betText.set_text("")
+        self.renderer.damage(self.betText)
 
     def updateInfoText(self, newText):
         if not(newText == self.infoTextLine0):
             self.infoTextLine1 = self.infoTextLine0
             self.infoTextLine0 = newText
             self.infoText.set_text("  " + self.infoTextLine1 + "\n> " + self.infoTextLine0)
-
-    def updateProbs(self, probs01, probsPlusMinus, basis, bellPairs):
-        if basis == 0:
-            probs = probs01
-            prefix01, suffix01 = r"$\mathbf{", "}$"
-            prefixPM, suffixPM = "$", "$"
-        elif basis == 1:
-            probs = probsPlusMinus
-            prefix01, suffix01 = "$", "$"
-            prefixPM, suffixPM = r"$\mathbf{", "}$"
+            self.renderer.damage(self.infoText)
+
+    @timed("ui.updateProbs")
+    def updateProbs(self, probs01, probsPlusMinus, basis, bellPairs, ghzTriples=()):
+        """
+        Shows the probabilities of the qubits on the board. Only the labels whose text has changed are set, and the
+        board is only redrawn if something has changed.
+        :param ghzTriples: The triples of qubits in a GHZ-type state, tagged like the Bell pairs
+        """
+        probs = probs01 if basis == 0 else probsPlusMinus
         if probs.shape[0] < 5:
-            self.probsnum.set_data([concatenate((probs, array([0.5 for i in range(5-probs.shape[0])])))])
-        else:
+            probs = concatenate((probs, array([0.5 for i in range(5-probs.shape[0])])))
+        changed = False
+        if not array_equal(self.probsnum.get_array(), [probs]):
             self.probsnum.set_data([probs])
-        for i in range(probs.shape[0]):
-            if abs(probs01[i]) < 1E-4:
-                probsStr = r"$|0\rangle$"
-            elif abs(probs01[i] - 1) < 1E-4:
-                probsStr = r"$|1\rangle$"
-            elif abs(probsPlusMinus[i]) < 1E-4:
-                probsStr = r"$|+\rangle$"
-            elif abs(probsPlusMinus[i] - 1) < 1E-4:
-                probsStr = r"$|-\rangle$"
-            else:
-                extraInfoStr0 = getUnentangledTag(i, bellPairs)
-                probsStr = extraInfoStr0 + prefix01 + r"P(1) = " + format(probs01[i], ".3f") + suffix01
-                probsStr += "\n" + prefixPM + r"P(-) = " + format(probsPlusMinus[i], ".3f") + suffixPM
-
-            self.probsStr[i].set_text(probsStr)
+            changed = True
+        for i in range(probs01.shape[0]):
+            changed |= setTextIfChanged(self.probsStr[i], probsLabel(float(probs01[i]), float(probsPlusMinus[i]), basis,
+                                                                     getUnentangledTag(i, bellPairs, ghzTriples)))
+        if changed:
+            self.renderer.damage(self.ax)
 
     def updateBellProbs2(self, bellProbs):
         self.bellProbsInt.set_data(concatenate((array([0.5 for i in range(4)]).reshape((2, 2)),
                                                 flip(bellProbs.reshape((2, 2)), axis=0)), axis=0))
 
         for i in range(4):
-            self.bellProbsStr[i].set_text(str(format(bellProbs[i], ".2f")))
-            self.bellProbsStr[4 + i].set_text("")
-        self.bellProbs_ax.set_yticklabels(["", "", r"$|01\rangle \pm |10\rangle$", r"$|00\rangle \pm |11\rangle$"],
-                                          fontsize=12)
-        self.bellProbs_ax.set_xticklabels(["+", "-"], fontsize=12)
+            setTextIfChanged(self.bellProbsStr[i], format(bellProbs[i], ".2f"))
+            setTextIfChanged(self.bellProbsStr[4 + i], "")
+        self._setBellTickLabels(["", "", r"$|01\rangle \pm |10\rangle$", r"$|00\rangle \pm |11\rangle$"], ["+", "-"])
+        self.renderer.damage(self.bellProbs_ax)
 
     def updateBellProbs3(self, bellProbs):
         self.bellProbsInt.set_data(flip(bellProbs.reshape((4, 2)), axis=0))
         for i in range(8):
-            self.bellProbsStr[i].set_text(str(format(bellProbs[i], ".2f")))
-        self.bellProbs_ax.set_yticklabels([r"$|100\rangle \pm |011\rangle$", r"$|010\rangle \pm |101\rangle$",
-                                           r"$|001\rangle \pm |110\rangle$", r"$|000\rangle \pm |111\rangle$"],
-                                          fontsize=12)
-        self.bellProbs_ax.set_xticklabels(["+", "-"], fontsize=12)
+            setTextIfChanged(self.bellProbsStr[i], format(bellProbs[i], ".2f"))
+        self._setBellTickLabels([r"$|100\rangle \pm |011\rangle$", r"$|010\rangle \pm |101\rangle$",
+                                 r"$|001\rangle \pm |110\rangle$", r"$|000\rangle \pm |111\rangle$"], ["+", "-"])
+        self.renderer.damage(self.bellProbs_ax)
 
     def unshowBellProbs(self):
+        if self.bellTickLabels == (None, None):
+            return
         self.bellProbsInt.set_data(array(array([0.50 for i in range(8)]).reshape((4, 2))))  # Update Bell States
-        self.bellProbs_ax.set_yticklabels(["", "", "", ""], fontsize=12)
-        self.bellProbs_ax.set_xticklabels(["", ""], fontsize=12)
-
+        self._setBellTickLabels(None, None)
         for i in range(8):
-            self.bellProbsStr[i].set_text("")
-
-    def updateBoard(self):
-        self.fig.canvas.draw()
-
-    def _motion(self, event):
-        if self.currentAxes == event.inaxes:
+            setTextIfChanged(self.bellProbsStr[i], "")
+        self.renderer.damage(self.bellProbs_ax)
+
+    def _setBellTickLabels(self, yLabels, xLabels):
+        """
+        Sets the tick labels of the Bell window, unless they are already showing. Setting them replaces the tick label
+        texts, which then have to be laid out again.
+        :param yLabels: Labels of the rows, or None for no labels
+        :param xLabels: Labels of the columns, or None for no labels
+        """
+        if self.bellTickLabels == (yLabels, xLabels):
             return
+        self.bellTickLabels = (yLabels, xLabels)
+        self.bellProbs_ax.set_yticklabels(yLabels if yLabels is not None else ["", "", "", ""], fontsize=12)
+        self.bellProbs_ax.set_xticklabels(xLabels if xLabels is not None else ["", ""], fontsize=12)
 
-        if self.currentAxes is not None:
-            if self.currentAxes == self.buttonsDict['H'].ax:
-                if not self.buttonsDict['H'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['H'].color)
-            elif self.currentAxes == self.buttonsDict['X'].ax:
-                if not self.buttonsDict['X'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['X'].color)
-            elif self.currentAxes == self.buttonsDict['CX'].ax:
-                if not self.buttonsDict['CX'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['CX'].color)
-            elif self.currentAxes == self.buttonsDict['ZH'].ax:
-                if not self.buttonsDict['ZH'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['ZH'].color)
-            elif self.currentAxes == self.buttonsDict['CH'].ax:
-                if not self.buttonsDict['CH'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['CH'].color)
-
-            elif self.currentAxes == self.buttonsDict['End'].ax:
-                if not self.buttonsDict['End'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['End'].color)
-            elif self.currentAxes == self.buttonsDict['Basis'].ax:
-                if not self.buttonsDict['Basis'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['Basis'].color)
-            elif self.currentAxes == self.buttonsDict['Bell2'].ax:
-                if not self.buttonsDict['Bell2'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['Bell2'].color)
-            elif self.currentAxes == self.buttonsDict['Bell3'].ax:
-                if not self.buttonsDict['Bell3'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['Bell3'].color)
-
-            elif self.currentAxes == self.buttonsDict['checkButton'].ax:
-                if not self.buttonsDict['checkButton'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['checkButton'].color)
-            elif self.currentAxes == self.buttonsDict['foldButton'].ax:
-                if not self.buttonsDict['foldButton'].ignore(event):
-                    self.currentAxes.set_facecolor(self.buttonsDict['foldButton'].color)
-
-            elif self.currentAxes == self.showPlayerHandButton.ax:
-                if not self.showPlayerHandButton.ignore(event):
-                    self.currentAxes.set_facecolor(self.showPlayerHandButton.color)
-
-            elif self.currentAxes == self.text_box.ax:
-                if not self.text_box.ignore(event):
-                    self.currentAxes.set_facecolor(self.text_box.color)
-
-        if event.inaxes is not None:
-            if event.inaxes == self.buttonsDict['H'].ax:
-                if not self.buttonsDict['H'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['H'].hovercolor)
-            elif event.inaxes == self.buttonsDict['X'].ax:
-                if not self.buttonsDict['X'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['X'].hovercolor)
-            elif event.inaxes == self.buttonsDict['CX'].ax:
-                if not self.buttonsDict['CX'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['CX'].hovercolor)
-            elif event.inaxes == self.buttonsDict['ZH'].ax:
-                if not self.buttonsDict['ZH'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['ZH'].hovercolor)
-            elif event.inaxes == self.buttonsDict['CH'].ax:
-                if not self.buttonsDict['CH'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['CH'].hovercolor)
-
-            elif event.inaxes == self.buttonsDict['End'].ax:
-                if not self.buttonsDict['End'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['End'].hovercolor)
-            elif event.inaxes == self.buttonsDict['Basis'].ax:
-                if not self.buttonsDict['Basis'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['Basis'].hovercolor)
-            elif event.inaxes == self.buttonsDict['Bell2'].ax:
-                if not self.buttonsDict['Bell2'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['Bell2'].hovercolor)
-            elif event.inaxes == self.buttonsDict['Bell3'].ax:
-                if not self.buttonsDict['Bell3'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['Bell3'].hovercolor)
-
-            elif event.inaxes == self.buttonsDict['checkButton'].ax:
-                if not self.buttonsDict['checkButton'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['checkButton'].hovercolor)
-            elif event.inaxes == self.buttonsDict['foldButton'].ax:
-                if not self.buttonsDict['foldButton'].ignore(event):
-                    event.inaxes.set_facecolor(self.buttonsDict['foldButton'].hovercolor)
-
-            elif event.inaxes == self.showPlayerHandButton.ax:
-                if not self.showPlayerHandButton.ignore(event):
-                    event.inaxes.set_facecolor(self.showPlayerHandButton.hovercolor)
-
-            elif event.inaxes == self.text_box.ax:
-                if not self.text_box.ignore(event):
-                    event.inaxes.set_facecolor(self.text_box.hovercolor)
-        self.currentAxes = event.inaxes
-        self.fig.canvas.draw()
-
-
-def makeFigure(size):
-    fig, ax = plt.subplots(figsize=(10, 5))
+    def updateBoard(self):
+        self.renderer.draw()
+
+    def newPollTimer(self, interval):
+        """
+        :param interval: Interval in milliseconds
+        :return: A repeating timer of the event loop of the figure, or None if the figure has no event loop
+        """
+        if not self.renderer.hasEventLoop:
+            return None
+        return self.fig.canvas.new_timer(interval=interval)
+
+
+def makeFigure(size, offscreen=False):
+    if offscreen:
+        # A figure with an Agg canvas of its own, pyplot does not know about it and never opens a window for it
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+    else:
+        fig, ax = plt.subplots(figsize=(10, 5))
     ax.tick_params(axis='both', which='both', bottom=False, left=False, labelleft = False, labelsize=12)
     ax.set_xticks(array([i for i in range(size)]))
     ax.set_xticklabels(array([str(i+1) for i in range(size)]))
@@ -442,7 +512,7 @@ def makeFigure(size):
     ax.spines['bottom'].set_visible(False)
 
     ax.set_aspect('equal')
-    plt.subplots_adjust(right=0.77)
+    fig.subplots_adjust(right=0.77)
 
     for i in range(size + 1):
         ax.axvline(i - 0.5, c='k')
@@ -481,17 +551,48 @@ def createBellWindow(fig):
     return bellProbsNum, bellProbsStr, bellProbs_ax
 
 
+def createHistogramWindow(fig):
+    histogram_ax = fig.add_subplot(position=(0.895, 0.050, 0.09, 0.3), anchor="NW")
+    histogram_ax.tick_params(axis='both', which='both', labelsize=8, length=2)
+    histogram_ax.set_visible(False)
+    return histogram_ax
+
+
+def drawScoreHistogram(histogram_ax, names, counts):
+    """
+    Draws the fraction of shots giving each score as horizontal bars, one group of bars per score with one bar per
+    player, the scores from the bottom up like the rows of the Bell window.
+    """
+    histogram_ax.clear()
+    nPlayers, nScores = counts.shape
+    fractions = counts / counts.sum(axis=1, keepdims=True)
+    height = 0.8 / nPlayers
+    colors = plt.get_cmap('tab10')
+    for i in range(nPlayers):
+        histogram_ax.barh(array([score for score in range(nScores)]) - 0.4 + height * (i + 0.5), fractions[i],
+                          height=height, color=colors(i % 10), label=names[i])
+    histogram_ax.set_xlim(0, 1)
+    histogram_ax.set_ylim(-0.5, nScores - 0.5)
+    # At most about ten score labels, the boards can be wide
+    step = max(1, nScores // 10)
+    histogram_ax.set_yticks(array([score for score in range(0, nScores, step)]))
+    histogram_ax.set_xticks(array([0, 0.5, 1]))
+    histogram_ax.set_xticklabels(["0", ".5", "1"])
+    histogram_ax.set_title("{} shots".format(int(counts[0].sum())), fontsize=8)
+    histogram_ax.legend(fontsize=7, loc="upper right", frameon=False, handlelength=1)
+
+
 def createButtonsInfig(fig):
-    basis_ax = plt.axes([0.88, 0.44, 0.1, 0.075])
-    end_ax = plt.axes([0.78, 0.44, 0.1, 0.075])
-    bell2_ax = plt.axes([0.78, 0.365, 0.1, 0.075])
-    bell3_ax = plt.axes([0.88, 0.365, 0.1, 0.075])
-
-    h_ax_p = plt.axes([0.78, 0.83, 0.1, 0.075])
-    x_ax_p = plt.axes([0.78, 0.755, 0.1, 0.075])
-    cx_ax_p = plt.axes([0.78, 0.68, 0.1, 0.075])
-    zh_ax_p = plt.axes([0.78, 0.605, 0.1, 0.075])
-    ch_ax_p = plt.axes([0.78, 0.53, 0.1, 0.075])
+    basis_ax = fig.add_axes([0.88, 0.44, 0.1, 0.075])
+    end_ax = fig.add_axes([0.78, 0.44, 0.1, 0.075])
+    bell2_ax = fig.add_axes([0.78, 0.365, 0.1, 0.075])
+    bell3_ax = fig.add_axes([0.88, 0.365, 0.1, 0.075])
+
+    h_ax_p = fig.add_axes([0.78, 0.83, 0.1, 0.075])
+    x_ax_p = fig.add_axes([0.78, 0.755, 0.1, 0.075])
+    cx_ax_p = fig.add_axes([0.78, 0.68, 0.1, 0.075])
+    zh_ax_p = fig.add_axes([0.78, 0.605, 0.1, 0.075])
+    ch_ax_p = fig.add_axes([0.78, 0.53, 0.1, 0.075])
     h_button_p = Button(h_ax_p, 'H:  ')
     x_button_p = Button(x_ax_p, 'X:   ')
     cx_button_p = Button(cx_ax_p, 'CX:   ')
@@ -562,13 +663,14 @@ def createPlayerPatches(fig, ax, nPlayers, names):
     playerbuttons = []
     playerbet = []
     playerMoney = []
+    playerNames = []
     for i in range(nPlayers):
         playerbuttons.append(plt.Rectangle((mid-(nPlayers*0.1+(nPlayers-1)*0.03)/2+0.13*i, 0.85),
                              width=0.1, height=0.075, edgecolor='black', linewidth=0.75, facecolor='White',
                              transform=fig.transFigure))
         fig.patches.extend([playerbuttons[i]])
-        fig.text(mid-(nPlayers*0.1+(nPlayers-1)*0.03)/2+0.13*i+0.05, 0.85+0.07/2, names[i],
-                 horizontalalignment='center', verticalalignment='center', fontsize=15)
+        playerNames.append(fig.text(mid-(nPlayers*0.1+(nPlayers-1)*0.03)/2+0.13*i+0.05, 0.85+0.07/2, names[i],
+                                    horizontalalignment='center', verticalalignment='center', fontsize=15))
         playerbet.append(fig.text(mid-(nPlayers*0.1+(nPlayers-1)*0.03)/2+0.13*i+0.05, 0.80, "0",
                               horizontalalignment='center', verticalalignment='center', fontsize = 15))
         playerMoney.append(fig.text(mid - (nPlayers * 0.1 + (nPlayers - 1) * 0.03) / 2 + 0.13 * i + 0.05, 0.70, "0",
@@ -578,23 +680,69 @@ def createPlayerPatches(fig, ax, nPlayers, names):
     playerMoney.append(fig.text(mid - (nPlayers * 0.1 + (nPlayers - 1) * 0.03) / 2 + 0.05 - 0.12, 0.70, "Money left:",
                               horizontalalignment='center', verticalalignment='center', fontsize=15))
 
-    return playerbuttons, playerbet, playerMoney
+    return playerbuttons, playerbet, playerMoney, playerNames
 
 
 def createBets(fig, ax):
     mid = ax.transData.transform((2, 2))[0]/(fig.get_size_inches()*fig.dpi)[0]
-    text_box = TextBox(plt.axes([mid-0.3, 0.15, 0.3, 0.1]), 'Place bet:', initial="")
+    text_box = TextBox(fig.add_axes([mid-0.3, 0.15, 0.3, 0.1]), 'Place bet:', initial="")
     betText = fig.text(mid+0.075, 0.2, "0/0",
                               horizontalalignment='center', verticalalignment='center', fontsize=15)
-    checkButton = Button(plt.axes([mid+0.15, 0.23, 0.1, 0.075]), "Check")
-    foldButton = Button(plt.axes([mid+0.15, 0.15, 0.1, 0.075]), "Fold")
-    showPlayerHandButton = Button(plt.axes([mid+0.15, 0.07, 0.1, 0.075]), "Show Hand")
+    checkButton = Button(fig.add_axes([mid+0.15, 0.23, 0.1, 0.075]), "Check")
+    foldButton = Button(fig.add_axes([mid+0.15, 0.15, 0.1, 0.075]), "Fold")
+    showPlayerHandButton = Button(fig.add_axes([mid+0.15, 0.07, 0.1, 0.075]), "Show Hand")
     infoText = fig.text(mid-0.3+0.005, 0.12, "" + "          " + "\n> " + "Place a bet or fold.",
                         horizontalalignment='left', verticalalignment='top', fontsize=12, backgroundcolor="lightgray",
                         wrap=True)
     return text_box, betText, checkButton, foldButton, showPlayerHandButton, infoText
 
 
+def setTextIfChanged(text, string):
+    """
+    Sets the text of an artist only if it differs from the current one, so that unchanged texts are not laid out again.
+    :return: Whether the text has changed
+    """
+    if text.get_text() == string:
+        return False
+    text.set_text(string)
+    return True
+
+
+@lru_cache(maxsize=1024)
+def probsLabel(probs01, probsPlusMinus, basis, tag):
+    """
+    The label of a qubit on the board. Labels are memoized, the same probabilities are shown again on every refresh.
+    :param probs01: Probability of measuring 1
+    :param probsPlusMinus: Probability of measuring -
+    :param basis: The basis in bold, 0 for 0,1 and 1 for +,-
+    :param tag: Names of the Bell pairs and GHZ triples of the qubit, see getUnentangledTag
+    :return: The label as mathtext
+    """
+    if abs(probs01) < 1E-4:
+        return r"$|0\rangle$"
+    elif abs(probs01 - 1) < 1E-4:
+        return r"$|1\rangle$"
+    elif abs(probsPlusMinus) < 1E-4:
+        return r"$|+\rangle$"
+    elif abs(probsPlusMinus - 1) < 1E-4:
+        return r"$|-\rangle$"
+    if basis == 0:
+        prefix01, suffix01 = r"$\mathbf{", "}$"
+        prefixPM, suffixPM = "$", "$"
+    else:
+        prefix01, suffix01 = "$", "$"
+        prefixPM, suffixPM = r"$\mathbf{", "}$"
+    return tag + prefix01 + r"P(1) = " + format(probs01, ".3f") + suffix01 + "\n" + prefixPM + r"P(-) = " + \
+        format(probsPlusMinus, ".3f") + suffixPM
+
+
+def onhover(event, mouseHover, ax):
+    if event.inaxes == ax and event.xdata is not None:
+        mouseHover(int(event.xdata+0.5))
+    else:
+        mouseHover(None)
+
+
 def onclick(event, mouseClick, ax):
     if not(event.xdata is None and event.ydata is None and event.inaxes is None):
         if event.inaxes == ax:
@@ -0,0 +1,218 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from time import perf_counter, time
+
+# Timing spans and counters for the hot paths of the engine and the UI. Nothing is recorded until a sink is set with
+# setSink, and while no sink is set a span or a counter costs a single check of the module variable _sink.
+
+_sink = None
+
+
+def setSink(sink):
+    """
+    Sets the sink that receives all spans and counters. Pass None to disable the instrumentation.
+    :param sink: e.g. HistogramSink(), LogFileSink(path) or PrometheusSink()
+    :return: The previous sink
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def getSink():
+    return _sink
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        sink = _sink
+        if sink is not None:
+            sink.recordSpan(self.name, perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+
+_noSpan = _NoSpan()
+
+
+def span(name):
+    """
+    Times a block of code: with span("ui.draw"): ...
+    :param name: Name of the span
+    :return: A context manager
+    """
+    if _sink is None:
+        return _noSpan
+    return _Span(name)
+
+
+def timed(name):
+    """
+    Decorator that times every call of the decorated function as the span name.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                sink = _sink
+                if sink is not None:
+                    sink.recordSpan(name, perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """
+    Increments the counter name, e.g. count("board.simulations").
+    """
+    sink = _sink
+    if sink is not None:
+        sink.count(name, n)
+
+
+class HistogramSink:
+    # Upper bounds of the buckets in seconds, the last bucket is unbounded
+    defaultBuckets = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5,
+                      1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=defaultBuckets):
+        """
+        Keeps a histogram of the durations of each span, and the value of each counter, in memory.
+        :param buckets: Upper bounds of the histogram buckets in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.spans = {}
+        self.counters = {}
+        self.lock = Lock()
+
+    def recordSpan(self, name, seconds):
+        with self.lock:
+            if name not in self.spans:
+                self.spans[name] = {"count": 0, "sum": 0.0, "min": seconds, "max": seconds,
+                                    "buckets": [0 for i in range(len(self.buckets) + 1)]}
+            stats = self.spans[name]
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["min"] = min(stats["min"], seconds)
+            stats["max"] = max(stats["max"], seconds)
+            stats["buckets"][bisect_left(self.buckets, seconds)] += 1
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def quantile(self, name, q):
+        """
+        Estimates a quantile of the durations of a span from its histogram.
+        :return: The upper bound of the bucket containing the quantile, in seconds
+        """
+        stats = self.spans[name]
+        target = q * stats["count"]
+        seen = 0
+        for i, n in enumerate(stats["buckets"]):
+            seen += n
+            if seen >= target and n > 0:
+                return self.buckets[i] if i < len(self.buckets) else stats["max"]
+        return stats["max"]
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.counters = {}
+
+    def report(self):
+        """
+        :return: A table of all spans and counters as a string
+        """
+        lines = ["{:<32} {:>8} {:>11} {:>11} {:>11}".format("span", "count", "mean ms", "p95 ms", "max ms")]
+        for name in sorted(self.spans):
+            stats = self.spans[name]
+            lines.append("{:<32} {:>8} {:>11.3f} {:>11.3f} {:>11.3f}".format(
+                name, stats["count"], 1e3 * stats["sum"] / stats["count"], 1e3 * self.quantile(name, 0.95),
+                1e3 * stats["max"]))
+        lines.append("{:<32} {:>8}".format("counter", "value"))
+        for name in sorted(self.counters):
+            lines.append("{:<32} {:>8}".format(name, self.counters[name]))
+        return "\n".join(lines)
+
+
+class PrometheusSink(HistogramSink):
+    def __init__(self, prefix="quantumpoker", buckets=HistogramSink.defaultBuckets):
+        """
+        A HistogramSink that can export its contents in the Prometheus text exposition format.
+        :param prefix: Prefix of all metric names
+        """
+        HistogramSink.__init__(self, buckets)
+        self.prefix = prefix
+
+    def export(self):
+        """
+        :return: The spans as the histogram <prefix>_span_seconds and each counter as <prefix>_<name>_total
+        """
+        name = self.prefix + "_span_seconds"
+        lines = ["# TYPE {} histogram".format(name)]
+        with self.lock:
+            for span in sorted(self.spans):
+                stats = self.spans[span]
+                cumulative = 0
+                for bound, n in zip(self.buckets + ("+Inf",), stats["buckets"]):
+                    cumulative += n
+                    lines.append('{}_bucket{{span="{}",le="{}"}} {}'.format(name, span, bound, cumulative))
+                lines.append('{}_sum{{span="{}"}} {}'.format(name, span, stats["sum"]))
+                lines.append('{}_count{{span="{}"}} {}'.format(name, span, stats["count"]))
+            for counter in sorted(self.counters):
+                counterName = "{}_{}_total".format(self.prefix, counter.replace(".", "_"))
+                lines.append("# TYPE {} counter".format(counterName))
+                lines.append("{} {}".format(counterName, self.counters[counter]))
+        return "\n".join(lines) + "\n"
+
+
+class LogFileSink:
+    def __init__(self, path):
+        """
+        Appends every span and counter increment to a log file, one line each.
+        :param path: The log file
+        """
+        self.file = open(path, "a")
+        self.lock = Lock()
+
+    def recordSpan(self, name, seconds):
+        with self.lock:
+            self.file.write("{:.6f} span {} {:.6f}\n".format(time(), name, seconds))
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.file.write("{:.6f} count {} {}\n".format(time(), name, n))
+
+    def close(self):
+        with self.lock:
+            self.file.close()
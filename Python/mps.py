@@ -0,0 +1,305 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from numpy import array, eye, zeros, ones, einsum, tensordot, swapaxes, concatenate, sqrt, abs, real, argsort, stack
+from numpy.linalg import svd
+from itertools import combinations
+from Python.statevector import applyGate
+
+# Matrix product states: the wavevector of n qubits as a chain of n tensors of shape (left bond, 2, right bond), one per
+# qubit, so that the memory grows with the entanglement of the state instead of exponentially with n. Qubit i is site
+# i of the chain, and amplitudes are ordered as in qiskit when converted to a wavevector.
+
+# The Bell states of 2 and 3 qubits as pairs of basis states (x, y) in the state (|x> ± |y>)/sqrt(2), in the order of
+# Board.getBellStateProbs and Board.getBellStateProbs3. Bit k of a basis state is the k-th qubit of the coordinates.
+bellBasis = {2: [(0, 3), (1, 2)], 3: [(0, 7), (4, 3), (2, 5), (1, 6)]}
+
+
+def gateMatrix(gate, nQubits, inverse=False):
+    """
+    :return: The matrix of gate on nQubits qubits, with bit k of its indices the k-th coordinate of the gate
+    """
+    return stack([applyGate(column, gate, range(nQubits), nQubits, inverse) for column in eye(2 ** nQubits)], axis=1)
+
+
+class MatrixProductState:
+    def __init__(self, tensors, cutoff=1e-10, maxBond=None, truncationError=0.0):
+        """
+        Use MatrixProductState.zeros to create the state |0...0>. Gates return a new state and never change the
+        tensors of this one, so states can be kept, e.g. in BoardAnalytics, while moves are applied to them.
+        :param tensors: The tensors of the sites, of shape (left bond, 2, right bond)
+        :param cutoff: Singular values below cutoff times the largest are dropped when a gate splits the sites again
+        :param maxBond: Largest bond dimension kept, None for no limit
+        :param truncationError: The total weight of the singular values dropped so far
+        """
+        self.tensors = tensors
+        self.size = len(tensors)
+        self.cutoff = cutoff
+        self.maxBond = maxBond
+        self.truncationError = truncationError
+        self._left = None
+        self._right = None
+        # The density matrices of the pairs of qubits computed so far, see pairDensities
+        self._pairs = {}
+
+    @staticmethod
+    def zeros(size, cutoff=1e-10, maxBond=None):
+        tensor = zeros((1, 2, 1), dtype=complex)
+        tensor[0, 0, 0] = 1
+        return MatrixProductState([tensor] * size, cutoff, maxBond)
+
+    def copy(self):
+        return MatrixProductState(list(self.tensors), self.cutoff, self.maxBond, self.truncationError)
+
+    def bondDimensions(self):
+        """
+        :return: The dimension of the bond between each pair of neighbouring sites
+        """
+        return [tensor.shape[2] for tensor in self.tensors[:-1]]
+
+    def bondStatistics(self):
+        """
+        :return: dict with the largest and mean bond dimension, the number of amplitudes stored and the truncation error
+        """
+        bonds = self.bondDimensions()
+        return {"maxBond": max(bonds, default=1), "meanBond": sum(bonds) / max(len(bonds), 1),
+                "parameters": sum(tensor.size for tensor in self.tensors), "truncationError": self.truncationError}
+
+    def applyGate(self, gate, coords, inverse=False):
+        """
+        :param gate: The name of the gate, as in Board.playerMoveInteractive
+        :param coords: The qubits of the gate, the controls first
+        :param inverse: Apply the inverse of the gate
+        :return: The state after the gate
+        """
+        state = self.copy()
+        state._apply(gateMatrix(gate, len(coords), inverse), [int(coord) for coord in coords])
+        return state
+
+    def applyGates(self, gates):
+        """
+        :param gates: List of (gate, coords)
+        :return: The state after the gates
+        """
+        state = self.copy()
+        for gate, coords in gates:
+            state._apply(gateMatrix(gate, len(coords)), [int(coord) for coord in coords])
+        return state
+
+    def _apply(self, matrix, coords):
+        # Changes the tensors of this state, only called on a fresh copy. The qubits are swapped next to the smallest
+        # of them, the gate is applied to the neighbouring sites and the qubits are swapped back.
+        self._left = None
+        self._right = None
+        self._pairs = {}
+        if len(coords) == 1:
+            self.tensors[coords[0]] = einsum("ab,lbr->lar", matrix, self.tensors[coords[0]])
+            return
+        order = sorted(coords)
+        swaps = []
+        for k in range(1, len(order)):
+            for site in range(order[k] - 1, order[0] + k - 1, -1):
+                swaps.append(site)
+        swap = gateMatrix("SWAP", 2)
+        for site in swaps:
+            self._applySites(swap, site, [0, 1])
+        # The block position of the k-th coordinate of the gate
+        positions = [order.index(coord) for coord in coords]
+        self._applySites(matrix, order[0], positions)
+        for site in reversed(swaps):
+            self._applySites(swap, site, [0, 1])
+
+    def _applySites(self, matrix, first, positions):
+        # Applies matrix to the sites first, first + 1, ..., where bit k of the indices of matrix is site
+        # first + positions[k]
+        n = len(positions)
+        theta = self.tensors[first]
+        for site in range(first + 1, first + n):
+            theta = einsum("...r,rps->...ps", theta, self.tensors[site])
+        left, right = theta.shape[0], theta.shape[-1]
+        # Axis 1 + a of theta in matrix order is bit n - 1 - a of the indices of matrix
+        perm = [0] + [1 + positions[n - 1 - a] for a in range(n)] + [n + 1]
+        theta = theta.transpose(perm).reshape(left, 2 ** n, right)
+        theta = einsum("ij,ljr->lir", matrix, theta).reshape((left,) + (2,) * n + (right,))
+        theta = theta.transpose(argsort(perm))
+        for site in range(first, first + n - 1):
+            chi = theta.shape[0]
+            u, s, v = svd(theta.reshape(chi * 2, -1), full_matrices=False)
+            keep = max(1, int((s > self.cutoff * s[0]).sum()))
+            if self.maxBond is not None:
+                keep = min(keep, self.maxBond)
+            self.truncationError += float((s[keep:] ** 2).sum())
+            self.tensors[site] = u[:, 0:keep].reshape(chi, 2, keep)
+            theta = (s[0:keep, None] * v[0:keep]).reshape((keep,) + theta.shape[2:])
+        self.tensors[first + n - 1] = theta
+
+    def _environments(self):
+        # left[i] contracts the sites before i with their conjugates, right[i] the sites from i on. The first index of
+        # an environment belongs to the conjugated tensors.
+        if self._left is None:
+            left = [ones((1, 1), dtype=complex)]
+            for tensor in self.tensors:
+                left.append(_transfer(left[-1], tensor))
+            right = [ones((1, 1), dtype=complex)]
+            for tensor in reversed(self.tensors):
+                right.append(tensordot(tensor.conj(), tensordot(tensor, right[-1], axes=([2], [1])),
+                                       axes=([1, 2], [1, 2])))
+            self._left, self._right = left, right[::-1]
+        return self._left, self._right
+
+    def norm(self):
+        return float(real(self._environments()[0][-1][0, 0]))
+
+    def reducedDensity(self, qubits):
+        """
+        :param qubits: Different qubits
+        :return: The density matrix of the qubits, with bit k of its indices the k-th of the qubits
+        """
+        left, right = self._environments()
+        order = sorted(int(qubit) for qubit in qubits)
+        env = left[order[0]][None, None, :, :]
+        for site in range(order[0], order[-1] + 1):
+            env = _open(env, self.tensors[site]) if site in order else _transfer(env, self.tensors[site])
+        rho = _close(env, right[order[-1] + 1])
+        # Bit k of the indices is the k-th of the sorted qubits, reorder the bits as the qubits were given
+        n = len(order)
+        rho = rho.reshape((2,) * 2 * n)
+        axes = [n - 1 - order.index(int(qubits[n - 1 - a])) for a in range(n)]
+        return rho.transpose(axes + [n + axis for axis in axes]).reshape(2 ** n, 2 ** n)
+
+    def probs01(self):
+        """
+        :return: Array with the probability of measuring 1 for each qubit
+        """
+        return array([real(rho[1, 1]) for rho in self._singleDensities()])
+
+    def probsPlusMinus(self):
+        """
+        :return: Array with the probability of measuring - for each qubit
+        """
+        return array([real(rho[0, 0] + rho[1, 1] - 2 * rho[0, 1]) / 2 for rho in self._singleDensities()])
+
+    def _singleDensities(self):
+        left, right = self._environments()
+        return [_close(_open(left[site][None, None, :, :], tensor), right[site + 1])
+                for site, tensor in enumerate(self.tensors)]
+
+    def bellStateProbs(self, coords):
+        """
+        :param coords: 2 or 3 qubits
+        :return: The probabilities of the Bell states of the qubits, in the order of Board.getBellStateProbs and
+                 Board.getBellStateProbs3
+        """
+        return densityBellStateProbs(self.reducedDensity(coords))
+
+    def bellPairs(self, tolerance=1e-4):
+        """
+        Only qubits whose own state is maximally mixed can be in a Bell state, so only pairs of those are checked.
+        :return: The pairs of qubits in a Bell state, as found by Board.findBellPairs
+        """
+        mixed = [site for site, rho in enumerate(self._singleDensities()) if abs(rho - eye(2) / 2).max() < 1e-2]
+        return [pair for pair, rho in zip(combinations(mixed, 2), self.pairDensities(mixed))
+                if abs(densityBellStateProbs(rho).max() - 1) < tolerance]
+
+    def pairDensities(self, qubits=None):
+        """
+        The states of all pairs with the same first qubit come from one sweep along the chain, and are kept with the
+        state, so e.g. the pairs of bellPairs are not computed again for entanglement.analyseState.
+        :param qubits: Sorted qubits, all qubits by default
+        :return: Array of shape (number of pairs, 4, 4) with the density matrix of each pair of the qubits (i, j),
+                 i < j, in the order of itertools.combinations, with bit 0 of its indices qubit i
+        """
+        qubits = list(range(self.size)) if qubits is None else [int(qubit) for qubit in qubits]
+        left, right = self._environments()
+        for k, i in enumerate(qubits[:-1]):
+            if all((i, j) in self._pairs for j in qubits[k + 1:]):
+                continue
+            env = _open(left[i][None, None, :, :], self.tensors[i])
+            for site in range(i + 1, qubits[-1] + 1):
+                if site in qubits[k + 1:] and (i, site) not in self._pairs:
+                    self._pairs[(i, site)] = _close(_open(env, self.tensors[site]), right[site + 1])
+                env = _transfer(env, self.tensors[site])
+        return array([self._pairs[pair] for pair in combinations(qubits, 2)]).reshape(-1, 4, 4)
+
+    def scoreDistribution(self):
+        """
+        :return: Array with the probability of measuring k ones, for k from 0 to the number of qubits
+        """
+        # counts[k] contracts the sites so far with k of them measured as 1
+        counts = ones((1, 1, 1), dtype=complex)
+        for tensor in self.tensors:
+            zero, one = tensor[:, 0, :], tensor[:, 1, :]
+            chi = tensor.shape[2]
+            counts = concatenate([zero.conj().T @ counts @ zero, zeros((1, chi, chi))]) + \
+                concatenate([zeros((1, chi, chi)), one.conj().T @ counts @ one])
+        probs = real(counts[:, 0, 0])
+        return probs / probs.sum()
+
+    def sample(self, shots, rng):
+        """
+        Measures every qubit, one site after the other given the outcomes before it.
+        :param rng: A numpy Generator
+        :return: Array of shape (shots, size) with the measured bits
+        """
+        right = self._environments()[1]
+        vectors = ones((shots, 1), dtype=complex)
+        bits = zeros((shots, self.size), dtype=int)
+        for site, tensor in enumerate(self.tensors):
+            branches = [vectors @ tensor[:, p, :] for p in (0, 1)]
+            weights = [real(((branch.conj() @ right[site + 1]) * branch).sum(axis=1)) for branch in branches]
+            pOne = weights[1] / (weights[0] + weights[1])
+            outcome = rng.random(shots) < pOne
+            bits[:, site] = outcome
+            chosen = branches[1] * outcome[:, None] + branches[0] * ~outcome[:, None]
+            weight = weights[1] * outcome + weights[0] * ~outcome
+            vectors = chosen / sqrt(weight)[:, None]
+        return bits
+
+    def toStatevector(self):
+        """
+        :return: The wavevector, ordered as in qiskit. Only for narrow boards.
+        """
+        psi = self.tensors[0].reshape(2, -1)
+        for tensor in self.tensors[1:]:
+            psi = einsum("xr,rps->pxs", psi, tensor).reshape(-1, tensor.shape[2])
+        return psi.reshape(-1)
+
+    def __array__(self, dtype=None):
+        psi = self.toStatevector()
+        return psi if dtype is None else psi.astype(dtype)
+
+
+def _transfer(env, tensor):
+    # Passes an environment of shape (..., a, b) over a site, a belonging to the conjugated tensor
+    out = tensordot(tensordot(env, tensor, axes=([-1], [0])), tensor.conj(), axes=([-3, -2], [0, 1]))
+    return swapaxes(out, -1, -2)
+
+
+def _open(env, tensor):
+    # Passes an environment of shape (R, C, a, b) over a site and keeps its qubit as the highest bit of R and C, the
+    # indices of the qubits in the state and in its conjugate
+    out = tensordot(tensordot(env, tensor, axes=([3], [0])), tensor.conj(), axes=([2], [0]))
+    # (R, C, r, y, c, x) to (r, R, c, C, x, y)
+    out = out.transpose(2, 0, 4, 1, 5, 3)
+    return out.reshape(2 * env.shape[0], 2 * env.shape[1], out.shape[4], out.shape[5])
+
+
+def _close(env, right):
+    # The normalized density matrix of the qubits of an environment of shape (R, C, a, b)
+    rho = tensordot(env, right, axes=([2, 3], [0, 1]))
+    return rho / real(rho.trace())
+
+
+def densityBellStateProbs(rho):
+    """
+    :param rho: The density matrix of 2 or 3 qubits, with bit k of its indices the k-th of the qubits
+    :return: The probabilities of the Bell states of the qubits, in the order of Board.getBellStateProbs and
+             Board.getBellStateProbs3
+    """
+    probs = []
+    for x, y in bellBasis[{4: 2, 8: 3}[rho.shape[0]]]:
+        diagonal, offDiagonal = real(rho[x, x] + rho[y, y]), real(rho[x, y] + rho[y, x])
+        probs += [(diagonal + offDiagonal) / 2, (diagonal - offDiagonal) / 2]
+    return array(probs)
@@ -0,0 +1,188 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+import json
+from Python.viewModel import gates
+
+# The colors of InteractiveContainer for the states sent by the ViewModel
+buttonColors = {"disabled": "whitesmoke", "enabled": "darkgrey", "selected": "dimgray"}
+playerColors = {"inactive": "whitesmoke", "active": "lime", "folded": "darkred", "allIn": "#ffff00"}
+bellLabels = {2: ["|00⟩ ± |11⟩", "|01⟩ ± |10⟩"], 3: ["|000⟩ ± |111⟩", "|001⟩ ± |110⟩", "|010⟩ ± |101⟩",
+                                                   "|100⟩ ± |011⟩"]}
+
+
+def probabilityColor(p):
+    """
+    :return: The color of p in the colormap "cool" used for the board, as a hex string
+    """
+    return "#{:02x}{:02x}ff".format(int(round(255 * p)), int(round(255 * (1 - p))))
+
+
+class NotebookTable:
+    def __init__(self, viewModel):
+        """
+        Shows a table in a Jupyter or Colab notebook with ipywidgets. The table follows the JSON deltas of a
+        ViewModel, and each entry of a delta updates only the widget showing it, so only the changed properties of
+        those widgets are sent to the browser instead of an image of the whole figure.
+            session = PokerSession(deckOfGates, names, money, frontEnd=ViewModel)
+            NotebookTable(session.pokerGame.interactive)
+        :param viewModel: The ViewModel of a PokerGame
+        """
+        import ipywidgets as widgets
+        self.widgets = widgets
+        self.viewModel = viewModel
+        self.state = {}
+
+        self.players = []
+        self.playerBox = widgets.HBox()
+        self.qubits = []
+        self.qubitBox = widgets.HBox()
+        self.bell = widgets.HTML()
+        self.buttons = {}
+        for button in gates + ["Basis", "Bell2", "Bell3", "End", "undo", "redo", "check", "fold", "showHand"]:
+            self.buttons[button] = widgets.Button(description=button, layout=widgets.Layout(width="90px"))
+            self.buttons[button].on_click(lambda b, button=button: self.dispatch({"action": button}))
+        self.buttons["showHand"].description = "Show Hand"
+        self.buttons["undo"].description, self.buttons["redo"].description = "Undo", "Redo"
+        self.betText = widgets.Text(placeholder="amount", continuous_update=False, layout=widgets.Layout(width="90px"))
+        self.betText.observe(self._onBet, names="value")
+        self.betLabel = widgets.Label("Place bet:")
+        self.nextBet = widgets.Label()
+        self.deck = widgets.HTML()
+        self.info = widgets.HTML()
+
+        self.widget = widgets.VBox([
+            self.playerBox,
+            widgets.HBox([self.qubitBox, widgets.VBox([self.bell])]),
+            widgets.HBox([widgets.VBox([self.buttons[gate] for gate in gates]),
+                          widgets.VBox([self.buttons["Basis"], self.buttons["Bell2"], self.buttons["Bell3"],
+                                        self.buttons["End"], widgets.HBox([self.buttons["undo"],
+                                                                           self.buttons["redo"]])]),
+                          self.deck]),
+            widgets.HBox([self.betLabel, self.betText, self.nextBet, self.buttons["check"], self.buttons["fold"],
+                          self.buttons["showHand"]]),
+            self.info])
+
+        # The widgets to update for each entry of the state, by the name before the "."
+        self.handlers = {"name": self._setName, "player": self._setPlayer, "bet": self._setBet,
+                         "money": self._setMoney, "probs": self._setProbs, "basis": self._setBasis,
+                         "nQubits": self._setNQubits, "bell": self._setBell, "button": self._setButton,
+                         "label": self._setLabel, "betLabel": self._setBetLabel, "nextBet": self._setNextBet,
+                         "hand": self._setHand, "deck": self._setDeck, "info": self._setInfo}
+
+        viewModel.updateBoard()
+        self.apply(viewModel.snapshot())
+        viewModel.subscribe(self.apply)
+
+    def _ipython_display_(self):
+        from IPython.display import display
+        display(self.widget)
+
+    def dispatch(self, action):
+        self.viewModel.dispatch(action)
+
+    def _onBet(self, change):
+        if change["new"] == "":
+            return
+        self.betText.value = ""
+        self.dispatch({"action": "bet", "value": change["new"]})
+
+    def apply(self, message):
+        """
+        Applies a JSON delta of the ViewModel to the widgets.
+        """
+        changed = json.loads(message)["set"]
+        self.state.update(changed)
+        for key, value in changed.items():
+            name, _, index = key.partition(".")
+            if name in self.handlers:
+                self.handlers[name](index, value)
+
+    def _player(self, index):
+        # The name, bet and money of a player, created when the player first appears
+        i = int(index)
+        widgets = self.widgets
+        while len(self.players) <= i:
+            name = widgets.Button(layout=widgets.Layout(width="100px"))
+            self.players.append((name, widgets.Label(), widgets.Label()))
+            self.playerBox.children = [widgets.VBox(player) for player in self.players]
+        return self.players[i]
+
+    def _setName(self, index, value):
+        name = self._player(index)[0]
+        name.description = "" if value is None else value
+        name.layout.visibility = "hidden" if value is None else "visible"
+
+    def _setPlayer(self, index, value):
+        self._player(index)[0].style.button_color = playerColors.get(value, "whitesmoke")
+
+    def _setBet(self, index, value):
+        text = "" if value is None else ("Folded" if value == "folded" else str(value))
+        self._player(index)[1].value = ("Score: " if self.state.get("results") else "Bet: ") + text
+
+    def _setMoney(self, index, value):
+        self._player(index)[2].value = ("Won: " if self.state.get("results") else "Money: ") + \
+            ("" if value is None else str(value))
+
+    def _setNQubits(self, index, value):
+        widgets = self.widgets
+        while len(self.qubits) < value:
+            i = len(self.qubits)
+            button = widgets.Button(description=str(i + 1), layout=widgets.Layout(width="110px", height="40px"))
+            button.on_click(lambda b, i=i: self.dispatch({"action": "qubit", "value": i}))
+            self.qubits.append((button, widgets.HTML(layout=widgets.Layout(width="110px"))))
+        self.qubitBox.children = [widgets.VBox(qubit) for qubit in self.qubits[:value]]
+
+    def _setProbs(self, index, value):
+        button, label = self.qubits[int(index)]
+        if value is None:
+            button.style.button_color = probabilityColor(0.5)
+            label.value = ""
+            return
+        basis = self.state.get("basis", 0)
+        button.style.button_color = probabilityColor(value[basis])
+        lines = ["P(1) = {:.3f}".format(value[0]), "P(-) = {:.3f}".format(value[1])]
+        lines[basis] = "<b>" + lines[basis] + "</b>"
+        label.value = "<br>".join(([value[2]] if value[2] != "" else []) + lines)
+
+    def _setBasis(self, index, value):
+        for i in range(len(self.qubits)):
+            self._setProbs(str(i), self.state.get("probs.{}".format(i)))
+
+    def _setBell(self, index, value):
+        if value is None:
+            self.bell.value = ""
+            return
+        rows = "".join("<tr><td>{}</td><td>{:.2f}</td><td>{:.2f}</td></tr>".format(label, value["probs"][2 * j],
+                                                                                 value["probs"][2 * j + 1])
+                       for j, label in enumerate(bellLabels[value["n"]]))
+        self.bell.value = "<table><tr><th></th><th>+</th><th>-</th></tr>" + rows + "</table>"
+
+    def _setButton(self, index, value):
+        if index == "bet":
+            self.betText.disabled = value == "disabled"
+        elif index in self.buttons:
+            self.buttons[index].style.button_color = buttonColors[value]
+            self.buttons[index].disabled = value == "disabled"
+
+    def _setLabel(self, index, value):
+        if index in self.buttons:
+            self.buttons[index].description = value
+
+    def _setBetLabel(self, index, value):
+        self.betLabel.value = value
+
+    def _setNextBet(self, index, value):
+        self.nextBet.value = "" if value is None else "{}/{}".format(*value)
+
+    def _setHand(self, index, value):
+        for gate in gates:
+            self.buttons[gate].description = gate if value is None else "{}: {}".format(gate, value.get(gate, 0))
+
+    def _setDeck(self, index, value):
+        self.deck.value = "<b>Deck:</b><br>" + "<br>".join("{}: {}".format(gate, n) for gate, n in value.items())
+
+    def _setInfo(self, index, value):
+        self.info.value = "&nbsp;&nbsp;" + value[0].replace("\n", " ") + "<br>&gt; " + value[1].replace("\n", " ")
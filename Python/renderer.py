@@ -0,0 +1,250 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from matplotlib.axes import Axes
+from matplotlib.backend_bases import TimerBase
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+from threading import RLock
+from Python.metrics import span, count
+
+
+class BlitRenderer:
+    def __init__(self, fig, interval=0, flushWithoutEventLoop=False):
+        """
+        Redraws only the artists that have changed. Artists registered with addDynamic are animated: a full draw of
+        the figure leaves them out, and the result is kept as the background. When artists are damaged, the background
+        is restored below them, they are drawn again together with every dynamic artist they overlap, and only those
+        regions are blitted to the screen.
+        Damage is collected and flushed in one go from an idle timer, so that several changes in one event cost a
+        single update. Canvases without an event loop (e.g. Agg) are only rendered when flush is called or the figure
+        is saved, unless flushWithoutEventLoop is set.
+        :param fig: The figure
+        :param interval: Delay in milliseconds between the first damage and the update of the screen
+        :param flushWithoutEventLoop: Flush at every call of draw if the canvas has no event loop, e.g. for off-screen
+                                      figures that are streamed
+        """
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.dynamicArtists = []
+        self.extents = {}
+        self.damaged = []
+        self.background = None
+        self.needsFullDraw = True
+        self.flushScheduled = False
+
+        self.timer = self.canvas.new_timer(interval=interval)
+        self.timer.single_shot = True
+        self.timer.add_callback(self.flush)
+        self.hasEventLoop = type(self.timer) is not TimerBase
+        self.flushWithoutEventLoop = flushWithoutEventLoop
+
+        # Held while the canvas is drawn, so that other threads can copy its pixels consistently
+        self.lock = RLock()
+        self.cnt = 0
+        self.flushObservers = {}
+
+        self.cidDraw = self.canvas.mpl_connect('draw_event', self._onDraw)
+
+    def addDynamic(self, *artists):
+        for artist in artists:
+            artist.set_animated(True)
+            self.dynamicArtists.append(artist)
+        self.dynamicArtists.sort(key=lambda artist: artist.get_zorder())
+        self.requestFullDraw()
+
+    def removeDynamic(self, *artists):
+        for artist in artists:
+            self.dynamicArtists.remove(artist)
+            self.extents.pop(artist, None)
+        self.requestFullDraw()
+
+    def damage(self, *artists):
+        """
+        Marks artists as changed. They are redrawn at the next flush.
+        """
+        for artist in artists:
+            if artist not in self.damaged:
+                self.damaged.append(artist)
+
+    def requestFullDraw(self):
+        """
+        The next flush redraws the whole figure, e.g. because a static artist has changed.
+        """
+        self.needsFullDraw = True
+
+    def draw(self):
+        """
+        Schedules a flush of all damage from the event loop. Without an event loop nothing is drawn until flush.
+        """
+        if not self.hasEventLoop:
+            if self.flushWithoutEventLoop:
+                self.flush()
+            return
+        if self.flushScheduled:
+            return
+        self.flushScheduled = True
+        self.timer.start()
+
+    def onFlush(self, func):
+        """
+        Calls func after every update of the canvas, with the list of updated regions as Bboxes in display
+        coordinates, or None if the whole figure was drawn. func is called while the lock is held.
+        :return: A connection id for disconnectFlush
+        """
+        cid = self.cnt
+        self.flushObservers[cid] = func
+        self.cnt += 1
+        return cid
+
+    def disconnectFlush(self, cid):
+        self.flushObservers.pop(cid, None)
+
+    def _notifyFlush(self, regions):
+        for func in list(self.flushObservers.values()):
+            func(regions)
+
+    def flush(self):
+        """
+        Brings the canvas up to date, using a full draw only if there is no background to blit onto.
+        """
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.flushScheduled = False
+        if self.needsFullDraw or self.background is None or not self.canvas.supports_blit:
+            self.damaged = []
+            with span("ui.draw"):
+                self.canvas.draw()
+            return
+        if len(self.damaged) == 0:
+            return
+
+        with span("ui.draw.blit"):
+            count("ui.blits")
+            renderer = self.canvas.get_renderer()
+            regions = []
+            for artist in self.damaged:
+                region = _extent(artist, renderer)
+                if artist in self.extents:
+                    region = Bbox.union([region, self.extents[artist]])
+                region = Bbox.intersection(region, self.fig.bbox)
+                if region is not None:
+                    regions.append(region)
+            self.damaged = []
+
+            # Every dynamic artist overlapping a damaged region is drawn again. Outside the regions nothing has changed,
+            # so the pixels there are saved first and put back afterwards, e.g. for the tick labels of a neighbour.
+            toDraw = [artist for artist in self.dynamicArtists if artist not in self.extents or
+                      any(self.extents[artist].overlaps(region) for region in regions)]
+            saved = []
+            for artist in toDraw:
+                if artist in self.extents:
+                    outside = _subtract(Bbox.intersection(self.extents[artist], self.fig.bbox), regions)
+                    if len(outside) > 0:
+                        saved.append((self.canvas.copy_from_bbox(self.extents[artist]), outside))
+
+            for region in regions:
+                self._restore(self.background, region)
+            for artist in toDraw:
+                self._drawArtist(artist, renderer)
+            for pixels, outside in saved:
+                for region in outside:
+                    self._restore(pixels, region)
+            for region in regions:
+                self.canvas.blit(region)
+            self._notifyFlush(regions)
+
+    def _restore(self, pixels, region):
+        """
+        Copies the part of the saved pixels that lies in region back onto the canvas.
+        """
+        height = self.fig.bbox.height
+        x0, y0 = pixels.get_extents()[:2]
+        # restore_region counts y from the top of the figure
+        self.canvas.restore_region(pixels, bbox=(region.x0, height - region.y1, region.x1, height - region.y0),
+                                   xy=(x0, y0))
+
+    def _drawArtist(self, artist, renderer):
+        if artist.get_visible():
+            artist.draw(renderer)
+        self.extents[artist] = _extent(artist, renderer, drawn=True)
+
+    def _onDraw(self, event):
+        """
+        Called after every full draw of the figure, which leaves out the dynamic artists.
+        """
+        if self.canvas.is_saving():
+            for artist in self.dynamicArtists:
+                if artist.get_visible():
+                    artist.draw(event.renderer)
+            return
+        with self.lock:
+            if self.canvas.supports_blit:
+                self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+            for artist in self.dynamicArtists:
+                self._drawArtist(artist, event.renderer)
+            self.needsFullDraw = False
+            self.damaged = []
+            self._notifyFlush(None)
+
+
+def _subtract(bbox, regions):
+    """
+    :return: List of rectangles covering the part of bbox that is outside all regions
+    """
+    if bbox is None:
+        return []
+    pieces = [bbox]
+    for region in regions:
+        remaining = []
+        for piece in pieces:
+            if not piece.overlaps(region):
+                remaining.append(piece)
+                continue
+            x0, y0, x1, y1 = piece.extents
+            if region.x0 > x0:
+                remaining.append(Bbox.from_extents(x0, y0, region.x0, y1))
+            if region.x1 < x1:
+                remaining.append(Bbox.from_extents(region.x1, y0, x1, y1))
+            if region.y0 > y0:
+                remaining.append(Bbox.from_extents(max(x0, region.x0), y0, min(x1, region.x1), region.y0))
+            if region.y1 < y1:
+                remaining.append(Bbox.from_extents(max(x0, region.x0), region.y1, min(x1, region.x1), y1))
+        pieces = remaining
+    return pieces
+
+
+def _extent(artist, renderer, drawn=False):
+    """
+    :param drawn: Whether the artist has just been drawn with renderer
+    :return: The region in display coordinates covered by an artist, including tick labels of axes and the
+             background box of texts
+    """
+    if isinstance(artist, Axes):
+        # Cheaper than get_tightbbox: the patch, the tick labels and the texts, e.g. the label of a TextBox
+        bboxes = [artist.bbox]
+        for axis in (artist.xaxis, artist.yaxis):
+            if not axis.get_visible():
+                continue
+            if drawn:
+                # The labels of the drawn ticks are up to date, get_ticklabels would lay them out again
+                ticks = (axis.majorTicks[:len(axis.get_majorticklocs())] +
+                         axis.minorTicks[:len(axis.get_minorticklocs())])
+                labels = [label for tick in ticks for label in (tick.label1, tick.label2)]
+            else:
+                labels = axis.get_ticklabels(which="both")
+            bboxes.extend(label.get_window_extent(renderer) for label in labels
+                          if label.get_visible() and label.get_text() != "")
+        bboxes.extend(text.get_window_extent(renderer) for text in artist.texts
+                      if text.get_visible() and text.get_text() != "")
+        bbox = Bbox.union(bboxes)
+    else:
+        bbox = artist.get_window_extent(renderer)
+        if isinstance(artist, Text) and artist.get_bbox_patch() is not None:
+            artist.update_bbox_position_size(renderer)
+            bbox = Bbox.union([bbox, artist.get_bbox_patch().get_window_extent(renderer)])
+    return bbox.padded(2)
@@ -6,10 +6,9 @@
 from os.path import dirname, abspath
 import sys
 sys.path.append(dirname(abspath(__file__)))
-from Python.PokerGame import PokerGame
-import matplotlib.pyplot as plt
+from Python.PokerSession import PokerSession
 from Python.helpFiles import getIntInput
-from numpy import array, count_nonzero, nonzero, delete, flip
+from numpy import array
 
 
 if __name__ == "__main__":
@@ -22,16 +21,6 @@ if __name__ == "__main__":
     for i in range(nPlayers):
         names[i] = input("Enter the initials of player {}: ".format(i+1))
 
-    while not count_nonzero(money == 0) == (nPlayers-1):
-        pokerGame = PokerGame(deckOfGates, nPlayers, money, names = names, smallBlind=5, smallBlindPlayer=dealer,
-                              enableEntanglement = enableEntanglement)
-        dealer = (dealer + 1) % nPlayers
-        plt.show()
-        if 0 in money:
-            toDelete=nonzero(money==0)[0]
-            for i in flip(toDelete):
-                if i < dealer:
-                    dealer -= 1
-            names = delete(names, nonzero(money==0)[0])
-            money = delete(money, nonzero(money==0)[0])
-            nPlayers = money.shape[0]
+    session = PokerSession(deckOfGates, names, money, smallBlind=5, dealer=dealer,
+                           enableEntanglement=enableEntanglement)
+    session.run()
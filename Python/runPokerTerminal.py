@@ -0,0 +1,133 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+from Python.PokerSession import PokerSession
+from Python.viewModel import ViewModel, enabled, selected
+from Python.helpFiles import getIntInput
+from numpy import array
+import json
+
+commandHelp = """Commands:
+  c            check or call            b <amount>   place a bet or raise by amount
+  f            fold                     s            show or hide your hand
+  H, X, ZH ... select a gate            <qubit>      apply the selected gate or Bell check to a qubit (1 to 5)
+  basis        change the basis         bell2, bell3 check the Bell states of 2 or 3 qubits
+  u, r         take back the last gate, or apply it again
+  e            end your turn, or deal the next hand when it is over
+  q            quit"""
+
+commands = {"c": "check", "f": "fold", "s": "showHand", "basis": "Basis", "bell2": "Bell2",
+            "bell3": "Bell3", "e": "End", "u": "undo", "r": "redo"}
+
+
+class TerminalClient:
+    def __init__(self):
+        """
+        Shows a table in the terminal. The client only knows the JSON deltas sent by a ViewModel, so it could as well
+        run in another process.
+        """
+        self.state = {}
+        self.seq = 0
+
+    def apply(self, message):
+        delta = json.loads(message)
+        self.state.update(delta["set"])
+        self.seq = delta["seq"]
+
+    def render(self):
+        state = self.state
+        nPlayers = len([key for key in state if key.startswith("name.")])
+        lines = ["", "{:<12}".format("") + "".join("{:>10}".format(state["name.{}".format(i)] +
+                                                                  ("*" if state["player.{}".format(i)] == "active"
+                                                                   else "")) for i in range(nPlayers))]
+        for label, key in (("Bets:", "bet"), ("Money left:", "money")):
+            lines.append("{:<12}".format("Score:" if state.get("results") and key == "bet" else label) +
+                         "".join("{:>10}".format(_cell(state["{}.{}".format(key, i)])) for i in range(nPlayers)))
+        states = [state.get("player.{}".format(i)) for i in range(nPlayers)]
+        lines.append("{:<12}".format("") + "".join("{:>10}".format(s if s != "inactive" else "") for s in states))
+
+        lines.append("")
+        for i in range(state["nQubits"]):
+            probs = state["probs.{}".format(i)]
+            if probs is None:
+                lines.append("  qubit {}:  hidden".format(i + 1))
+                continue
+            bold = ["*", ""] if state["basis"] == 0 else ["", "*"]
+            lines.append("  qubit {}:  {}P(1) = {:.3f}   {}P(-) = {:.3f}   {}".format(i + 1, bold[0], probs[0], bold[1],
+                                                                                   probs[1], probs[2]))
+        if state["bell"] is not None:
+            # Probabilities of the + and - state of each pair of Bell states
+            labels = ["00,11", "01,10"] if state["bell"]["n"] == 2 else ["000,111", "001,110", "010,101", "100,011"]
+            values = state["bell"]["probs"]
+            lines.append("  Bell states +/-: " + ", ".join("{} {:.2f}/{:.2f}".format(label, values[2*j], values[2*j+1])
+                                                           for j, label in enumerate(labels)))
+        if state.get("scoreHistogram") is not None:
+            # Fraction of the shots of the showdown giving each score, from 0 up
+            histogram = state["scoreHistogram"]
+            for player, counts in zip(histogram["players"], histogram["counts"]):
+                lines.append("  Scores of {} in {} shots: ".format(state["name.{}".format(player)], sum(counts)) +
+                             " ".join("{:.2f}".format(n / sum(counts)) for n in counts))
+        lines.append("")
+        if state["hand"] is not None:
+            lines.append("  Hand: " + ", ".join("{}: {}".format(gate, n) for gate, n in state["hand"].items()))
+        if state["nextBet"] is not None:
+            lines.append("  Bet: {}/{}   ({} to bet, {} to check)".format(state["nextBet"][0], state["nextBet"][1],
+                                                                         state["betLabel"], state["label.check"]))
+        buttons = [key[len("button."):] for key, value in state.items() if key.startswith("button.") and
+                   value in (enabled, selected) and key[len("button."):] not in state["deck"]]
+        lines.append("  Gates: " + " ".join(state["allowedGates"]) + "   Buttons: " + " ".join(
+            state.get("label." + button, button) if button in ("End", "Basis") else button for button in buttons))
+        lines.append("  " + state["info"][0].replace("\n", " "))
+        lines.append("> " + state["info"][1].replace("\n", " "))
+        return "\n".join(lines)
+
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+
+def parseCommand(line):
+    """
+    :return: The action as a dict for ViewModel.dispatch, or None if the line is not a command
+    """
+    words = line.split()
+    if len(words) == 0:
+        return None
+    if words[0].isdigit():
+        return {"action": "qubit", "value": int(words[0]) - 1}
+    if words[0] == "b":
+        # A bet needs an amount
+        return {"action": "bet", "value": words[1]} if len(words) == 2 else None
+    if words[0] in commands:
+        return {"action": commands[words[0]]}
+    # The name of a gate
+    return {"action": words[0].upper()}
+
+
+if __name__ == "__main__":
+    nPlayers = getIntInput("Enter the number of players (2 to 5): ", 2, 5)
+    deckOfGates = {"H": nPlayers, "X": nPlayers, "ZH": nPlayers, "CX": nPlayers}
+    names = [input("Enter the initials of player {}: ".format(i+1)) for i in range(nPlayers)]
+
+    session = PokerSession(deckOfGates, names, array([100 for i in range(nPlayers)]), smallBlind=5,
+                           enableEntanglement=True, frontEnd=ViewModel)
+    viewModel = session.pokerGame.interactive
+    viewModel.updateBoard()
+    client = TerminalClient()
+    client.apply(viewModel.snapshot())
+    viewModel.subscribe(client.apply)
+
+    print(commandHelp)
+    while True:
+        print(client.render())
+        line = input("> ").strip()
+        if line == "q":
+            break
+        action = parseCommand(line)
+        if action is None or not viewModel.dispatch(action):
+            print("Not possible now. " + commandHelp)
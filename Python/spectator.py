@@ -0,0 +1,181 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from threading import Thread, Condition
+from time import perf_counter
+from io import BytesIO
+from math import floor, ceil
+from numpy import asarray
+from PIL import Image
+from Python.metrics import span, count
+
+
+class Frame:
+    def __init__(self, index, time, width, height, full, tiles):
+        """
+        An update of the table as seen by spectators.
+        :param index: Number of the frame in the stream
+        :param time: perf_counter() when the pixels were copied
+        :param width: Width of the figure in pixels
+        :param height: Height of the figure in pixels
+        :param full: Whether the frame is the whole figure, or only the regions that have changed
+        :param tiles: List of (x, y, png) with x, y the top left corner of the PNG image in pixels from the top left of
+                      the figure. A full frame is a single tile at 0, 0.
+        """
+        self.index = index
+        self.time = time
+        self.width = width
+        self.height = height
+        self.full = full
+        self.tiles = tiles
+
+
+class FrameStream:
+    def __init__(self, interactive, maxFps=10, tiles=False, maxTileArea=0.5):
+        """
+        Streams the figure of an InteractiveContainer to local subscribers, e.g. spectators of a table. After every
+        update of the figure a frame is captured, at most maxFps times a second, and updates in between are merged into
+        the next frame. Frames are copied and encoded as PNG in a thread of the stream, once for all subscribers.
+        Use an InteractiveContainer with offscreen=True to stream a table without a window.
+        :param interactive: The InteractiveContainer
+        :param maxFps: Maximum number of frames per second
+        :param tiles: Send only the changed regions as tiles instead of the whole figure, except for the first frame
+                      and the frame after a new subscriber
+        :param maxTileArea: A frame whose changed regions cover more than this fraction of the figure is sent as a
+                            full frame
+        """
+        self.renderer = interactive.renderer
+        self.canvas = interactive.fig.canvas
+        self.minInterval = 1 / maxFps
+        self.tiles = tiles
+        self.maxTileArea = maxTileArea
+
+        self.cnt = 0
+        self.observers = {}
+        self.frameIndex = 0
+        self.lastFrame = None
+        self.lastFrameTime = None
+
+        # Updates of the figure that have not been sent yet. Guarded by condition.
+        self.condition = Condition()
+        self.pendingRegions = []
+        self.pendingFull = True
+        self.hasPending = False
+        self.running = True
+
+        self.cidFlush = self.renderer.onFlush(self._onFlush)
+        self.thread = Thread(target=self._run, name="FrameStream", daemon=True)
+        self.thread.start()
+
+    def subscribe(self, func):
+        """
+        Calls func with every Frame from the thread of the stream. The next frame is a full frame, so that the new
+        subscriber can start from it.
+        :return: A connection id for unsubscribe
+        """
+        with self.condition:
+            cid = self.cnt
+            self.observers[cid] = func
+            self.cnt += 1
+            self.pendingFull = True
+            self.hasPending = not self.renderer.needsFullDraw
+            self.condition.notify()
+        return cid
+
+    def unsubscribe(self, cid):
+        with self.condition:
+            self.observers.pop(cid, None)
+
+    def close(self):
+        """
+        Stops the stream, frames that have not been sent yet are dropped.
+        """
+        self.renderer.disconnectFlush(self.cidFlush)
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+    def _onFlush(self, regions):
+        # Called by the renderer after each update, only remembers what has changed
+        with self.condition:
+            if regions is None:
+                self.pendingFull = True
+            else:
+                self.pendingRegions.extend(regions)
+            self.hasPending = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not (self.hasPending and len(self.observers) > 0):
+                    self.condition.wait()
+                if not self.running:
+                    return
+                if self.lastFrameTime is not None:
+                    wait = self.lastFrameTime + self.minInterval - perf_counter()
+                    if wait > 0:
+                        # Updates arriving meanwhile are merged into this frame
+                        self.condition.wait(wait)
+                        continue
+                full, regions = self.pendingFull or not self.tiles, self.pendingRegions
+                self.pendingFull, self.pendingRegions, self.hasPending = False, [], False
+                observers = list(self.observers.values())
+            frame = self._capture(full, regions)
+            for func in observers:
+                func(frame)
+
+    def _capture(self, full, regions):
+        """
+        Copies the pixels of the figure or of the changed regions and encodes them.
+        """
+        with self.renderer.lock:
+            self.lastFrameTime = perf_counter()
+            pixels = asarray(self.canvas.buffer_rgba())
+            height, width = pixels.shape[:2]
+            boxes = [] if full else _pixelBoxes(regions, width, height)
+            if full or sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes) > self.maxTileArea * width * height:
+                full, boxes = True, [(0, 0, width, height)]
+            images = [(x0, y0, pixels[y0:y1, x0:x1].copy()) for x0, y0, x1, y1 in boxes]
+
+        with span("stream.encode"):
+            tiles = [(x, y, _encodePng(image)) for x, y, image in images]
+        count("stream.frames")
+        frame = Frame(self.frameIndex, self.lastFrameTime, width, height, full, tiles)
+        self.frameIndex += 1
+        self.lastFrame = frame
+        return frame
+
+
+def _pixelBoxes(regions, width, height):
+    """
+    :param regions: Bboxes in display coordinates, with y from the bottom of the figure
+    :return: List of (x0, y0, x1, y1) in whole pixels with y from the top of the figure, clipped to the figure.
+             Overlapping regions are merged into one box.
+    """
+    boxes = []
+    for region in regions:
+        box = (max(0, floor(region.x0)), max(0, floor(height - region.y1)),
+               min(width, ceil(region.x1)), min(height, ceil(height - region.y0)))
+        if box[2] <= box[0] or box[3] <= box[1]:
+            continue
+        merged = True
+        while merged:
+            merged = False
+            for other in boxes:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    boxes.remove(other)
+                    box = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    merged = True
+                    break
+        boxes.append(box)
+    return boxes
+
+
+def _encodePng(image):
+    buffer = BytesIO()
+    Image.fromarray(image, "RGBA").save(buffer, format="png", compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,195 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from numpy import array, asarray, sqrt, abs, tensordot, moveaxis, stack, zeros, cumsum, arange, searchsorted, minimum
+from Python.metrics import timed
+from functools import lru_cache
+
+# Operations on wavevectors with numpy, without building or simulating circuits. Wavevectors are ordered as in qiskit:
+# bit i of the index of an amplitude is qubit i. Functions taking psis work on a batch of shape (n, 2**size).
+
+_s = 1 / sqrt(2)
+matrices = {"H": array([[_s, _s], [_s, -_s]], dtype=complex),
+            "X": array([[0, 1], [1, 0]], dtype=complex),
+            "Z": array([[1, 0], [0, -1]], dtype=complex),
+            "ID": array([[1, 0], [0, 1]], dtype=complex),
+            # Z then H
+            "ZH": array([[_s, -_s], [_s, _s]], dtype=complex),
+            # u3(pi/2, pi/2, -pi/2)
+            "SRX": array([[_s, 1j * _s], [1j * _s, _s]], dtype=complex),
+            "SRZ": array([[1, 0], [0, 1j]], dtype=complex)}
+# The gates applied to the last coordinate, controlled by the others
+controlled = {"CX": "X", "CH": "H", "CCX": "X"}
+
+
+def applyGate(psi, gate, coords, size, inverse=False):
+    """
+    :param psi: The wavevector
+    :param gate: The name of the gate, as in Board.playerMoveInteractive
+    :param coords: The qubits of the gate, the controls first
+    :param size: Number of qubits
+    :param inverse: Apply the inverse of the gate, e.g. to take a move back
+    :return: The wavevector after the gate
+    """
+    return applyGates(asarray(psi).reshape(1, -1), gate, coords, size, inverse)[0]
+
+
+def applyGates(psis, gate, coords, size, inverse=False):
+    """
+    Applies the same gate at the same coordinates to a batch of wavevectors.
+    :param psis: Array of shape (n, 2**size)
+    :return: Array of shape (n, 2**size) with the wavevectors after the gate
+    """
+    tensor = asarray(psis, dtype=complex).reshape((-1,) + (2,) * size)
+    # Qubit i is the axis size-i of the tensor, after the axis of the batch
+    axes = [size - int(coord) for coord in coords]
+    if gate == "SWAP":
+        return moveaxis(tensor, axes, axes[::-1]).reshape(tensor.shape[0], -1)
+    if gate in controlled:
+        tensor = tensor.copy()
+        index = [slice(None)] * (size + 1)
+        for axis in axes[:-1]:
+            index[axis] = 1
+        target = axes[-1] - sum(1 for axis in axes[:-1] if axis < axes[-1])
+        tensor[tuple(index)] = _applyMatrix(tensor[tuple(index)], matrices[controlled[gate]], target, inverse)
+        return tensor.reshape(tensor.shape[0], -1)
+    return _applyMatrix(tensor, matrices[gate], axes[0], inverse).reshape(tensor.shape[0], -1)
+
+
+def _applyMatrix(tensor, matrix, axis, inverse):
+    if inverse:
+        matrix = matrix.conj().T
+    return moveaxis(tensordot(matrix, tensor, axes=([1], [axis])), 0, axis)
+
+
+def probs01(psis, size):
+    """
+    :return: Array of shape (n, size) with the probabilities of measuring 1 for each qubit
+    """
+    density = abs(psis) ** 2
+    probs = zeros((psis.shape[0], size))
+    for qubit in range(size):
+        probs[:, qubit] = density.reshape(-1, 2 ** (size - 1 - qubit), 2, 2 ** qubit)[:, :, 1, :].sum(axis=(1, 2))
+    return probs
+
+
+def probsPlusMinus(psis, size):
+    """
+    :return: Array of shape (n, size) with the probabilities of measuring - for each qubit
+    """
+    probs = zeros((psis.shape[0], size))
+    for qubit in range(size):
+        pairs = psis.reshape(-1, 2 ** (size - 1 - qubit), 2, 2 ** qubit)
+        probs[:, qubit] = (abs(pairs[:, :, 0, :] - pairs[:, :, 1, :]) ** 2).sum(axis=(1, 2))
+    return probs / 2
+
+
+def bellStateProbs(psis, qubit1, qubit2, size):
+    """
+    :return: Array of shape (n, 4) with the probabilities of the Bell states of two qubits, in the order of
+             Board.getBellStateProbs
+    """
+    low, high = min(qubit1, qubit2), max(qubit1, qubit2)
+    amplitudes = psis.reshape(-1, 2 ** (size - 1 - high), 2, 2 ** (high - low - 1), 2, 2 ** low)
+    # |a + b|^2 and |a - b|^2 from the probabilities of the two qubits and the overlaps of a and b
+    density = (amplitudes.real ** 2 + amplitudes.imag ** 2).sum(axis=(1, 3, 5))
+    a00, a11 = amplitudes[:, :, 0, :, 0, :], amplitudes[:, :, 1, :, 1, :]
+    a01, a10 = amplitudes[:, :, 0, :, 1, :], amplitudes[:, :, 1, :, 0, :]
+    overlap0 = 2 * (a00.real * a11.real + a00.imag * a11.imag).sum(axis=(1, 2, 3))
+    overlap1 = 2 * (a01.real * a10.real + a01.imag * a10.imag).sum(axis=(1, 2, 3))
+    even, odd = density[:, 0, 0] + density[:, 1, 1], density[:, 0, 1] + density[:, 1, 0]
+    return stack([even + overlap0, even - overlap0, odd + overlap1, odd - overlap1], axis=1) / 2
+
+
+def qubitPairs(size):
+    """
+    :return: The pairs (i, j) of qubits with i < j, in the order of the columns of bellPairMask
+    """
+    return [(i, j) for i in range(size - 1) for j in range(i + 1, size)]
+
+
+@lru_cache(maxsize=None)
+def _pairIndices(size):
+    # Array of shape (4, number of qubitPairs, 2**(size-2)) with the indices of the amplitudes where each pair of
+    # qubits is 00, 11, 01 and 10
+    basis = arange(2 ** size)
+    indices = []
+    for i, j in qubitPairs(size):
+        rest = basis[((basis >> i) & 1 == 0) & ((basis >> j) & 1 == 0)]
+        indices.append([rest, rest + (1 << i) + (1 << j), rest + (1 << i), rest + (1 << j)])
+    return array(indices).transpose(1, 0, 2)
+
+
+def pairBellStateProbs(psis, size):
+    """
+    bellStateProbs of every pair of qubits at once.
+    :return: Array of shape (n, number of qubitPairs, 4)
+    """
+    amplitudes = psis[:, _pairIndices(size)]
+    density = (amplitudes.real ** 2 + amplitudes.imag ** 2).sum(axis=3)
+    a00, a11, a01, a10 = amplitudes[:, 0], amplitudes[:, 1], amplitudes[:, 2], amplitudes[:, 3]
+    overlap0 = 2 * (a00.real * a11.real + a00.imag * a11.imag).sum(axis=2)
+    overlap1 = 2 * (a01.real * a10.real + a01.imag * a10.imag).sum(axis=2)
+    even, odd = density[:, 0] + density[:, 1], density[:, 2] + density[:, 3]
+    return stack([even + overlap0, even - overlap0, odd + overlap1, odd - overlap1], axis=2) / 2
+
+
+def bellPairMask(psis, size):
+    """
+    :return: Boolean array of shape (n, number of qubitPairs) telling which pairs of qubits are in a Bell state
+    """
+    if size < 2:
+        return zeros((psis.shape[0], 0), dtype=bool)
+    return abs(pairBellStateProbs(psis, size).max(axis=2) - 1) < 1e-4
+
+
+def bellPairs(psis, size):
+    """
+    :return: For each wavevector the list of pairs of qubits in a Bell state, as found by Board.findBellPairs
+    """
+    pairs = qubitPairs(size)
+    isBell = bellPairMask(psis, size)
+    return [[pairs[k] for k in range(len(pairs)) if isBell[n, k]] for n in range(psis.shape[0])]
+
+
+def sample(psis, shots, rng):
+    """
+    Samples measurements of every qubit of a batch of wavevectors at once, by inverting their cumulative distributions
+    laid end to end.
+    :param rng: A numpy Generator
+    :return: Array of shape (n, shots) with the index of each measured basis state, bit i being qubit i
+    """
+    n, dimension = psis.shape
+    cumulative = cumsum(abs(psis) ** 2, axis=1)
+    cumulative /= cumulative[:, -1:]
+    offsets = arange(n)[:, None]
+    draws = rng.random((n, shots)) + offsets
+    indices = searchsorted((cumulative + offsets).ravel(), draws.ravel(), side="right").reshape(n, shots)
+    return minimum(indices - offsets * dimension, dimension - 1)
+
+
+def popcounts(size):
+    """
+    :return: Array with the number of ones of each basis state, i.e. its score
+    """
+    counts = zeros(2 ** size, dtype=int)
+    for qubit in range(size):
+        counts += (arange(2 ** size) >> qubit) & 1
+    return counts
+
+
+@timed("statevector.moveAnalytics")
+def moveAnalytics(psi, gate, moves, size, inverse=False):
+    """
+    Evaluates every move of a gate on a wavevector in one batch.
+    :param psi: The wavevector
+    :param gate: The name of the gate
+    :param moves: List of coordinates of the gate, see Board.getMoves
+    :param size: Number of qubits
+    :param inverse: Evaluate the inverse of the gate
+    :return: The wavevectors, probabilities of 1, probabilities of - and Bell pairs after each move
+    """
+    psis = stack([applyGate(psi, gate, coords, size, inverse) for coords in moves])
+    return psis, probs01(psis, size), probsPlusMinus(psis, size), bellPairs(psis, size)
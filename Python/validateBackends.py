@@ -0,0 +1,143 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+from os.path import dirname, abspath
+import sys
+sys.path.append(dirname(dirname(abspath(__file__))))
+from Python.Board import Board
+from Python.backends import getAvailableBackends
+from Python.statevector import probs01, probsPlusMinus
+from Python.mps import MatrixProductState
+from Python.densityMatrix import DensityMatrix
+from numpy import allclose, abs, array, median, outer
+from numpy.random import default_rng
+from argparse import ArgumentParser
+from time import perf_counter
+
+# Runs random gate sequences on every available backend, checks that they agree with the first backend that supports
+# the sequence, and reports how fast each backend is compared to BasicAer. Widths that only the mps backend supports are
+# timed without a comparison.
+
+
+def randomMoves(board, gates, length, rng):
+    """
+    :return: List of (gate, coordinates) of random moves on board
+    """
+    moves = []
+    for i in range(length):
+        gate = gates[rng.integers(len(gates))]
+        candidates = board.getMoves(gate)
+        if len(candidates) > 0:
+            moves.append((gate, candidates[rng.integers(len(candidates))]))
+    return moves
+
+
+def timeStatevector(backend, qc, repeats):
+    times = []
+    for i in range(repeats):
+        start = perf_counter()
+        backend.statevector(qc)
+        times.append(perf_counter() - start)
+    return float(median(times))
+
+
+def validate(widths, nSequences, length, gates, repeats, seed, atol=1e-8):
+    """
+    :return: List of failures as strings, dict from (backend name, width) to the median time of a statevector, and dict
+             from width to the largest bond dimension of the mps backend
+    """
+    rng = default_rng(seed)
+    backends = getAvailableBackends()
+    failures, times, bonds = [], {}, {}
+    for width in widths:
+        for sequence in range(nSequences):
+            board = Board(boardSeed=int(rng.integers(1 << 30)), enableEntanglement=True, nRandOneQGates=width,
+                          size=width, backend=backends[0], simulate=False)
+            for gate, coords in randomMoves(board, gates, length, rng):
+                board.playerMoveInteractive(gate, coords)
+            qc = board.qc
+            reference, referenceName = None, None
+            supporting = [backend for backend in backends if backend.supports(width, gates)]
+            for backend in supporting:
+                state = backend.statevector(qc)
+                times.setdefault((backend.name, width), []).append(timeStatevector(backend, qc, repeats))
+                if isinstance(state, MatrixProductState):
+                    bonds[width] = max(bonds.get(width, 1), state.bondStatistics()["maxBond"])
+                if len(supporting) == 1:
+                    # Nothing to compare with, e.g. boards too wide for a wavevector
+                    continue
+                if isinstance(state, DensityMatrix):
+                    # Without noise the density matrix is the outer product of the wavevector with itself
+                    if reference is not None and not allclose(state.rho, outer(reference[0], reference[0].conj()),
+                                                              atol=atol):
+                        failures.append("{} and {} differ in the density matrix, width {}, sequence {}"
+                                        .format(backend.name, referenceName, width, sequence))
+                    continue
+                psi = array(state).reshape(1, -1)
+                if reference is None:
+                    reference, referenceName = psi, backend.name
+                    continue
+                if not allclose(psi, reference, atol=atol):
+                    failures.append("{} and {} differ in the statevector, width {}, sequence {}: max difference {:.2e}"
+                                    .format(backend.name, referenceName, width, sequence,
+                                            float(abs(psi - reference).max())))
+                elif not (allclose(probs01(psi, width), probs01(reference, width), atol=atol) and
+                          allclose(probsPlusMinus(psi, width), probsPlusMinus(reference, width), atol=atol)):
+                    failures.append("{} and {} differ in the marginals, width {}, sequence {}"
+                                    .format(backend.name, referenceName, width, sequence))
+                elif isinstance(state, MatrixProductState) and not (
+                        allclose(state.probs01(), probs01(reference, width)[0], atol=atol) and
+                        allclose(state.probsPlusMinus(), probsPlusMinus(reference, width)[0], atol=atol)):
+                    failures.append("{} and {} differ in the marginals of the matrix product state, width {}, "
+                                    "sequence {}".format(backend.name, referenceName, width, sequence))
+            # Every backend measures a basis state with certainty
+            basis = board.qc.copy()
+            basis.data.clear()
+            basis.x(basis.qubits[0])
+            expected = "0" * (width - 1) + "1"
+            for backend in backends:
+                if backend.supports(width, ["X"]) and backend.measure(basis, shots=4) != {expected: 4}:
+                    failures.append("{} measures {} wrongly".format(backend.name, expected))
+    return failures, {key: float(median(value)) for key, value in times.items()}, bonds
+
+
+def printSpeed(times, widths):
+    names = sorted(set(name for name, width in times))
+    print("{:<8}".format("width") + "".join("{:>18}".format(name) for name in names))
+    for width in widths:
+        base = times.get(("basicAer", width))
+        cells = []
+        for name in names:
+            time = times.get((name, width))
+            if time is None:
+                cells.append("{:>18}".format("-"))
+            elif base is None:
+                cells.append("{:>15.2f} ms".format(1e3 * time))
+            else:
+                cells.append("{:>8.2f} ms {:>5.1f}x".format(1e3 * time, base / time))
+        print("{:<8}".format(width) + "".join(cells))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Checks that all simulation backends agree and compares their speed.")
+    parser.add_argument("--widths", type=int, nargs="+", default=[2, 3, 5, 8, 12])
+    parser.add_argument("--sequences", type=int, default=10, help="Random gate sequences per width")
+    parser.add_argument("--length", type=int, default=20, help="Gates per sequence")
+    parser.add_argument("--gates", nargs="+", default=["H", "X", "Z", "ZH", "SRZ", "CX", "CH", "SWAP", "CCX"])
+    parser.add_argument("--repeats", type=int, default=5, help="Timed statevectors per sequence and backend")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print("Backends:", ", ".join(backend.name for backend in getAvailableBackends()))
+    failures, times, bonds = validate(args.widths, args.sequences, args.length, args.gates, args.repeats, args.seed)
+    print("Median time of a statevector, and speedup over basicAer:")
+    printSpeed(times, args.widths)
+    if len(bonds) > 0:
+        print("Largest bond dimension of mps: " + ", ".join("{} at width {}".format(bond, width)
+                                                            for width, bond in sorted(bonds.items())))
+    for failure in failures:
+        print("FAIL", failure)
+    print("All backends agree." if len(failures) == 0 else "{} failures.".format(len(failures)))
+    sys.exit(1 if len(failures) > 0 else 0)
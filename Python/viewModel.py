@@ -0,0 +1,290 @@
+# Copyright SINTEF 2019
+# Authors: Franz G. Fuchs <franzgeorgfuchs@gmail.com>,
+#          Christian Johnsen <christian.johnsen97@gmail.com>,
+#          Vemund Falch <vemfal@gmail.com>
+
+import json
+from Python.helpFiles import getUnentangledTag
+from Python.metrics import timed, count
+
+# States of the buttons, in place of the colors used by InteractiveContainer
+disabled, enabled, selected = "disabled", "enabled", "selected"
+gates = ["H", 'X', 'CX', 'CH', 'ZH']
+buttons = gates + ["Basis", "End", "Bell2", "Bell3", "check", "fold", "bet", "showHand"]
+# The actions that take a value
+valueActions = ["bet", "qubit", "hover"]
+
+
+class ViewModel:
+    def __init__(self, nPlayers, dims, initialGates, names):
+        """
+        A front end for PokerGame without any graphics. It has the interface of InteractiveContainer, but keeps what
+        would be shown as a flat dict of plain values. updateBoard sends the entries that have changed since the
+        previous update as a compact JSON delta to every subscriber:
+            {"seq": 12, "set": {"bet.1": 10, "money.1": 90, "player.1": "inactive", "player.2": "active"}}
+        Clients apply the deltas to their copy of the state, and play by passing actions to dispatch, e.g.
+        {"action": "check"}, {"action": "bet", "value": 20}, {"action": "H"} or {"action": "qubit", "value": 2}.
+        :param nPlayers: Number of players
+        :param dims: Number of qubits on a board
+        :param initialGates: The deck of gates
+        :param names: Names of the players
+        """
+        self.normalColors = [enabled, selected, enabled]
+        self.currentPlayerColors = ["active", "active", "active"]
+        self.disconnectedColor = "inactive"
+        self.foldedColor = "folded"
+        self.allInColor = ["allIn", "allIn", "allIn"]
+        self.gates = gates
+
+        self.dims = dims
+        self.state = {}
+        self.sent = {}
+        self.seq = 0
+        self.actions = {}
+        self.cnt = 0
+        self.observers = {}
+        self.resetTable(nPlayers, initialGates, names)
+
+    def subscribe(self, func):
+        """
+        Calls func with the JSON string of every delta.
+        :return: A connection id for unsubscribe
+        """
+        cid = self.cnt
+        self.observers[cid] = func
+        self.cnt += 1
+        return cid
+
+    def unsubscribe(self, cid):
+        self.observers.pop(cid, None)
+
+    def snapshot(self):
+        """
+        :return: JSON string of a delta containing the whole state, for a client that has just connected
+        """
+        return json.dumps({"seq": self.seq, "set": self.sent}, separators=(",", ":"))
+
+    @timed("viewModel.dispatch")
+    def dispatch(self, message):
+        """
+        Performs an action of a client, as if the corresponding button had been clicked. Actions of buttons that are
+        not connected are ignored.
+        :param message: dict or JSON string with the name of the action and, for "bet", "qubit" and "hover", a value
+        :return: Whether the action was connected and given a value if it takes one
+        """
+        if isinstance(message, str):
+            message = json.loads(message)
+        action = self.actions.get(message.get("action"))
+        if action is None or (message.get("action") in valueActions) != ("value" in message):
+            return False
+        if "value" in message:
+            action(message["value"])
+        else:
+            action()
+        self.updateBoard()
+        return True
+
+    @timed("viewModel.updateBoard")
+    def updateBoard(self):
+        changed = {key: value for key, value in self.state.items() if key not in self.sent or self.sent[key] != value}
+        changed.update({key: None for key in self.sent if key not in self.state})
+        if len(changed) == 0:
+            return
+        self.seq += 1
+        self.sent = dict(self.state)
+        message = json.dumps({"seq": self.seq, "set": changed}, separators=(",", ":"))
+        count("viewModel.deltaBytes", len(message))
+        for func in list(self.observers.values()):
+            func(message)
+
+    def newPollTimer(self, interval):
+        # Actions are performed at once, the state is always up to date when dispatch returns
+        return None
+
+    def _setButton(self, button, buttonState, action=None):
+        self.state["button." + button] = buttonState
+        if action is None:
+            self.actions.pop(button, None)
+        else:
+            self.actions[button] = action
+
+    def resetTable(self, nPlayers, initialGates, names):
+        """
+        Brings the state back to that of a freshly created table.
+        """
+        self.nPlayers = nPlayers
+        self.state = {"nQubits": self.dims, "basis": 0, "bellPairs": [], "ghzTriples": [], "bell": None,
+                      "nextBet": [0, 0], "info": ["", "Place a bet or fold."], "betLabel": "Place bet:",
+                      "label.check": "Check", "label.Basis": "0,1", "label.End": "End", "hand": None,
+                      "allowedGates": [], "scoreHistogram": None,
+                      "deck": {gate: int(initialGates.get(gate, 0)) for gate in self.gates}}
+        for i in range(nPlayers):
+            self.state["name.{}".format(i)] = str(names[i])
+            self.state["player.{}".format(i)] = self.disconnectedColor
+            self.state["bet.{}".format(i)] = 0
+            self.state["money.{}".format(i)] = 0
+        for i in range(self.dims):
+            self.state["probs.{}".format(i)] = None
+        self.actions = {}
+        for button in buttons:
+            self._setButton(button, disabled)
+
+    def disconnectAll(self):
+        self.actions = {}
+        self.state["allowedGates"] = []
+
+    def getDisconnectedColor(self):
+        return self.disconnectedColor
+
+    def getFoldedColor(self):
+        return self.foldedColor
+
+    def getCurrentPlayerColor(self):
+        return self.currentPlayerColors
+
+    def getNormalColors(self):
+        return self.normalColors
+
+    def getAllInColor(self):
+        return self.allInColor
+
+    def setGateColor(self, button, color):
+        self.state["button." + button] = color
+
+    def setGateHoverColor(self, button, color):
+        pass
+
+    def setShowHandButtonColor(self, color):
+        self.state["button.showHand"] = color
+
+    def setPlayerPatchColor(self, player, color):
+        self.state["player.{}".format(player)] = color
+
+    def setGateText(self, button, text):
+        self.state["label." + button] = text
+
+    def setBetandCheck(self):
+        self.state["betLabel"], self.state["label.check"] = "Place bet:", "Check"
+
+    def setRaiseandCall(self):
+        self.state["betLabel"], self.state["label.check"] = "Raise:", "Call"
+
+    def connectNextHand(self, nextHandFunc):
+        self.setGateText('End', "Next")
+        self.connectEnd(nextHandFunc)
+
+    def connectMouseclick(self, mouseClickFunc):
+        self.actions["qubit"] = lambda qubit: mouseClickFunc(int(qubit))
+
+    def connectMouseHover(self, mouseHoverFunc):
+        # {"action": "hover", "value": None} when the pointer leaves the board
+        self.actions["hover"] = lambda qubit: mouseHoverFunc(None if qubit is None else int(qubit))
+
+    def connectUndo(self, undoFunc, redoFunc):
+        self.actions["undo"] = undoFunc
+        self.actions["redo"] = redoFunc
+
+    def connectEnd(self, endFunc):
+        self._setButton("End", enabled, lambda: endFunc(None))
+
+    def disconnectEnd(self):
+        self._setButton("End", disabled)
+
+    def connectShowHandButton(self, interactiveButtons):
+        self._setButton("showHand", enabled, lambda: interactiveButtons.showHand(None))
+
+    def disconnectShowHandButton(self):
+        self._setButton("showHand", disabled)
+
+    def connectBellAndBasis(self, interactiveButtons):
+        self._setButton("Basis", enabled, lambda: interactiveButtons.changeBasis(None))
+        self._setButton("Bell2", enabled, lambda: interactiveButtons.checkBellStates2(None))
+        self._setButton("Bell3", enabled, lambda: interactiveButtons.checkBellStates3(None))
+
+    def connectAllowedGates(self, interactiveButtons, allowedButtons):
+        for gate in self.gates:
+            if gate in allowedButtons:
+                self.connectGate(gate, getattr(interactiveButtons, gate))
+        self.updatePlayerGate(allowedButtons, hover=True, showZero=True)
+
+    def disconnectAllGates(self):
+        for gate in self.gates:
+            self.disconnectGate(gate)
+
+    def connectGate(self, gate, func):
+        self.actions[gate] = lambda: func(None)
+        self.state["allowedGates"] = [g for g in self.gates if g in self.actions]
+
+    def disconnectGate(self, gate):
+        self.actions.pop(gate, None)
+        self.state["allowedGates"] = [g for g in self.gates if g in self.actions]
+
+    def connectBets(self, interactiveButtons, betFunc):
+        self._setButton("check", enabled, lambda: interactiveButtons.checkButton(None))
+        self._setButton("fold", enabled, lambda: interactiveButtons.foldButton(None))
+        self._setButton("bet", enabled, lambda amount: betFunc(str(amount), None))
+
+    def disconnectBets(self):
+        for button in ["check", "fold", "bet"]:
+            self._setButton(button, disabled)
+        self.state["nextBet"] = None
+
+    def updatePlayerGate(self, gates, hover=False, showZero=False):
+        # The hand of the current player, or None while it is hidden
+        self.state["hand"] = {gate: int(gates[gate]) for gate in self.gates if gate in gates} if showZero else None
+        for gate in self.gates:
+            self.state["button." + gate] = enabled if gate in gates else disabled
+
+    def updatePlayerPatches(self, gates):
+        self.state["deck"] = {gate: int(gates.get(gate, 0)) for gate in self.gates}
+
+    def updateCurrentBets(self, bets, money):
+        for i in range(self.nPlayers):
+            # -1 is shown as folded and -2 as empty, as in InteractiveContainer
+            self.state["bet.{}".format(i)] = int(bets[i]) if bets[i] >= 0 else ("folded" if bets[i] == -1 else None)
+            self.state["money.{}".format(i)] = round(float(money[i]), 2)
+
+    def displayEndResults(self, scores, winnings):
+        self.state["results"] = True
+        self.updateCurrentBets(scores, winnings)
+
+    def showScoreHistogram(self, players, counts):
+        """
+        Sets the number of shots giving each score for the boards of players, after a multi-shot showdown.
+        """
+        self.state["scoreHistogram"] = {"players": [int(player) for player in players],
+                                        "counts": [[int(n) for n in row] for row in counts]}
+
+    def unshowScoreHistogram(self):
+        self.state["scoreHistogram"] = None
+
+    def updateNextBet(self, playerCurrentBet, maxBet, show=True):
+        self.state["nextBet"] = [int(playerCurrentBet), int(maxBet)] if show else None
+
+    def updateInfoText(self, newText):
+        if newText != self.state["info"][1]:
+            self.state["info"] = [self.state["info"][1], newText]
+
+    def updateProbs(self, probs01, probsPlusMinus, basis, bellPairs, ghzTriples=()):
+        """
+        Sets the probabilities of measuring 1 and - for each qubit, and the Bell pairs and GHZ triples they belong to.
+        """
+        self.state["basis"] = basis
+        self.state["bellPairs"] = [[int(qubit) for qubit in pair] for pair in bellPairs]
+        self.state["ghzTriples"] = [[int(qubit) for qubit in triple] for triple in ghzTriples]
+        for i in range(self.dims):
+            if i < probs01.shape[0]:
+                self.state["probs.{}".format(i)] = [round(float(probs01[i]), 3), round(float(probsPlusMinus[i]), 3),
+                                                    getUnentangledTag(i, bellPairs, ghzTriples).replace("\n", " ")
+                                                    .strip()]
+            else:
+                self.state["probs.{}".format(i)] = None
+
+    def updateBellProbs2(self, bellProbs):
+        self.state["bell"] = {"n": 2, "probs": [round(float(p), 2) for p in bellProbs]}
+
+    def updateBellProbs3(self, bellProbs):
+        self.state["bell"] = {"n": 3, "probs": [round(float(p), 2) for p in bellProbs]}
+
+    def unshowBellProbs(self):
+        self.state["bell"] = None